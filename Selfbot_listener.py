@@ -1,6 +1,7 @@
 # Selfbot_listener.py
 
 import logging
+import time
 import warnings
 
 # Suprimir warnings
@@ -30,6 +31,11 @@ except ImportError:
 from signal_parser import parse_signal
 from trader import execute_trade
 from telegram_alert import send_telegram_message, send_telegram_error
+from signal_pipeline import SignalPipeline, DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE, DEFAULT_METRICS_INTERVAL
+from settings import get_settings
+from dedupe import get_dedupe_index, message_key, signal_fingerprint
+import journal
+import tracing
 
 # Configuração de logging
 logging.basicConfig(
@@ -41,32 +47,46 @@ logging.basicConfig(
 class SignalClient(discord.Client):
     """Cliente Discord Selfbot para escutar sinais de trading"""
     
-    def __init__(self, channel_id: str, config: dict, **kwargs):
+    def __init__(self, config: dict, **kwargs):
         super().__init__(**kwargs)
-        self.channel_id = str(channel_id).strip()
         self.config = config
         self.ready = False
+        # Parse + execução rodam fora do event loop, em workers com fila limitada
+        self.pipeline = SignalPipeline(
+            self.process_signal,
+            workers=config.get("pipeline_workers", DEFAULT_WORKERS),
+            queue_size=config.get("pipeline_queue_size", DEFAULT_QUEUE_SIZE),
+            metrics_interval=config.get("pipeline_metrics_sec", DEFAULT_METRICS_INTERVAL),
+        )
+        tracing.configure(config.get("trace_file", tracing.DEFAULT_TRACE_FILE))
+        self.dedupe = get_dedupe_index(config)
+        journal.configure(config.get("journal_path", journal.DEFAULT_JOURNAL_FILE),
+                          batch_size=config.get("journal_batch_size", journal.DEFAULT_BATCH_SIZE),
+                          flush_interval=config.get("journal_flush_sec", journal.DEFAULT_FLUSH_INTERVAL))
         
     async def on_ready(self):
         """Evento chamado quando o bot está pronto"""
         self.ready = True
+        self.pipeline.start()
         logging.info("=" * 60)
         logging.info(f"✓ Connected as {self.user.name} (ID: {self.user.id})")
-        logging.info(f"✓ Monitoring channel ID: {self.channel_id}")
+        channels = get_settings().channels
+        logging.info(f"✓ Monitoring {len(channels)} channel(s): {', '.join(p.name for p in channels.values())}")
         logging.info("=" * 60)
         
-        # Tenta encontrar o canal
-        try:
-            channel = self.get_channel(int(self.channel_id))
-            if channel:
-                channel_name = getattr(channel, 'name', 'Unknown')
-                guild_name = getattr(getattr(channel, 'guild', None), 'name', 'DM')
-                logging.info(f"✓ Channel found: {channel_name} (Guild: {guild_name})")
-            else:
-                logging.warning(f"⚠ Channel {self.channel_id} not found in cache.")
-                logging.warning("   The bot will still work if it has access to the channel.")
-        except Exception as e:
-            logging.warning(f"⚠ Could not verify channel: {e}")
+        # Tenta encontrar os canais
+        for channel_id, profile in channels.items():
+            try:
+                channel = self.get_channel(channel_id)
+                if channel:
+                    channel_name = getattr(channel, 'name', 'Unknown')
+                    guild_name = getattr(getattr(channel, 'guild', None), 'name', 'DM')
+                    logging.info(f"✓ Channel found: {channel_name} (Guild: {guild_name}, profile: {profile.name})")
+                else:
+                    logging.warning(f"⚠ Channel {channel_id} not found in cache.")
+                    logging.warning("   The bot will still work if it has access to the channel.")
+            except Exception as e:
+                logging.warning(f"⚠ Could not verify channel {channel_id}: {e}")
     
     async def on_message(self, message):
         """Evento chamado quando uma mensagem é recebida"""
@@ -75,21 +95,58 @@ class SignalClient(discord.Client):
             if message.author.id == self.user.id:
                 return
             
-            # Verifica se é o canal correto
-            if str(message.channel.id) != self.channel_id:
+            # Roteia pelo id do canal (dict int -> perfil, recompilado no hot reload)
+            profile = get_settings().channels.get(message.channel.id)
+            if profile is None:
                 return
             
             channel_name = getattr(message.channel, 'name', 'Unknown')
             logging.info("-" * 60)
-            logging.info(f"📨 New message from {message.author.name} in #{channel_name}")
+            logging.info(f"📨 New message from {message.author.name} in #{channel_name} [{profile.name}]")
             logging.info(f"Content preview: {message.content[:100]}...")
             
+            # Só enfileira: parse e trade rodam nos workers do pipeline
+            job = {"id": str(message.id), "content": message.content, "received": time.perf_counter(),
+                   "profile": profile}
+            if not self.pipeline.submit(job):
+                # Texto fixo no Telegram para o coalescing juntar os avisos; as métricas ficam só no log
+                warn = "Signal queue full, message dropped"
+                logging.warning(f"⚠ {warn} (metrics: {self.pipeline.metrics()})")
+                send_telegram_error(warn, self.config)
+            
+        except Exception as e:
+            err = f"Listener error: {e}"
+            logging.error(f"✗ {err}")
+            import traceback
+            logging.error(traceback.format_exc())
+            send_telegram_error(err, self.config)
+    
+    def process_signal(self, job: dict):
+        """Parse + execução de um sinal (roda numa thread do pipeline, pode bloquear)"""
+        profile = job.get("profile")
+        with tracing.start_trace(job["id"], job["received"]) as trace:
+            # Tempo entre o recebimento no event loop e o início no worker
+            tracing.record("queue_wait", job["received"])
+            journal.log_event("message", channel_id=profile.channel_id if profile is not None else None,
+                              channel=profile.name if profile is not None else None, content=job["content"])
+            # Reconexões reentregam a mesma mensagem: o id só é processado uma vez
+            if self.dedupe.claim(message_key(job["id"])):
+                self._process_signal(job["content"], profile)
+            else:
+                logging.info(f"Duplicate message {job['id']} ignored")
+                journal.log_event("duplicate", reason="message_id")
+        timing = trace.to_dict()
+        journal.log_event("timing", signal_id=trace.signal_id, duration_ms=timing["total_ms"], spans=timing["spans"])
+    
+    def _process_signal(self, content: str, profile=None):
+        try:
             # Parse do sinal
-            parsed = parse_signal(message.content)
+            parsed = parse_signal(content)
             
             if not parsed:
                 warn = "No valid signal was parsed from this message."
                 logging.warning(f"⚠ {warn}")
+                journal.log_event("signal", parsed=None)
                 send_telegram_error(warn, self.config)
                 return
             
@@ -100,24 +157,47 @@ class SignalClient(discord.Client):
             logging.info(f"  Side: {parsed.get('side', 'N/A')}")
             logging.info(f"  Leverage: {parsed.get('leverage', 'N/A')}")
             logging.info(f"  Market: {parsed.get('market', 'auto')}")
+            symbol = parsed["pair"].replace("/", "").upper()
+            journal.log_event("signal", symbol=symbol, market=parsed.get("market"), parsed=dict(parsed))
+            
+            # Mesmo sinal repostado (outra mensagem/canal) dentro da janela não abre outra posição
+            fingerprint = signal_fingerprint(parsed)
+            if not self.dedupe.claim(fingerprint):
+                warn = f"Duplicate signal ignored: {parsed['pair']} (already executed within the dedupe window)"
+                logging.warning(f"⚠ {warn}")
+                journal.log_event("duplicate", symbol=symbol, reason="fingerprint")
+                send_telegram_message(warn, self.config, coalesce=True)
+                return
             
             # Executa o trade
-            result = execute_trade(
-                pair=parsed["pair"],
-                entry_price=parsed["entry"],
-                targets=parsed["targets"],
-                stop_loss=parsed["stop_loss"],
-                side=parsed.get("side"),
-                leverage=parsed.get("leverage"),
-                market=parsed.get("market"),
-            )
+            try:
+                result = execute_trade(
+                    pair=parsed["pair"],
+                    entry_price=parsed["entry"],
+                    targets=parsed["targets"],
+                    stop_loss=parsed["stop_loss"],
+                    side=parsed.get("side"),
+                    leverage=parsed.get("leverage"),
+                    market=parsed.get("market"),
+                    profile=profile,
+                )
+            except Exception:
+                # Não chegou a um resultado: libera para que um repost possa ser executado
+                self.dedupe.release(fingerprint)
+                raise
+            if not (result.placed or result.ok):
+                # Falhou antes de qualquer ordem chegar à exchange (saldo, símbolo, alavancagem...):
+                # um repost ou retry depois de corrigir a causa não é duplicata
+                self.dedupe.release(fingerprint)
+            journal.log_event("result", symbol=symbol, result=result, ok=result.ok, placed=result.placed)
             
-            notify = f"Signal executed: {parsed['pair']} — {result}"
+            source = f" [{profile.name}]" if profile is not None else ""
+            notify = f"Signal executed{source}: {parsed['pair']} — {result}"
             logging.info(f"✓ {notify}")
             send_telegram_message(notify, self.config)
             
         except Exception as e:
-            err = f"Listener error: {e}"
+            err = f"Signal processing error: {e}"
             logging.error(f"✗ {err}")
             import traceback
             logging.error(traceback.format_exc())
@@ -133,16 +213,16 @@ def run_listener(config: dict):
     """Inicia o listener do Discord Selfbot"""
     
     # Extrai configurações
-    channel_id = config.get("channel_id", "").strip()
+    channels = get_settings().channels
     discord_token = config.get("discord_token", "").strip()
     
     if not discord_token:
         logging.error("✗ Discord token not configured in config.json")
         raise ValueError("Discord token is required")
     
-    if not channel_id:
-        logging.error("✗ Channel ID not configured in config.json")
-        raise ValueError("Channel ID is required")
+    if not channels:
+        logging.error("✗ No channel configured in config.json (channel_id or channels)")
+        raise ValueError("At least one channel ID is required")
     
     # Verifica se a biblioteca está correta
     if not hasattr(discord, 'Client'):
@@ -200,7 +280,6 @@ def run_listener(config: dict):
     # Cria e executa o client
     try:
         client = SignalClient(
-            channel_id=channel_id,
             config=config,
             **client_kwargs
         )
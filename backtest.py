@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Backtest dos sinais: reprocessa um arquivo de mensagens históricas com parse_signal
+e avalia cada entrada/targets/stop contra klines OHLCV (CSV da Binance), com a
+seleção de targets e os pesos atuais do config.
+
+Por candle, a detecção de "quem toca primeiro" (cada TP x SL) é vetorizada com
+NumPy; a janela de cada trade é varrida em blocos crescentes e para assim que o
+SL ou o último TP é atingido.
+
+Arquivo de sinais: JSON lines com {"time": epoch s/ms ou ISO 8601, "message": "..."}
+Klines: <dir>/<SYMBOL>*.csv (formato da Binance: open_time, open, high, low, close, ...)
+
+Uso: python backtest.py sinais.jsonl --klines klines/ [--out trades.csv]
+"""
+
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    print("✗ numpy is required for the backtester: pip install numpy")
+    raise
+
+from settings import DEFAULT_ALLOCATION
+
+DEFAULT_FEE = 0.001            # por lado (taxa taker spot)
+DEFAULT_MAX_HOLD_BARS = 60 * 24 * 30
+SCAN_CHUNK = 1440              # primeiro bloco da varredura (1 dia de candles de 1m)
+
+# Motivo de saída de cada parcela
+EXIT_TP, EXIT_SL, EXIT_OPEN = 1, -1, 0
+
+
+class Klines:
+    """Colunas OHLC de um símbolo como arrays contíguos, ordenados por open_time (ms; None quando não é necessário)"""
+
+    __slots__ = ("symbol", "open_time", "open", "high", "low", "close")
+
+    def __init__(self, symbol: str, open_time, open_, high, low, close):
+        self.symbol = symbol
+        self.open_time = None if open_time is None else np.ascontiguousarray(open_time, dtype=np.int64)
+        self.open = np.ascontiguousarray(open_, dtype=np.float64)
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+
+def _read_kline_csv(path: str) -> np.ndarray:
+    with open(path, encoding="utf-8") as f:
+        first = f.readline().split(",")[0].strip()
+    skip = 0 if first.replace(".", "", 1).isdigit() else 1   # CSVs mais novos da Binance têm cabeçalho
+    data = np.loadtxt(path, delimiter=",", usecols=(0, 1, 2, 3, 4), skiprows=skip, ndmin=2)
+    return data
+
+
+def load_klines(symbol: str, paths: Sequence[str]) -> Klines:
+    """Concatena os CSVs de um símbolo, ordena por tempo e remove candles duplicados"""
+    data = np.concatenate([_read_kline_csv(p) for p in paths]) if paths else np.empty((0, 5))
+    t = data[:, 0].astype(np.int64)
+    t = np.where(t > 10 ** 14, t // 1000, t)   # arquivos de 2025+ usam microssegundos
+    order = np.argsort(t, kind="stable")
+    t, data = t[order], data[order]
+    keep = np.concatenate(([True], t[1:] != t[:-1])) if len(t) else np.zeros(0, dtype=bool)
+    return Klines(symbol, t[keep], data[keep, 1], data[keep, 2], data[keep, 3], data[keep, 4])
+
+
+class KlineStore:
+    """Carrega (uma vez) os klines de cada símbolo a partir de um diretório de CSVs"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache: Dict[str, Optional[Klines]] = {}
+
+    def paths_for(self, symbol: str) -> List[str]:
+        return sorted(set(glob.glob(os.path.join(self.directory, f"{symbol}.csv")) +
+                          glob.glob(os.path.join(self.directory, f"{symbol}-*.csv"))))
+
+    def get(self, symbol: str) -> Optional[Klines]:
+        if symbol not in self._cache:
+            paths = self.paths_for(symbol)
+            self._cache[symbol] = load_klines(symbol, paths) if paths else None
+        return self._cache[symbol]
+
+
+# ---------------- Sinais ----------------
+@dataclass
+class SignalRecord:
+    time_ms: int
+    message: str
+    symbol: str = ""
+    parsed: Optional[dict] = None
+
+
+def _to_ms(value) -> Optional[int]:
+    if isinstance(value, (int, float)):
+        return int(value if value > 10 ** 11 else value * 1000)
+    if isinstance(value, str) and value.strip():
+        text = value.strip()
+        if text.replace(".", "", 1).isdigit():
+            return _to_ms(float(text))
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp() * 1000)
+    return None
+
+
+def load_signals(path: str, parse: Callable[[str], Optional[dict]]) -> List[SignalRecord]:
+    """Lê o arquivo de mensagens e passa cada uma pelo parser (linhas sem sinal ficam com parsed=None)"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                ts = _to_ms(row.get("time", row.get("timestamp")))
+                message = row.get("message", row.get("content", ""))
+            except (ValueError, AttributeError) as e:
+                logging.warning(f"{path}:{n}: skipped ({e})")
+                continue
+            if ts is None or not message:
+                continue
+            parsed = parse(message)
+            symbol = parsed["pair"].replace("/", "").upper() if parsed else ""
+            records.append(SignalRecord(ts, message, symbol, parsed))
+    records.sort(key=lambda r: r.time_ms)
+    return records
+
+
+# ---------------- Simulação ----------------
+def resolve_market(parsed: dict, trade_mode: str = "auto") -> str:
+    """Mesma prioridade do trader: mercado explícito, senão short/alavancagem -> futures, senão spot"""
+    requested = (parsed.get("market") or trade_mode or "auto").lower()
+    if requested in ("spot", "futures"):
+        return requested
+    side = (parsed.get("side") or "long").lower()
+    return "futures" if side == "short" or parsed.get("leverage") else "spot"
+
+
+def effective_stop(entry: float, stop: float, side: str, leverage: float) -> float:
+    """SL do sinal ou o preço de liquidação aproximado, o que vier antes"""
+    if leverage <= 1:
+        return stop
+    if side == "long":
+        return max(stop, entry * (1.0 - 1.0 / leverage))
+    return min(stop, entry * (1.0 + 1.0 / leverage))
+
+
+def first_touch(k: Klines, start: int, side: str, targets: Sequence[float], stop: float,
+                max_bars: int = DEFAULT_MAX_HOLD_BARS, sl_first: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Para cada target, em que candle e a que preço a parcela sai: no TP se ele é tocado
+    antes do SL, senão no SL; sem nenhum dos dois até o fim da janela, no close do último candle.
+
+    Retorna (índice do candle de saída, preço de saída, motivo EXIT_*) por target.
+    Candle que toca TP e SL ao mesmo tempo conta como SL (sl_first=True, conservador).
+    """
+    tps = np.asarray(targets, dtype=np.float64)
+    exit_idx = np.full(len(tps), -1, dtype=np.int64)
+    exit_px = np.full(len(tps), np.nan)
+    reason = np.full(len(tps), EXIT_OPEN, dtype=np.int8)
+    end = min(len(k), start + max_bars)
+    pos, chunk = start, SCAN_CHUNK
+    pending = np.ones(len(tps), dtype=bool)
+    is_long = side == "long"
+    while pos < end and pending.any():
+        stop_at = min(end, pos + chunk)
+        hi, lo = k.high[pos:stop_at], k.low[pos:stop_at]
+        width = stop_at - pos
+        if is_long:
+            sl_hit = lo <= stop
+            tp_hit = hi[None, :] >= tps[:, None]
+        else:
+            sl_hit = hi >= stop
+            tp_hit = lo[None, :] <= tps[:, None]
+        sl_at = int(sl_hit.argmax()) if sl_hit.any() else width
+        tp_any = tp_hit.any(axis=1)
+        tp_at = np.where(tp_any, tp_hit.argmax(axis=1), width)
+        won = pending & tp_any & ((tp_at < sl_at) if sl_first else (tp_at <= sl_at))
+        exit_idx[won] = pos + tp_at[won]
+        exit_px[won] = tps[won]
+        reason[won] = EXIT_TP
+        pending &= ~won
+        if sl_at < width:
+            exit_idx[pending] = pos + sl_at
+            exit_px[pending] = stop
+            reason[pending] = EXIT_SL
+            pending[:] = False
+            break
+        pos, chunk = stop_at, chunk * 2
+    if pending.any():
+        last = max(start, end - 1)
+        exit_idx[pending] = last
+        exit_px[pending] = k.close[last]
+    return exit_idx, exit_px, reason
+
+
+def trade_return(entry: float, exit_px: np.ndarray, weights: Sequence[float], side: str,
+                 leverage: float = 1.0, fee: float = DEFAULT_FEE) -> float:
+    """Retorno sobre a margem alocada (perda limitada a -100%)"""
+    direction = 1.0 if side == "long" else -1.0
+    gross = direction * (exit_px / entry - 1.0)
+    ret = leverage * (float(np.dot(np.asarray(weights, dtype=np.float64), gross)) - 2.0 * fee)
+    return max(ret, -1.0)
+
+
+@dataclass
+class TradeResult:
+    time_ms: int
+    symbol: str
+    market: str
+    side: str
+    leverage: float
+    entry: float
+    targets: Tuple[float, ...]
+    stop: float
+    weights: Tuple[float, ...]
+    exit_px: Tuple[float, ...]
+    reasons: Tuple[int, ...]
+    hold_bars: int
+    ret: float
+
+
+def simulate_signal(record: SignalRecord, k: Klines, selection_for: Callable[[int], tuple],
+                    default_leverage: int = 5, leverage_cap: Optional[float] = None,
+                    fee: float = DEFAULT_FEE, max_bars: int = DEFAULT_MAX_HOLD_BARS,
+                    sl_first: bool = True, trade_mode: str = "auto") -> Optional[TradeResult]:
+    """Entrada a mercado no open do primeiro candle depois da mensagem, como o bot faz"""
+    p = record.parsed
+    start = int(np.searchsorted(k.open_time, record.time_ms, side="right"))
+    if start >= len(k):
+        return None
+    idx, weights = selection_for(len(p["targets"]))
+    if not idx:
+        return None
+    targets = tuple(float(p["targets"][i]) for i in idx)
+    side = (p.get("side") or "long").lower()
+    market = resolve_market(p, trade_mode)
+    if market == "spot" and side == "short":
+        return None
+    leverage = 1.0
+    if market == "futures":
+        leverage = float(p.get("leverage") or default_leverage)
+        if leverage_cap:
+            leverage = min(leverage, float(leverage_cap))
+    entry = float(k.open[start])
+    stop = effective_stop(entry, float(p["stop_loss"]), side, leverage)
+    exit_idx, exit_px, reason = first_touch(k, start, side, targets, stop, max_bars, sl_first)
+    return TradeResult(
+        time_ms=record.time_ms, symbol=record.symbol, market=market, side=side, leverage=leverage,
+        entry=entry, targets=targets, stop=stop, weights=tuple(weights),
+        exit_px=tuple(float(x) for x in exit_px), reasons=tuple(int(r) for r in reason),
+        hold_bars=int(exit_idx.max() - start + 1), ret=trade_return(entry, exit_px, weights, side, leverage, fee),
+    )
+
+
+def summarize(trades: Sequence[TradeResult], allocation: float = DEFAULT_ALLOCATION) -> dict:
+    """PnL agregado: cada trade aloca `allocation` do capital, em ordem de entrada"""
+    if not trades:
+        return {"trades": 0}
+    rets = np.array([t.ret for t in trades])
+    equity = np.cumprod(1.0 + allocation * rets)
+    peak = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    gains, losses = rets[rets > 0].sum(), -rets[rets < 0].sum()
+    return {
+        "trades": len(trades),
+        "win_rate": float((rets > 0).mean()),
+        "avg_return": float(rets.mean()),
+        "median_return": float(np.median(rets)),
+        "profit_factor": float(gains / losses) if losses else float("inf"),
+        "total_return": float(equity[-1] - 1.0),
+        "max_drawdown": float((1.0 - equity / peak).max()),
+        "tp_exits": int(sum(r == EXIT_TP for t in trades for r in t.reasons)),
+        "sl_exits": int(sum(r == EXIT_SL for t in trades for r in t.reasons)),
+        "open_exits": int(sum(r == EXIT_OPEN for t in trades for r in t.reasons)),
+    }
+
+
+def write_trades(path: str, trades: Sequence[TradeResult]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["time", "symbol", "market", "side", "leverage", "entry", "targets", "stop",
+                    "weights", "exits", "reasons", "hold_bars", "return"])
+        for t in trades:
+            w.writerow([datetime.fromtimestamp(t.time_ms / 1000, tz=timezone.utc).isoformat(), t.symbol, t.market,
+                        t.side, t.leverage, t.entry, " ".join(map(str, t.targets)), t.stop,
+                        " ".join(f"{x:.4f}" for x in t.weights), " ".join(f"{x:g}" for x in t.exit_px),
+                        " ".join(map(str, t.reasons)), t.hold_bars, round(t.ret, 6)])
+
+
+def run_backtest(signals: Sequence[SignalRecord], store: KlineStore, selection_for: Callable[[int], tuple],
+                 **kwargs) -> Tuple[List[TradeResult], Dict[str, int]]:
+    trades, skipped = [], {"no_signal": 0, "no_klines": 0, "out_of_range": 0}
+    for rec in signals:
+        if not rec.parsed:
+            skipped["no_signal"] += 1
+            continue
+        k = store.get(rec.symbol)
+        if k is None or not len(k):
+            skipped["no_klines"] += 1
+            continue
+        result = simulate_signal(rec, k, selection_for, **kwargs)
+        if result is None:
+            skipped["out_of_range"] += 1
+        else:
+            trades.append(result)
+    return trades, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest parsed signals against OHLCV klines")
+    parser.add_argument("signals", help="JSON lines com time e message")
+    parser.add_argument("--klines", required=True, help="diretório com <SYMBOL>*.csv")
+    parser.add_argument("--allocation", type=float, default=None, help="padrão: allocation_fraction do config")
+    parser.add_argument("--fee", type=float, default=DEFAULT_FEE)
+    parser.add_argument("--max-hold-bars", type=int, default=DEFAULT_MAX_HOLD_BARS)
+    parser.add_argument("--leverage-cap", type=float, default=None)
+    parser.add_argument("--optimistic", action="store_true", help="candle que toca TP e SL conta como TP")
+    parser.add_argument("--with-gemini", action="store_true", help="usa o Gemini no parse (padrão: só regex)")
+    parser.add_argument("--out", default="", help="CSV por trade")
+    args = parser.parse_args()
+
+    import signal_parser
+    from parse_cache import ParseCache
+    from settings import get_settings
+    logging.disable(logging.INFO)   # parse_signal loga cada mensagem
+    cfg = get_settings()
+    # Mensagens históricas não entram no cache persistente do bot
+    signal_parser._parse_cache = ParseCache(max_entries=100000, path=None)
+    if not args.with_gemini:
+        signal_parser._gemini_parse = lambda message: None
+
+    t0 = time.perf_counter()
+    signals = load_signals(args.signals, signal_parser.parse_signal)
+    t_parse = time.perf_counter() - t0
+    store = KlineStore(args.klines)
+    t0 = time.perf_counter()
+    trades, skipped = run_backtest(
+        signals, store, cfg.selection_for, default_leverage=cfg.futures_default_leverage,
+        leverage_cap=args.leverage_cap, fee=args.fee, max_bars=args.max_hold_bars,
+        sl_first=not args.optimistic, trade_mode=cfg.trade_mode,
+    )
+    t_sim = time.perf_counter() - t0
+    summary = summarize(trades, args.allocation or cfg.allocation)
+
+    print("=" * 60)
+    print("  Signal Backtest")
+    print("=" * 60)
+    print(f"Messages: {len(signals)} | trades: {len(trades)} | skipped: {skipped}")
+    print(f"Parse: {t_parse:.2f}s | simulation (incl. kline load): {t_sim:.2f}s")
+    print()
+    for key, value in summary.items():
+        print(f"   {key:<15} {value:.4f}" if isinstance(value, float) else f"   {key:<15} {value}")
+    if args.out:
+        write_trades(args.out, trades)
+        print(f"\n✓ Per-trade results written to {args.out}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+# balance_ledger.py
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+
+SPOT_WS_URL = "wss://stream.binance.com:9443"
+FUTURES_WS_URL = "wss://fstream.binance.com"
+DEFAULT_RECONCILE = 300.0     # snapshot REST de conferência a cada 5 min
+DEFAULT_KEEPALIVE = 1800.0    # listenKey expira em 60 min sem keepalive
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 60.0
+
+
+def snapshot_balances(client, market: str) -> Dict[str, float]:
+    """Saldos por ativo via REST: free no Spot, wallet balance no Futures (mesmos campos que o trader lia)"""
+    if market == "futures":
+        return {str(b.get("asset", "")).upper(): float(b.get("balance", 0.0)) for b in client.futures_account_balance()}
+    return {str(b["asset"]).upper(): float(b["free"]) for b in client.get_account()["balances"]}
+
+
+def parse_balances(event) -> Dict[str, float]:
+    """Saldos contidos num evento do user data stream (outboundAccountPosition / ACCOUNT_UPDATE)"""
+    if not isinstance(event, dict):
+        return {}
+    kind = event.get("e")
+    try:
+        if kind == "outboundAccountPosition":
+            return {str(b["a"]).upper(): float(b["f"]) for b in event.get("B", [])}
+        if kind == "ACCOUNT_UPDATE":
+            return {str(b["a"]).upper(): float(b["wb"]) for b in (event.get("a") or {}).get("B", [])}
+    except (KeyError, TypeError, ValueError):
+        logging.warning(f"Malformed {kind} event ignored")
+    return {}
+
+
+class BalanceLedger:
+    """
+    Saldos de uma conta/mercado mantidos pelo user data stream da Binance (listenKey com keepalive),
+    semeados por um snapshot REST e reconciliados periodicamente.
+    free() devolve None enquanto o ledger não é confiável (sem snapshot, ou stream caído
+    há mais de um ciclo de reconciliação) e quem chamou usa o REST.
+    """
+
+    def __init__(self, client, market: str, url: Optional[str] = None,
+                 reconcile_sec: float = DEFAULT_RECONCILE, keepalive_sec: float = DEFAULT_KEEPALIVE):
+        self.client = client
+        self.market = market
+        self.url = (url or (FUTURES_WS_URL if market == "futures" else SPOT_WS_URL)).rstrip("/")
+        self.reconcile_sec = float(reconcile_sec)
+        self.keepalive_sec = float(keepalive_sec)
+        self.connected = False
+        self.events = 0
+        self.reconciles = 0
+        self.drift = 0              # reconciliações que corrigiram algum saldo
+        self.hits = 0
+        self.misses = 0
+        self.account = account_key(client)
+        self.listeners: List[Callable] = []
+        self._balances: Dict[str, float] = {}
+        self._synced_at = 0.0       # instante monotônico do último snapshot REST
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+
+    # ---------------- Consultas ----------------
+    def free(self, asset: str) -> Optional[float]:
+        with self._lock:
+            trusted = self._synced_at > 0 and (
+                self.connected or time.monotonic() - self._synced_at <= self.reconcile_sec)
+            if not trusted:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._balances.get(asset.upper(), 0.0)
+
+    def apply(self, balances: Dict[str, float]):
+        with self._lock:
+            self._balances.update(balances)
+
+    def reconcile(self) -> int:
+        """Troca os saldos pelo snapshot REST; devolve quantos ativos estavam divergentes"""
+        snap = snapshot_balances(self.client, self.market)
+        with self._lock:
+            changed = sum(1 for a, v in snap.items() if abs(self._balances.get(a, 0.0) - v) > 1e-9)
+            if self._synced_at > 0 and changed:
+                self.drift += 1
+                logging.info(f"[{self.market}] balance ledger reconciled {changed} asset(s) from REST")
+            self._balances = snap
+            self._synced_at = time.monotonic()
+            self.reconciles += 1
+        return changed
+
+    def add_listener(self, callback: Callable):
+        """callback(conta, mercado, evento) para cada evento do stream (ordens, posições...), na thread do stream"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def _dispatch(self, event):
+        for callback in self.listeners:
+            try:
+                callback(self.account, self.market, event)
+            except Exception as e:
+                logging.error(f"[{self.market}] user data listener error: {e}")
+
+    def stats(self) -> dict:
+        return {"market": self.market, "connected": self.connected, "events": self.events,
+                "reconciles": self.reconciles, "drift": self.drift, "hits": self.hits, "misses": self.misses}
+
+    # ---------------- Stream ----------------
+    def _listen_key(self) -> str:
+        if self.market == "futures":
+            return self.client.futures_stream_get_listen_key()
+        return self.client.stream_get_listen_key()
+
+    def _keepalive(self, key: str):
+        if self.market == "futures":
+            self.client.futures_stream_keepalive(listenKey=key)
+        else:
+            self.client.stream_keepalive(listenKey=key)
+
+    def start(self):
+        """Snapshot inicial e thread do stream (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        try:
+            self.reconcile()
+        except Exception as e:
+            logging.warning(f"[{self.market}] initial balance snapshot failed: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.market}-balance-ledger", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:
+                pass    # loop já encerrado
+        if self._thread:
+            self._thread.join(timeout)
+
+    @staticmethod
+    def _cancel_tasks():
+        # Roda dentro do loop: cancela tudo de uma vez, sem corrida com o fechamento
+        for task in asyncio.all_tasks():
+            task.cancel()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._main())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+            self._loop = None
+            self.connected = False
+
+    async def _main(self):
+        await asyncio.gather(self._consume(), self._reconcile_loop())
+
+    async def _reconcile_loop(self):
+        while not self._stop.is_set():
+            await asyncio.sleep(self.reconcile_sec)
+            try:
+                await asyncio.to_thread(self.reconcile)
+            except Exception as e:
+                logging.warning(f"[{self.market}] balance reconcile failed: {e}")
+
+    async def _keepalive_loop(self, key: str):
+        while True:
+            await asyncio.sleep(self.keepalive_sec)
+            try:
+                await asyncio.to_thread(self._keepalive, key)
+            except Exception as e:
+                logging.warning(f"[{self.market}] listenKey keepalive failed: {e}")
+
+    async def _consume(self):
+        import websockets
+
+        delay = RECONNECT_MIN
+        while not self._stop.is_set():
+            keepalive = None
+            try:
+                key = await asyncio.to_thread(self._listen_key)
+                async with websockets.connect(f"{self.url}/ws/{key}", ping_interval=20, close_timeout=2) as ws:
+                    self.connected = True
+                    delay = RECONNECT_MIN
+                    keepalive = asyncio.ensure_future(self._keepalive_loop(key))
+                    logging.info(f"[{self.market}] user data stream connected")
+                    # Eventos perdidos entre o snapshot e a conexão são cobertos por esta reconciliação
+                    await asyncio.to_thread(self.reconcile)
+                    async for raw in ws:
+                        try:
+                            event = json.loads(raw)
+                        except ValueError:
+                            continue
+                        self.events += 1
+                        if isinstance(event, dict) and event.get("e") == "listenKeyExpired":
+                            logging.warning(f"[{self.market}] listenKey expired, reconnecting")
+                            break
+                        balances = parse_balances(event)
+                        if balances:
+                            self.apply(balances)
+                        self._dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"[{self.market}] user data stream error: {e}")
+            finally:
+                if keepalive is not None:
+                    keepalive.cancel()
+            self.connected = False
+            if self._stop.is_set():
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+
+_LEDGERS: Dict[Tuple[str, str], BalanceLedger] = {}
+_LEDGERS_LOCK = threading.Lock()
+
+
+def account_key(client) -> str:
+    """Identifica a conta do client (API key), usada para separar ledgers e ordens por conta"""
+    return str(getattr(client, "API_KEY", "") or "")
+
+
+def get_ledger(client, market: str) -> Optional[BalanceLedger]:
+    """Ledger já iniciado para a conta do client (None se desligado ou exchange simulada)"""
+    if client is None or getattr(client, "simulated", False):
+        return None
+    return _LEDGERS.get((account_key(client), market))
+
+
+def start_balance_ledgers(cfg, client) -> Dict[str, BalanceLedger]:
+    """Inicia os ledgers de Spot e Futures da conta conforme o bloco user_data_stream do config"""
+    uds = (cfg or {}).get("user_data_stream") or {}
+    if not isinstance(uds, dict) or not uds.get("enabled", False):
+        return {}
+    if client is None or getattr(client, "simulated", False):
+        return {}
+    account = account_key(client)
+    started = {}
+    with _LEDGERS_LOCK:
+        for market in ("spot", "futures"):
+            ledger = _LEDGERS.get((account, market))
+            if ledger is None:
+                ledger = BalanceLedger(client, market, uds.get(f"{market}_url"),
+                                       uds.get("reconcile_sec", DEFAULT_RECONCILE),
+                                       uds.get("keepalive_sec", DEFAULT_KEEPALIVE))
+                ledger.start()
+                _LEDGERS[(account, market)] = ledger
+            started[market] = ledger
+    return started
+
+
+def stop_balance_ledgers():
+    with _LEDGERS_LOCK:
+        for ledger in _LEDGERS.values():
+            ledger.stop()
+        _LEDGERS.clear()
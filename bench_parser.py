@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark e acurácia do parser de sinais sobre um corpus realista (bench_corpus.json).
+
+Mede throughput e latência (p50/p95/p99) de _regex_parse, _validate_struct e
+parse_signal (com o Gemini e o cache de parse desativados por stub) e compara
+cada campo extraído com o esperado. Falha (exit 1) se alguma mensagem que não
+está marcada como known_issue for extraída errado.
+
+Uso: python bench_parser.py [--rounds N] [--corpus arquivo.json]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+import signal_parser
+
+logging.disable(logging.CRITICAL)
+
+FIELDS = ("pair", "entry", "targets", "stop_loss", "side", "leverage", "market")
+
+
+class _NoCache:
+    """Stub do cache de parse: toda chamada de parse_signal faz o parse completo"""
+
+    hit_rate = 0.0
+
+    def get(self, message):
+        return None
+
+    def put(self, message, result):
+        pass
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def measure(func, inputs, rounds):
+    """Roda func sobre todos os inputs `rounds` vezes; retorna latências em µs"""
+    timings = []
+    clock = time.perf_counter_ns
+    for _ in range(rounds):
+        for item in inputs:
+            t0 = clock()
+            func(item)
+            timings.append((clock() - t0) / 1000.0)
+    timings.sort()
+    return timings
+
+
+def report(name, timings):
+    total_s = sum(timings) / 1e6
+    throughput = len(timings) / total_s if total_s else 0.0
+    print(f"   {name:<18} {throughput:>10.0f} msg/s   "
+          f"p50={percentile(timings, 50):7.2f}µs  p95={percentile(timings, 95):7.2f}µs  "
+          f"p99={percentile(timings, 99):7.2f}µs")
+
+
+def check_accuracy(corpus):
+    """Compara campo a campo o resultado de _regex_parse com o esperado"""
+    field_hits = {f: 0 for f in FIELDS}
+    field_total = 0
+    noise_ok = noise_total = 0
+    regressions, known = [], []
+    for case in corpus:
+        result = signal_parser._regex_parse(case["message"]) or None
+        expected = case.get("expected")
+        if expected is None:
+            noise_total += 1
+            ok = result is None
+            noise_ok += ok
+        else:
+            field_total += 1
+            got = result or {}
+            for f in FIELDS:
+                field_hits[f] += got.get(f) == expected.get(f)
+            ok = result == expected
+        if not ok:
+            (known if case.get("known_issue") else regressions).append((case, result))
+    return field_hits, field_total, noise_ok, noise_total, regressions, known
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signal parser benchmark")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--corpus", default="bench_corpus.json")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    messages = [c["message"] for c in corpus]
+    structs = [c["expected"] for c in corpus if c.get("expected")]
+
+    print("=" * 60)
+    print("  Signal Parser Benchmark")
+    print("=" * 60)
+    print(f"Corpus: {len(corpus)} messages ({len(structs)} signals), {args.rounds} rounds")
+    print()
+
+    # Gemini e cache fora do caminho: mede só o parse local
+    signal_parser._gemini_parse = lambda message: None
+    signal_parser._parse_cache = _NoCache()
+
+    print("Latency / throughput:")
+    report("_regex_parse", measure(signal_parser._regex_parse, messages, args.rounds))
+    report("_validate_struct", measure(signal_parser._validate_struct, structs, args.rounds))
+    report("parse_signal", measure(signal_parser.parse_signal, messages, args.rounds))
+    print()
+
+    field_hits, field_total, noise_ok, noise_total, regressions, known = check_accuracy(corpus)
+    print("Field accuracy (signals):")
+    for f in FIELDS:
+        pct = field_hits[f] / field_total * 100 if field_total else 100.0
+        print(f"   {f:<10} {field_hits[f]:>3}/{field_total}  {pct:6.1f}%")
+    print(f"   noise      {noise_ok:>3}/{noise_total}  rejected correctly")
+    print()
+
+    for case, result in known:
+        print(f"⚠ known issue [{case['name']}]: {case['known_issue']}")
+    for case, result in regressions:
+        print(f"✗ [{case['name']}] expected {case.get('expected')}")
+        print(f"   got {result}")
+
+    print("=" * 60)
+    if regressions:
+        print(f"✗ {len(regressions)} extraction regression(s)")
+        return 1
+    print("✓ No extraction regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência do primeiro sinal com e sem o pre-warm de startup.
+
+Cada rodada sobe um processo novo (cold de verdade) num diretório temporário com o
+config.json do repo em test_mode + exchange simulada com latência de rede, e mede
+do recebimento da mensagem até a primeira ordem (span entry_order do trace):
+  cold: a mensagem chega logo após os imports, como num bot recém-iniciado
+  warm: prewarm() roda antes, como main.main() faz antes do listener ficar pronto
+
+Uso: python bench_prewarm.py [--rounds 5] [--latency-ms 50] [--message "..."]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+_T0 = time.perf_counter()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MESSAGE = "BTC/USDT LONG\nEntry: 50000\nTargets: 51000 52000 53000\nStop Loss: 49000"
+
+
+def child(mode: str, message: str):
+    """Roda dentro do processo filho: imports, pre-warm opcional e um sinal; imprime o resultado em JSON"""
+    import logging
+    logging.disable(logging.CRITICAL)
+    import prewarm
+    import tracing
+    from settings import get_settings
+    from signal_parser import parse_signal
+    from trader import execute_trade
+    import_ms = (time.perf_counter() - _T0) * 1000.0
+
+    warm_ms, steps = 0.0, []
+    if mode == "warm":
+        start = time.perf_counter()
+        settings = get_settings()
+        steps = [(r.name, round(r.ms, 1), r.ok) for r in prewarm.prewarm(dict(settings.raw), settings)]
+        warm_ms = (time.perf_counter() - start) * 1000.0
+
+    with tracing.start_trace(f"bench-{mode}") as trace:
+        parsed = parse_signal(message)
+        result = execute_trade(pair=parsed["pair"], entry_price=parsed["entry"], targets=parsed["targets"],
+                               stop_loss=parsed["stop_loss"], side=parsed.get("side"),
+                               leverage=parsed.get("leverage"), market=parsed.get("market"))
+    spans = trace.to_dict()["spans"]
+    entry = next((s for s in spans if s["name"] == "entry_order"), None)
+    print(json.dumps({
+        "import_ms": import_ms, "prewarm_ms": warm_ms, "steps": steps,
+        "first_order_ms": entry["start_ms"] if entry else None,
+        "total_ms": trace.to_dict()["total_ms"], "ok": "OK" in str(result),
+    }))
+
+
+def make_workdir(latency_ms: float) -> str:
+    with open(os.path.join(HERE, "config.json"), encoding="utf-8") as f:
+        cfg = json.load(f)
+    workdir = tempfile.mkdtemp(prefix="bench_prewarm_")
+    cfg.update({
+        "test_mode": True, "trade_mode": "futures", "gemini_api_key": "", "accounts": [],
+        "telegram_token": "", "telegram_chat_id": "", "trace_file": "", "journal_path": "",
+        "parse_cache_path": "", "dedupe_path": "",
+    })
+    cfg["sim_exchange"] = dict(cfg.get("sim_exchange", {}), enabled=True, latency_ms=latency_ms,
+                               latency_jitter_ms=0, rate_limit_rate=0.0, seed=1)
+    cfg["market_data"] = dict(cfg.get("market_data", {}), enabled=False)
+    # Símbolo do sinal na watch list: no warm a alavancagem já está aplicada quando a mensagem chega
+    cfg["leverage_cache"] = dict(cfg.get("leverage_cache", {}), enabled=True, watch_symbols=["BTCUSDT"])
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(cfg, f, indent=2)
+    return workdir
+
+
+def run_child(workdir: str, mode: str, message: str) -> dict:
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, "--message", message],
+                         cwd=workdir, capture_output=True, text=True, timeout=120)
+    lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+    if out.returncode != 0 or not lines:
+        raise RuntimeError(f"{mode} run failed:\n{out.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm first-signal latency")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="latência simulada por chamada REST")
+    parser.add_argument("--message", default=DEFAULT_MESSAGE)
+    parser.add_argument("--child", choices=("cold", "warm"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.message)
+        return 0
+
+    print("=" * 60)
+    print("  Pre-warm Benchmark (message -> first order)")
+    print("=" * 60)
+    workdir = make_workdir(args.latency_ms)
+    runs = {"cold": [], "warm": []}
+    for _ in range(max(1, args.rounds)):
+        for mode in ("cold", "warm"):
+            runs[mode].append(run_child(workdir, mode, args.message))
+
+    print(f"rounds={args.rounds}  simulated REST latency={args.latency_ms:g} ms")
+    print(f"{'':6} {'first order':>12} {'signal total':>13} {'imports':>9} {'pre-warm':>9}")
+    for mode, rows in runs.items():
+        print(f"{mode:6} {median([r['first_order_ms'] or 0 for r in rows]):10.1f}ms "
+              f"{median([r['total_ms'] for r in rows]):11.1f}ms {median([r['import_ms'] for r in rows]):7.0f}ms "
+              f"{median([r['prewarm_ms'] for r in rows]):7.0f}ms")
+    print("\nPre-warm steps (last warm run):")
+    for name, ms, ok in runs["warm"][-1]["steps"]:
+        print(f"  {'✓' if ok else '✗'} {name:<24} {ms:8.1f} ms")
+
+    cold = median([r["first_order_ms"] or 0 for r in runs["cold"]])
+    warm = median([r["first_order_ms"] or 0 for r in runs["warm"]])
+    print("=" * 60)
+    print(f"First order {cold - warm:.1f} ms sooner with pre-warm ({cold:.1f} -> {warm:.1f} ms)")
+    failed = [r for rows in runs.values() for r in rows if not r["ok"]]
+    if failed:
+        print(f"✗ {len(failed)} run(s) did not place the trade")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark do parser regex: implementação anterior (várias buscas por mensagem)
+vs motor atual (scan único + matches ancorados). Também confere que as duas
+produzem exatamente o mesmo resultado.
+
+Uso: python bench_regex.py [iterações]
+"""
+
+import logging
+import re
+import sys
+import timeit
+
+from signal_parser import _regex_parse, _validate_struct
+
+logging.disable(logging.CRITICAL)
+
+SAMPLES = [
+    "#BTC/USDT\nEntry around 64250\nTargets: 65000 - 66200 - 67500 - 69000\nStop Loss: 62900",
+    "📈 #ETH/USDT LONG\nEntry Point: 3120.5\nTP1: 3180\nTP2: 3250\nTP3: 3340\nSL: 3040\nLeverage: 10x Futures",
+    "SOL/USDC short\nEntry: 148.2\nTarget 1: 144\nTarget 2: 140.5\nStop loss - 152",
+    "#STPT/USDT\nEntry 0.0412\nTP 0.0430 0.0450 0.0480\nSL 0.0390",
+    "Good morning everyone, market update coming later today. Stay tuned!",
+    "BTC dominance is rising, be careful with alts. No entry for now.",
+]
+
+
+def legacy_regex_parse(message: str):
+    """Implementação anterior (7+ re.search por mensagem), mantida como referência"""
+    try:
+        pair_match = re.search(r"#?([A-Z]{2,10})/(USDT|USDC)", message, re.IGNORECASE)
+        if not pair_match:
+            return None
+        pair = f"{pair_match.group(1).upper()}/{pair_match.group(2).upper()}"
+        
+        entry_match = re.search(r"(Entry\s+around|Entry\s+Point|Entry)\s*[:\-]?\s*([\d.]+)", message, re.IGNORECASE)
+        if not entry_match:
+            return None
+        entry_price = float(entry_match.group(2))
+        
+        # Primeiro, encontra o Stop Loss
+        stop_match = re.search(r"(Stop\s*Loss|SL)\s*[:\-]?\s*([\d.]+)", message, re.IGNORECASE)
+        stop_loss = float(stop_match.group(2)) if stop_match else None
+        
+        if stop_loss is None:
+            return None
+        
+        # Agora procura targets, MAS para antes do Stop Loss
+        targets = []
+        
+        # Procura a seção de targets
+        targets_match = re.search(r"(Targets?|TP)\s*[:\-]?\s*(.+?)(?=(Stop\s*Loss|SL|$))", message, re.IGNORECASE | re.DOTALL)
+        
+        if targets_match:
+            targets_text = targets_match.group(2)
+            # Extrai apenas números da seção de targets
+            nums = re.findall(r"[\d.]+", targets_text)
+            for num in nums:
+                try:
+                    val = float(num)
+                    # Ignora se for igual ao stop loss ou entry
+                    if val != stop_loss and val != entry_price and val > 0:
+                        targets.append(val)
+                except Exception:
+                    continue
+        
+        if not targets:
+            return None
+        
+        # Determina side baseado na direção dos targets
+        side = None
+        if targets[0] > entry_price:
+            side = "long"
+        elif targets[0] < entry_price:
+            side = "short"
+        
+        # Se não detectou, procura palavras-chave
+        if not side:
+            if re.search(r"\bshort\b|\bsell\b", message, re.IGNORECASE):
+                side = "short"
+            elif re.search(r"\blong\b|\bbuy\b", message, re.IGNORECASE):
+                side = "long"
+        
+        # Leverage
+        lev = None
+        lev_m = re.search(r"leverage\s*[:\-]?\s*(\d+)\s*x", message, re.IGNORECASE)
+        if lev_m:
+            lev = int(lev_m.group(1))
+        
+        # Market
+        market = None
+        if re.search(r"futures?", message, re.IGNORECASE) or side == "short" or lev:
+            market = "futures"
+        
+        return _validate_struct({
+            "pair": pair,
+            "entry": entry_price,
+            "targets": targets,
+            "stop_loss": stop_loss,
+            "side": side,
+            "leverage": lev,
+            "market": market
+        })
+        
+    except Exception as e:
+        logging.error(f"Regex parse error: {e}")
+        return None
+
+
+def bench(func, messages, number):
+    timer = timeit.Timer(lambda: [func(m) for m in messages])
+    best = min(timer.repeat(repeat=5, number=number))
+    return best / (number * len(messages)) * 1e6
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("=" * 60)
+    print("  Regex Parser Benchmark")
+    print("=" * 60)
+
+    mismatches = [m for m in SAMPLES if legacy_regex_parse(m) != _regex_parse(m)]
+    if mismatches:
+        print(f"✗ {len(mismatches)} message(s) parse differently:")
+        for m in mismatches:
+            print(f"   • {m[:60]!r}")
+        return 1
+    print(f"✓ Same output on {len(SAMPLES)} samples")
+
+    before = bench(legacy_regex_parse, SAMPLES, number)
+    after = bench(_regex_parse, SAMPLES, number)
+    print()
+    print(f"   before: {before:8.2f} µs/message")
+    print(f"   after:  {after:8.2f} µs/message")
+    print(f"   speedup: {before / after:.2f}x")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
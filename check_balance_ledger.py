@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Script para testar o ledger de saldos sem rede: um servidor websocket local faz o papel
+do user data stream (outboundAccountPosition / ACCOUNT_UPDATE / listenKeyExpired) e um
+client falso responde listenKey, keepalive e snapshots REST.
+
+Uso: python check_balance_ledger.py
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+
+import balance_ledger
+import trader
+
+
+class StandIn:
+    """User data stream local: guarda as conexões abertas e envia eventos sob demanda"""
+
+    def __init__(self):
+        self.port = None
+        self.paths = []
+        self._sockets = []
+        self._ready = threading.Event()
+        self._loop = None
+        threading.Thread(target=self._run, name="uds-stand-in", daemon=True).start()
+        self._ready.wait(5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._serve())
+
+    async def _serve(self):
+        import websockets
+
+        async def handler(ws, *args):
+            request = getattr(ws, "request", None)
+            self.paths.append(getattr(request, "path", args[0] if args else ""))
+            self._sockets.append(ws)
+            await ws.wait_closed()
+
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            self.port = list(server.sockets)[0].getsockname()[1]
+            self._ready.set()
+            await asyncio.Future()
+
+    def push(self, event: dict, path_suffix: str):
+        async def send():
+            for ws, path in zip(list(self._sockets), list(self.paths)):
+                if path.endswith(path_suffix):
+                    try:
+                        await ws.send(json.dumps(event))
+                    except Exception:
+                        pass
+        asyncio.run_coroutine_threadsafe(send(), self._loop).result(5)
+
+
+class FakeClient:
+    """Client com saldos REST controláveis e contagem das chamadas"""
+
+    API_KEY = "check-ledger"
+
+    def __init__(self):
+        self.spot_usdt = 100.0
+        self.futures_usdt = 500.0
+        self.rest_calls = 0
+        self.keys = {"spot": 0, "futures": 0}
+        self.keepalives = 0
+
+    def get_account(self):
+        self.rest_calls += 1
+        return {"balances": [{"asset": "USDT", "free": str(self.spot_usdt), "locked": "0"},
+                             {"asset": "BTC", "free": "0.01", "locked": "0"}]}
+
+    def futures_account_balance(self):
+        self.rest_calls += 1
+        return [{"asset": "USDT", "balance": str(self.futures_usdt)}]
+
+    def stream_get_listen_key(self):
+        self.keys["spot"] += 1
+        return f"spotkey{self.keys['spot']}"
+
+    def futures_stream_get_listen_key(self):
+        self.keys["futures"] += 1
+        return f"futkey{self.keys['futures']}"
+
+    def stream_keepalive(self, listenKey):
+        self.keepalives += 1
+        return {}
+
+    def futures_stream_keepalive(self, listenKey):
+        self.keepalives += 1
+        return {}
+
+
+def wait_for(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main():
+    print("=" * 60)
+    print("  Balance Ledger Check")
+    print("=" * 60)
+
+    server = StandIn()
+    if server.port is None:
+        print("✗ Could not start the local websocket stand-in")
+        return 1
+    url = f"ws://127.0.0.1:{server.port}"
+    client = FakeClient()
+    ledgers = balance_ledger.start_balance_ledgers({"user_data_stream": {
+        "enabled": True, "reconcile_sec": 1.0, "keepalive_sec": 0.3, "spot_url": url, "futures_url": url}}, client)
+    spot, futures = ledgers["spot"], ledgers["futures"]
+    failures = 0
+
+    def check(ok: bool, label: str):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {label}")
+        failures += 0 if ok else 1
+
+    try:
+        check(wait_for(lambda: spot.connected and futures.connected, 5), "user data streams connected")
+        check(any(p.endswith("/ws/spotkey1") for p in server.paths)
+              and any(p.endswith("/ws/futkey1") for p in server.paths), "listenKey used in stream path")
+
+        calls = client.rest_calls
+        free_spot, free_fut = trader.get_usdt_free_spot(client), trader.get_usdt_free_futures(client)
+        check(free_spot == 100.0 and free_fut == 500.0 and client.rest_calls == calls,
+              f"balances served from the ledger (spot {free_spot}, futures {free_fut}, no REST)")
+
+        server.push({"e": "outboundAccountPosition", "E": 1, "u": 1,
+                     "B": [{"a": "USDT", "f": "85.5", "l": "0"}]}, "spotkey1")
+        server.push({"e": "ACCOUNT_UPDATE", "E": 1, "T": 1, "a": {"m": "ORDER",
+                     "B": [{"a": "USDT", "wb": "480.25", "cw": "480.25", "bc": "0"}], "P": []}}, "futkey1")
+        check(wait_for(lambda: trader.get_usdt_free_spot(client) == 85.5
+                       and trader.get_usdt_free_futures(client) == 480.25, 2), "stream events update the ledger")
+
+        check(wait_for(lambda: client.keepalives >= 2, 2), f"listenKey keepalive sent ({client.keepalives})")
+
+        # Saldo mudou por fora do stream: a reconciliação periódica corrige
+        client.spot_usdt = 70.0
+        check(wait_for(lambda: spot.free("USDT") == 70.0, 3), "periodic reconcile fixes drift")
+
+        server.push({"e": "listenKeyExpired", "E": 2}, "spotkey1")
+        check(wait_for(lambda: any(p.endswith("/ws/spotkey2") for p in server.paths), 5),
+              "expired listenKey replaced and stream reconnected")
+
+        print(f"  spot: {spot.stats()}")
+        print(f"  futures: {futures.stats()}")
+    finally:
+        balance_ledger.stop_balance_ledgers()
+
+    calls = client.rest_calls
+    trader.get_usdt_free_spot(client)
+    check(client.rest_calls == calls + 1, "REST used once the ledger is stopped")
+
+    print("=" * 60)
+    print("✓ All checks passed" if not failures else f"✗ {failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Script para verificar que o pool de clients da Binance cria apenas um Client por processo
+(usa um client stub, não faz nenhuma chamada de rede)
+"""
+
+import sys
+
+import client_pool
+import trader
+
+
+class StubClient:
+    """Client falso com as chamadas usadas pelo trader"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_exchange_info(self):
+        self.calls.append("get_exchange_info")
+        return {"symbols": [{"symbol": "BTCUSDT"}]}
+
+    def futures_exchange_info(self):
+        self.calls.append("futures_exchange_info")
+        return {"symbols": [{"symbol": "BTCUSDT"}]}
+
+    def get_account(self):
+        return {"balances": [{"asset": "USDT", "free": "1000"}]}
+
+    def futures_account_balance(self):
+        return [{"asset": "USDT", "balance": "1000"}]
+
+    def get_symbol_ticker(self, symbol):
+        return {"symbol": symbol, "price": "50000"}
+
+    def futures_symbol_ticker(self, symbol):
+        return {"symbol": symbol, "price": "50000"}
+
+    def futures_change_leverage(self, symbol, leverage):
+        return {"symbol": symbol, "leverage": leverage}
+
+    def order_market_buy(self, symbol, quoteOrderQty):
+        return {"executedQty": str(round(float(quoteOrderQty) / 50000, 6))}
+
+    def create_oco_order(self, **params):
+        return {"orderListId": len(self.calls)}
+
+    def futures_create_order(self, **params):
+        return {"orderId": len(self.calls)}
+
+    def futures_place_batch_order(self, batchOrders):
+        return [{"orderId": i} for i, _ in enumerate(batchOrders)]
+
+    def close_connection(self):
+        pass
+
+
+def main():
+    print("=" * 60)
+    print("  Binance Client Pool Check")
+    print("=" * 60)
+
+    constructed = []
+
+    def factory(api_key, api_secret, pool_size, timeout):
+        constructed.append((api_key, pool_size, timeout))
+        return StubClient()
+
+    pool = client_pool.set_client_factory(factory)
+    cfg = {
+        "binance_api_key": "stub", "binance_api_secret": "stub",
+        "binance_pool_size": 4, "binance_timeout_sec": 5,
+        "telegram_token": "", "telegram_chat_id": "",
+    }
+
+    results = []
+    for _ in range(3):
+        results.append(trader.execute_spot(cfg, "BTCUSDT", 50000.0, [51000.0, 52000.0], 49000.0, False, [0.5, 0.5]))
+        results.append(trader.execute_futures(cfg, "BTCUSDT", "long", 5, [51000.0, 52000.0], 49000.0, False, [0.5, 0.5]))
+
+    for r in results:
+        print(f"   • {r}")
+
+    ok = len(constructed) == 1 and pool.created == 1
+    print()
+    if ok:
+        print(f"✓ {len(results)} executions used {len(constructed)} client construction(s)")
+    else:
+        print(f"✗ Expected 1 client construction, got {len(constructed)}")
+    print("=" * 60)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
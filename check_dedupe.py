@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Script para testar o índice de dedupe: impressão canônica dos sinais, claim atômico
+entre threads, janela de tempo, limite do LRU e persistência entre restarts.
+
+Uso: python check_dedupe.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from dedupe import DedupeIndex, message_key, signal_fingerprint
+
+
+def main():
+    print("=" * 60)
+    print("  Dedupe Index Check")
+    print("=" * 60)
+    failures = 0
+
+    def check(ok: bool, label: str):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {label}")
+        failures += 0 if ok else 1
+
+    a = {"pair": "BTC/USDT", "entry": 50000.0, "targets": [51000.0, 52000.0], "stop_loss": 49000.0, "side": "long"}
+    b = {"pair": "btcusdt", "entry": "50000.00", "targets": ["51000", "52000.0"], "stop_loss": 49000, "leverage": 5}
+    c = dict(a, side="short")
+    check(signal_fingerprint(a) == signal_fingerprint(b), "same signal in different formats -> same fingerprint")
+    check(signal_fingerprint(a) != signal_fingerprint(c), "different side -> different fingerprint")
+
+    path = os.path.join(tempfile.mkdtemp(), "dedupe.sqlite")
+    index = DedupeIndex(window=0.5, max_entries=100, path=path)
+
+    # 16 workers recebendo o mesmo sinal ao mesmo tempo: só um executa
+    barrier, wins = threading.Barrier(16), []
+    def worker():
+        barrier.wait()
+        wins.append(index.claim(signal_fingerprint(a)))
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    check(wins.count(True) == 1, f"concurrent claims: {wins.count(True)} winner, {wins.count(False)} duplicates")
+
+    check(index.claim(message_key(123)) and not index.claim(message_key(123)), "message id claimed once")
+    index.release(message_key(123))
+    check(index.claim(message_key(123)), "released key can be claimed again")
+
+    time.sleep(0.6)
+    check(index.claim(signal_fingerprint(a)), "claim allowed again after the window")
+
+    for i in range(250):
+        index.claim(message_key(f"bulk{i}"))
+    check(len(index._entries) == 100, f"LRU bounded to max_entries ({len(index._entries)})")
+
+    index.window = 3600.0
+    index.claim(message_key("persisted"))
+    index.close()
+    restarted = DedupeIndex(window=3600.0, max_entries=100, path=path)
+    check(restarted.seen(message_key("persisted")) and not restarted.claim(message_key("persisted")),
+          "claims survive a restart")
+
+    n = 5000
+    start = time.perf_counter()
+    for i in range(n):
+        restarted.seen(message_key(i))
+    lookup_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for i in range(n):
+        restarted.claim(message_key(f"t{i}"))
+    claim_us = (time.perf_counter() - start) / n * 1e6
+    check(lookup_us < 50, f"lookup {lookup_us:.1f} µs, persisted claim {claim_us:.1f} µs")
+    restarted.close()
+
+    print("=" * 60)
+    print("✓ All checks passed" if not failures else f"✗ {failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
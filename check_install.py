@@ -89,6 +89,18 @@ def check_gemini():
         print("   ℹ Install with: pip install google-generativeai")
         return True  # Não é crítico
 
+def check_numpy():
+    """Verifica instalação do numpy (opcional, usado pelo backtest)"""
+    print("\n🔍 Checking numpy (optional)...")
+    try:
+        import numpy
+        print(f"   ✓ numpy installed (version: {numpy.__version__})")
+        return True
+    except ImportError:
+        print("   ⚠ numpy not found (optional, needed for backtest.py)")
+        print("   ℹ Install with: pip install numpy")
+        return True  # Não é crítico
+
 def check_config():
     """Verifica se config.json existe"""
     print("\n🔍 Checking config.json...")
@@ -112,10 +124,10 @@ def check_config():
         else:
             print("   ⚠ discord_token not configured")
         
-        if config.get("channel_id"):
-            print("   ✓ channel_id configured")
+        if config.get("channel_id") or config.get("channels"):
+            print("   ✓ channel_id / channels configured")
         else:
-            print("   ⚠ channel_id not configured")
+            print("   ⚠ channel_id / channels not configured")
         
         return True
         
@@ -138,6 +150,7 @@ def main():
         ("Binance Library", check_binance),
         ("Requests Library", check_requests),
         ("Gemini AI (Optional)", check_gemini),
+        ("NumPy (Optional)", check_numpy),
         ("Configuration", check_config),
     ]
     
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Script para testar o journal de trades: roda sinais contra a exchange simulada dentro de
+um trace, confere que mensagens, sizing, ordens e resultados foram gravados (WAL, em lote)
+e mede o custo de log_event no caminho do sinal.
+
+Uso: python check_journal.py [--events 5000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import journal
+import trader
+import tracing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trade journal check")
+    parser.add_argument("--events", type=int, default=5000)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Trade Journal Check")
+    print("=" * 60)
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "journal.sqlite")
+    tracing.configure(None)
+    jr = journal.configure(path, batch_size=100, flush_interval=0.2)
+    failures = 0
+
+    def check(ok: bool, label: str):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {label}")
+        failures += 0 if ok else 1
+
+    cfg = {
+        "test_mode": True, "telegram_token": "", "telegram_chat_id": "",
+        "futures_working_type": "MARK_PRICE", "futures_default_leverage": 5,
+        "sim_exchange": {"enabled": True, "latency_ms": 0, "latency_jitter_ms": 0, "seed": 3},
+    }
+    sim = trader.get_binance_client(cfg, test_mode=True).client
+    sim.prices.anchor("BTCUSDT", 50000.0)
+    sim.prices.anchor("ETHUSDT", 3000.0)
+    with tracing.start_trace("sig-spot"):
+        journal.log_event("message", content="BTC/USDT buy 50000 tp 51000 52000 sl 49000")
+        trader.execute_spot(cfg, "BTCUSDT", 50000.0, [51000.0, 52000.0], 49000.0, True, [0.5, 0.5])
+        journal.log_event("result", symbol="BTCUSDT", result="ok")
+    with tracing.start_trace("sig-futures"):
+        trader.execute_futures(cfg, "ETHUSDT", "long", 5, [3100.0, 3200.0], 2900.0, True, [0.5, 0.5])
+    check(jr.flush(5), "writer drained the queue")
+
+    spot = jr.by_signal("sig-spot")
+    kinds = [e["kind"] for e in spot]
+    check(kinds[0] == "message" and "sizing" in kinds and "order" in kinds and kinds[-1] == "result",
+          f"spot signal journaled in order ({', '.join(kinds)})")
+    orders = [e for e in spot if e["kind"] == "order"]
+    check(all(e["duration_ms"] is not None and e["data"].get("request") for e in orders),
+          f"{len(orders)} spot order(s) with request, response and latency")
+    fut = jr.query(signal_id="sig-futures", kind="order")
+    check(any(e["data"]["endpoint"] == "futures_place_batch_order" for e in fut)
+          and all(e["symbol"] == "ETHUSDT" for e in fut), f"{len(fut)} futures order event(s) tagged ETHUSDT")
+    check(len(jr.by_symbol("ethusdt", since=time.time() - 60)) == len(fut) + 1, "query by symbol and date")
+    check(not jr.between(time.time() + 60), "empty window returns nothing")
+
+    db = sqlite3.connect(path)
+    mode = db.execute("PRAGMA journal_mode").fetchone()[0]
+    plans = " ".join(r[-1] for r in db.execute("EXPLAIN QUERY PLAN SELECT * FROM events WHERE symbol = ? AND ts >= ?",
+                                                ("BTCUSDT", 0)))
+    db.close()
+    check(mode == "wal", f"journal_mode={mode}")
+    check("idx_events_symbol_ts" in plans, "symbol/date query uses the index")
+
+    # Custo do log_event no caminho quente (só enfileira)
+    start = time.perf_counter()
+    with tracing.start_trace("bench"):
+        for i in range(args.events):
+            journal.log_event("sizing", symbol="BTCUSDT", market="spot", qty=i, price=50000.0)
+    per_event_us = (time.perf_counter() - start) / args.events * 1e6
+    check(jr.flush(30), "bulk events flushed")
+    stats = jr.stats()
+    check(stats["dropped"] == 0 and stats["written"] >= args.events, f"log_event {per_event_us:.1f} µs/event, {stats}")
+
+    journal.configure(None)
+    print("=" * 60)
+    print("✓ All checks passed" if not failures else f"✗ {failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
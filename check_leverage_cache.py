@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Script para testar o cache de alavancagem/margin type contra a exchange simulada:
+seed pelo symbol config, chamadas evitadas quando nada muda, watch list, margin type,
+ACCOUNT_CONFIG_UPDATE, TTL sem o user data stream e sinais de futures repetidos pelo caminho real do trader.
+
+Uso: python check_leverage_cache.py
+"""
+
+import sys
+import threading
+import time
+
+import leverage_cache
+import trader
+from leverage_cache import LeverageCache, parse_symbol_config, warm_leverage_cache
+from sim_exchange import SimulatedExchange
+
+
+def main():
+    print("=" * 60)
+    print("  Leverage Cache Check")
+    print("=" * 60)
+    failures = 0
+
+    def check(ok: bool, label: str):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {label}")
+        failures += 0 if ok else 1
+
+    # Position risk v3 (o que o python-binance chama hoje): sem leverage/marginType, não serve de seed
+    v3 = [{"symbol": "BTCUSDT", "positionSide": "BOTH", "positionAmt": "0.010", "entryPrice": "50000.0",
+           "notional": "500.0", "isolatedMargin": "0", "marginAsset": "USDT", "updateTime": 0}]
+    check(parse_symbol_config(v3) == {}, "v3 position risk rows carry no leverage -> not used for the seed")
+    check(parse_symbol_config([{"symbol": "BTCUSDT", "marginType": "CROSSED", "isAutoAddMargin": "false",
+                                "leverage": 21, "maxNotionalValue": "1000000"}])
+          == {"BTCUSDT": {"leverage": 21, "margin_type": "cross"}}, "symbolConfig row parsed (CROSSED -> cross)")
+
+    sim = SimulatedExchange(symbols=["BTCUSDT", "ETHUSDT", "SOLUSDT"], seed=1)
+    check(sim.futures_position_information() == [], "simulated position risk has the v3 shape (open positions only)")
+    cache = LeverageCache(sim)
+    check(cache.seed() == 3 and cache.get("BTCUSDT") == {"leverage": 20, "margin_type": "cross"}
+          and sim.calls.get("futures_symbol_config") == 1, f"seeded from symbol config: {cache.stats()}")
+
+    check(not cache.ensure("BTCUSDT", 20) and "futures_change_leverage" not in sim.calls,
+          "same leverage as the exchange -> no REST call")
+    check(cache.ensure("BTCUSDT", 10) and sim.leverage["BTCUSDT"] == 10, "different leverage -> changed once")
+    check(not cache.ensure("BTCUSDT", 10) and sim.calls["futures_change_leverage"] == 1, "repeated signal served by the cache")
+
+    check(cache.ensure("ETHUSDT", 20, "isolated") and sim.margin_types["ETHUSDT"] == "isolated"
+          and sim.calls["futures_change_leverage"] == 1,
+          "margin type changed without touching an unchanged leverage")
+    sim.margin_types["SOLUSDT"] = "isolated"       # mudado no site; o cache ainda acha que é cross
+    check(not cache.ensure("SOLUSDT", 20, "isolated") and cache.get("SOLUSDT")["margin_type"] == "isolated",
+          "\"No need to change margin type\" (-4046) is treated as already set")
+
+    try:
+        cache.ensure("ETHUSDT", 500)
+        check(False, "invalid leverage raises")
+    except Exception as e:
+        check(cache.get("ETHUSDT") is None, f"invalid leverage raises and forgets the symbol ({e.message})")
+
+    cache.on_event({"e": "ACCOUNT_CONFIG_UPDATE", "ac": {"s": "BTCUSDT", "l": 25}})
+    check(cache.get("BTCUSDT")["leverage"] == 25, "ACCOUNT_CONFIG_UPDATE updates the cache")
+
+    # 8 sinais simultâneos no mesmo símbolo: uma mudança só
+    before = sim.calls["futures_change_leverage"]
+    barrier = threading.Barrier(8)
+    def worker():
+        barrier.wait()
+        cache.ensure("BTCUSDT", 7)
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    check(sim.calls["futures_change_leverage"] - before == 1, "concurrent signals on one symbol -> one change")
+
+    # Sem o stream de Futures, uma alavancagem mudada no site só é corrigida depois do TTL
+    short = LeverageCache(sim, ttl_sec=0.05)
+    short.seed()
+    sim.leverage["SOLUSDT"] = 3                     # mudado no site, sem ACCOUNT_CONFIG_UPDATE
+    check(not short.ensure("SOLUSDT", 20), "within the TTL the cached leverage is trusted")
+    time.sleep(0.08)
+    check(short.ensure("SOLUSDT", 20) and sim.leverage["SOLUSDT"] == 20 and short.expired == 1,
+          "expired entry -> leverage applied again on the exchange")
+
+    class Connected:
+        connected = True
+    real_get_ledger = leverage_cache.get_ledger
+    leverage_cache.get_ledger = lambda client, market: Connected()
+    try:
+        time.sleep(0.08)
+        check(short.get("SOLUSDT") is not None and short.stats()["stream"],
+              "futures user data stream connected -> entries trusted past the TTL")
+    finally:
+        leverage_cache.get_ledger = real_get_ledger
+
+    # Watch list + caminho real do trader (exchange simulada do processo, com latência)
+    cfg = {
+        "test_mode": True, "telegram_token": "", "telegram_chat_id": "",
+        "futures_working_type": "MARK_PRICE", "futures_default_leverage": 5,
+        "leverage_cache": {"enabled": True, "watch_symbols": ["ETHUSDT", "BTCUSDT"]},
+        "sim_exchange": {"enabled": True, "latency_ms": 20, "latency_jitter_ms": 0, "seed": 3},
+    }
+    client = trader.get_binance_client(cfg, test_mode=True)
+    summary = warm_leverage_cache(cfg, client)
+    check("2 changed" in summary, f"watch list preset: {summary}")
+    process_sim = client.client
+    process_sim.prices.anchor("ETHUSDT", 3000.0)
+    before = process_sim.calls.get("futures_change_leverage", 0)
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        result = trader.execute_futures(cfg, "ETHUSDT", "long", 5, [3100.0, 3200.0], 2900.0, True, [0.5, 0.5])
+        timings.append((time.perf_counter() - start) * 1000.0)
+    check("OK" in result and process_sim.calls.get("futures_change_leverage", 0) == before,
+          f"3 futures signals, 0 leverage calls ({' / '.join(f'{t:.0f}' for t in timings)} ms)")
+
+    print("=" * 60)
+    print("✓ All checks passed" if not failures else f"✗ {failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Script para testar o cache de preços via websocket sem rede: sobe um servidor local
+que imita os streams combinados da Binance (bookTicker / markPrice) e confere
+atualização do cache, detecção de dado velho e o fallback para o REST no trader.
+
+Uso: python check_market_data.py [--max-age 1.0] [--interval-ms 50]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+
+import market_data
+import trader
+
+
+class StandIn:
+    """Servidor websocket local que emite frames de stream combinado até ser pausado"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.port = None
+        self.paused = threading.Event()
+        self.paths = []
+        self._ready = threading.Event()
+        self._loop = None
+        threading.Thread(target=self._run, name="ws-stand-in", daemon=True).start()
+        self._ready.wait(5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._serve())
+
+    async def _serve(self):
+        import websockets
+
+        async def handler(ws, *args):
+            request = getattr(ws, "request", None)
+            self.paths.append(getattr(request, "path", args[0] if args else ""))
+            tick = 0
+            while True:
+                if not self.paused.is_set():
+                    tick += 1
+                    await ws.send(json.dumps({"stream": "btcusdt@bookTicker", "data": {
+                        "u": tick, "s": "BTCUSDT", "b": f"{50000 + tick:.2f}", "B": "1", "a": f"{50002 + tick:.2f}", "A": "1"}}))
+                    await ws.send(json.dumps({"stream": "btcusdt@markPrice@1s", "data": {
+                        "e": "markPriceUpdate", "E": tick, "s": "BTCUSDT", "p": f"{50010 + tick:.2f}"}}))
+                await asyncio.sleep(self.interval)
+
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            self.port = list(server.sockets)[0].getsockname()[1]
+            self._ready.set()
+            await asyncio.Future()
+
+
+class RestClient:
+    """Client mínimo que só conta as chamadas de ticker REST"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_symbol_ticker(self, symbol):
+        self.calls += 1
+        return {"symbol": symbol, "price": "1.0"}
+
+    def futures_symbol_ticker(self, symbol):
+        self.calls += 1
+        return {"symbol": symbol, "price": "2.0"}
+
+
+def wait_for(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Market data cache check")
+    parser.add_argument("--max-age", type=float, default=1.0)
+    parser.add_argument("--interval-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Market Data Check")
+    print("=" * 60)
+
+    server = StandIn(args.interval_ms / 1000.0)
+    if server.port is None:
+        print("✗ Could not start the local websocket stand-in")
+        return 1
+    url = f"ws://127.0.0.1:{server.port}"
+    services = market_data.start_market_data({"market_data": {
+        "enabled": True, "symbols": ["BTCUSDT"], "max_age_sec": args.max_age,
+        "spot_url": url, "futures_url": url}})
+    spot, futures = services["spot"], services["futures"]
+    failures = 0
+
+    def check(ok: bool, label: str):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {label}")
+        failures += 0 if ok else 1
+
+    try:
+        check(wait_for(lambda: spot.price("BTCUSDT") and futures.price("BTCUSDT"), 5), "cache filled from the stream")
+        check(any("btcusdt@bookTicker" in p for p in server.paths)
+              and any("btcusdt@markPrice@1s" in p for p in server.paths), "combined stream names requested")
+
+        rest = RestClient()
+        p_spot = trader.spot_last_price(rest, "BTCUSDT")
+        p_fut = trader.futures_last_price(rest, "BTCUSDT")
+        check(rest.calls == 0 and p_spot > 50000 and p_fut > 50000,
+              f"hot path served from cache (spot {p_spot:.2f}, futures {p_fut:.2f}, REST calls {rest.calls})")
+        first = spot.price("BTCUSDT")
+        check(wait_for(lambda: spot.price("BTCUSDT") != first, 2), "cache follows new frames")
+
+        trader.spot_last_price(rest, "ETHUSDT")
+        check(rest.calls == 1, "unknown symbol falls back to REST")
+
+        server.paused.set()
+        check(wait_for(lambda: spot.price("BTCUSDT") is None, args.max_age * 3), "stale price detected after stream pause")
+        calls = rest.calls
+        check(trader.futures_last_price(rest, "BTCUSDT") == 2.0 and rest.calls == calls + 1, "stale price falls back to REST")
+
+        server.paused.clear()
+        check(wait_for(lambda: spot.price("BTCUSDT") is not None, 2), "cache recovers when frames resume")
+        print(f"  spot: {spot.stats()}")
+        print(f"  futures: {futures.stats()}")
+    finally:
+        market_data.stop_market_data()
+
+    print("=" * 60)
+    print("✓ All checks passed" if not failures else f"✗ {failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
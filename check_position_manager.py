@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Script para testar o position manager sem rede: um client falso registra as chamadas
+e os eventos do user data stream (executionReport / ORDER_TRADE_UPDATE / ACCOUNT_UPDATE)
+são injetados direto no manager, como o stream faria.
+
+Uso: python check_position_manager.py
+"""
+
+import itertools
+import sys
+import time
+
+from position_manager import PositionManager, start_position_manager
+
+ACCOUNT = "check-pm"
+
+
+class FakeClient:
+    """Client que só registra as chamadas e devolve ids novos"""
+
+    API_KEY = ACCOUNT
+
+    def __init__(self):
+        self.calls = []
+        self._ids = itertools.count(1000)
+
+    def cancel_order(self, **params):
+        self.calls.append(("cancel_order", params))
+        return {"orderId": params["orderId"], "status": "CANCELED"}
+
+    def create_oco_order(self, **params):
+        self.calls.append(("create_oco_order", params))
+        list_id, sl_id, tp_id = next(self._ids), next(self._ids), next(self._ids)
+        return {"orderListId": list_id, "orders": [{"orderId": sl_id}, {"orderId": tp_id}]}
+
+    def futures_cancel_order(self, **params):
+        self.calls.append(("futures_cancel_order", params))
+        return {"orderId": params["orderId"], "status": "CANCELED"}
+
+    def futures_create_order(self, **params):
+        self.calls.append(("futures_create_order", params))
+        return {"orderId": next(self._ids), "status": "NEW"}
+
+
+class RejectingOcoClient(FakeClient):
+    """Recusa as OCOs novas com stop em `reject_stops` (None = recusa todas)"""
+
+    def __init__(self, reject_stops=None):
+        super().__init__()
+        self.reject_stops = reject_stops
+
+    def create_oco_order(self, **params):
+        if self.reject_stops is None or params["stopPrice"] in self.reject_stops:
+            self.calls.append(("create_oco_rejected", params))
+            raise RuntimeError("APIError(code=-2010): Order would trigger immediately.")
+        return super().create_oco_order(**params)
+
+
+def spot_report(order_id: int, status: str, order_type: str, list_id: int) -> dict:
+    return {"e": "executionReport", "s": "BTCUSDT", "i": order_id, "X": status, "o": order_type, "g": list_id,
+            "z": "0.01", "Z": "510"}
+
+
+def futures_update(order_id: int, status: str, order_type: str, symbol: str = "ETHUSDT") -> dict:
+    return {"e": "ORDER_TRADE_UPDATE", "o": {"s": symbol, "i": order_id, "X": status, "o": order_type, "ap": "0"}}
+
+
+def main():
+    print("=" * 60)
+    print("  Position Manager Check")
+    print("=" * 60)
+    failures = 0
+
+    def check(ok: bool, label: str):
+        nonlocal failures
+        print(f"{'✓' if ok else '✗'} {label}")
+        failures += 0 if ok else 1
+
+    cfg = {"telegram_token": "", "telegram_chat_id": ""}
+    pm = PositionManager(breakeven_after=1)
+
+    # ---- Futures: T1 -> stop na entrada; SL -> cancela TPs restantes ----
+    client = FakeClient()
+    pm.track_futures(cfg, client, "ETHUSDT", "long", {"orderId": 1, "avgPrice": "3000.5"}, 3000.0, 2900.0,
+                     {"orderId": 2}, [({"orderId": 3}, 0.05, 3100.0), ({"orderId": 4}, 0.05, 3200.0)])
+    pm.on_event(ACCOUNT, "futures", futures_update(3, "PARTIALLY_FILLED", "TAKE_PROFIT"))
+    pm.on_event(ACCOUNT, "futures", futures_update(3, "FILLED", "TAKE_PROFIT"))
+    pm.flush()
+    new_sl = [c for c in client.calls if c[0] == "futures_create_order"]
+    check(client.calls[0] == ("futures_cancel_order", {"symbol": "ETHUSDT", "orderId": 2})
+          and len(new_sl) == 1 and new_sl[0][1]["stopPrice"] == "3000.5" and new_sl[0][1]["closePosition"],
+          f"futures T1 fill moved the stop to entry in {pm.last_reaction_ms:.2f} ms")
+    sl_id = (pm.open_trades()[0].sl_id if pm.open_trades() else None)
+    client.calls.clear()
+    pm.on_event(ACCOUNT, "futures", futures_update(2, "CANCELED", "STOP_MARKET"))      # eco do nosso cancel
+    pm.on_event(ACCOUNT, "futures", futures_update(sl_id, "FILLED", "STOP_MARKET"))
+    pm.flush()
+    check(client.calls == [("futures_cancel_order", {"symbol": "ETHUSDT", "orderId": 4})] and not pm.open_trades(),
+          f"break-even stop fill cancelled the orphan TP in {pm.last_reaction_ms:.2f} ms")
+
+    # ---- Futures: posição zerada por fora -> cancela tudo ----
+    client = FakeClient()
+    pm.track_futures(cfg, client, "SOLUSDT", "short", {"orderId": 11}, 150.0, 160.0,
+                     {"orderId": 12}, [({"orderId": 13}, 1, 140.0), ({"error": "rejected"}, 1, 130.0)])
+    pm.on_event(ACCOUNT, "futures", {"e": "ACCOUNT_UPDATE", "a": {"B": [], "P": [{"s": "SOLUSDT", "pa": "0"}]}})
+    pm.flush()
+    cancelled = sorted(c[1]["orderId"] for c in client.calls if c[0] == "futures_cancel_order")
+    check(cancelled == [12, 13] and not pm.open_trades(), "manual close cancelled SL and TP")
+
+    # ---- Spot: T1 da OCO 1 -> OCO 2 refeita com stop na entrada ----
+    client = FakeClient()
+    pm.track_spot(cfg, client, "BTCUSDT", 50000.0, 49000.0,
+                  [({"orderListId": 21, "orders": [{"orderId": 22}, {"orderId": 23}]}, 0.01, 51000.0),
+                   ({"orderListId": 24, "orderReports": [{"orderId": 26, "type": "LIMIT_MAKER"},
+                                                         {"orderId": 25, "type": "STOP_LOSS_LIMIT"}]}, 0.01, 52000.0)])
+    pm.on_event(ACCOUNT, "spot", spot_report(23, "FILLED", "LIMIT_MAKER", 21))
+    pm.on_event(ACCOUNT, "spot", spot_report(22, "EXPIRED", "STOP_LOSS_LIMIT", 21))    # a Binance expira a outra perna
+    pm.flush()
+    names = [c[0] for c in client.calls]
+    oco = next((c[1] for c in client.calls if c[0] == "create_oco_order"), {})
+    check(names == ["cancel_order", "create_oco_order"] and client.calls[0][1]["orderId"] == 25
+          and oco.get("stopPrice") == "50000" and oco.get("price") == "52000",
+          f"spot T1 fill re-created the remaining OCO with stop at entry in {pm.last_reaction_ms:.2f} ms")
+    trade = pm.open_trades()[0]
+    new_tp = trade.ocos[1]["tp_id"]
+    pm.on_event(ACCOUNT, "spot", spot_report(new_tp, "FILLED", "LIMIT_MAKER", trade.ocos[1]["list_id"]))
+    pm.flush()
+    check(not pm.open_trades(), "spot trade closed after the last OCO")
+
+    check(pm.errors == 0, f"stats: {pm.stats()}")
+
+    # ---- Spot: OCO cancelada e não recriada -> stop original, ou marcada como desprotegida ----
+    failing = PositionManager(breakeven_after=1)
+    for client, expect in ((RejectingOcoClient({"50000"}), "restored"), (RejectingOcoClient(), "unprotected")):
+        failing.track_spot(cfg, client, "BTCUSDT", 50000.0, 49000.0,
+                           [({"orderListId": 31, "orders": [{"orderId": 32}, {"orderId": 33}]}, 0.01, 51000.0),
+                            ({"orderListId": 34, "orders": [{"orderId": 35}, {"orderId": 36}]}, 0.01, 52000.0)])
+        failing.on_event(ACCOUNT, "spot", spot_report(33, "FILLED", "LIMIT_MAKER", 31))
+        failing.flush()
+        trade = failing.open_trades()[-1] if failing.open_trades() else None
+        if expect == "restored":
+            oco = next((c[1] for c in client.calls if c[0] == "create_oco_order"), {})
+            check(oco.get("stopPrice") == "49000" and trade is not None and not trade.ocos[1]["unprotected"],
+                  "entry stop rejected -> OCO restored with the original stop")
+            failing.on_event(ACCOUNT, "spot", spot_report(trade.ocos[1]["tp_id"], "FILLED", "LIMIT_MAKER", 0))
+            failing.flush()
+        else:
+            rejected = sum(1 for c in client.calls if c[0] == "create_oco_rejected")
+            check(failing.unprotected == 1 and rejected == 4 and not failing.open_trades(),
+                  f"re-create failed {rejected}x -> quantity flagged unprotected ({failing.stats()})")
+
+    # ---- Trades sem evento de encerramento não ficam no mapa para sempre ----
+    stale = PositionManager(breakeven_after=1, max_age_hours=1)
+    client = FakeClient()
+    stale.track_futures(cfg, client, "ETHUSDT", "long", {"orderId": 40, "avgPrice": "3000"}, 3000.0, 2900.0,
+                        {"orderId": 41}, [({"orderId": 42}, 0.1, 3100.0)])
+    check(stale.prune() == 0 and len(stale.open_trades()) == 1, "trade younger than max_age_hours is kept")
+    check(stale.prune(time.monotonic() + 3601) == 1 and not stale.open_trades() and not client.calls,
+          f"stale trade pruned, its orders left alone ({stale.stats()})")
+    check(start_position_manager({"position_manager": {"enabled": True}}, []) is None,
+          "no user data stream -> position manager does not start")
+    print("=" * 60)
+    print("✓ All checks passed" if not failures else f"✗ {failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
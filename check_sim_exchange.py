@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Script para rodar o caminho real de ordens (spot e futures) contra a exchange simulada,
+sem rede: latência, erros 429 e fills parciais configuráveis.
+
+Uso: python check_sim_exchange.py [--csv precos.csv] [--latency-ms 50] [--rate-limit 0.05] [--partial 0.3]
+"""
+
+import argparse
+import sys
+import time
+
+import requests
+
+import rate_limiter
+import sim_exchange
+import symbol_filters as sym_filters
+import symbol_registry
+import trader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated exchange end-to-end check")
+    parser.add_argument("--csv", default="", help="CSV com colunas symbol,price")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--partial", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    cfg = {
+        "test_mode": True, "telegram_token": "", "telegram_chat_id": "",
+        "futures_working_type": "MARK_PRICE", "futures_default_leverage": 5,
+        "sim_exchange": {
+            "enabled": True, "price_csv": args.csv, "latency_ms": args.latency_ms, "latency_jitter_ms": 10,
+            "rate_limit_rate": args.rate_limit, "partial_fill_rate": args.partial, "seed": args.seed,
+        },
+    }
+
+    print("=" * 60)
+    print("  Simulated Exchange Check")
+    print("=" * 60)
+
+    sim = getattr(trader.get_binance_client(cfg, test_mode=True), "client", None)
+    if not isinstance(sim, sim_exchange.SimulatedExchange):
+        print("✗ test_mode with sim_exchange.enabled did not return the simulated exchange")
+        return 1
+    sim.prices.anchor("BTCUSDT", 50000.0)
+    sim.prices.anchor("ETHUSDT", 3000.0)
+
+    runs = [
+        ("spot BTC", lambda: trader.execute_spot(cfg, "BTCUSDT", 50000.0, [51000.0, 52000.0], 48000.0, True, [0.5, 0.5])),
+        ("futures ETH long", lambda: trader.execute_futures(cfg, "ETHUSDT", "long", 5, [3100.0, 3200.0], 2900.0, True, [0.5, 0.5])),
+        ("futures ETH short", lambda: trader.execute_futures(cfg, "ETHUSDT", "short", 3, [2900.0, 2800.0], 3100.0, True, [0.5, 0.5])),
+        ("unlisted symbol", lambda: trader.execute_spot(cfg, "FOOUSDT", 1.0, [1.1], 0.9, True, [1.0])),
+    ]
+    def throttled():
+        return sim.rate_limited + rate_limiter.get_limiter("spot").shed + rate_limiter.get_limiter("futures").shed
+
+    failures = 0
+    for name, run in runs:
+        limited = throttled()
+        t0 = time.perf_counter()
+        result = run()
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"   • {name:<18} {ms:7.1f} ms  {result}")
+        # Com --rate-limit, um 429 injetado (ou a chamada descartada pelo limitador) é resultado esperado
+        expected = "not found" if name == "unlisted symbol" else "[SIM]"
+        if expected not in result and throttled() == limited:
+            failures += 1
+
+    # Timeout depois da Binance aceitar o batch: as ordens abertas são conferidas e nada é duplicado
+    class TimeoutAfterBatch:
+        def __init__(self, inner):
+            self.inner = inner
+        def __getattr__(self, name):
+            return getattr(self.inner, name)
+        def futures_place_batch_order(self, **kwargs):
+            self.inner.futures_place_batch_order(**kwargs)
+            raise requests.exceptions.ReadTimeout("read timed out")
+    sim.positions["ETHUSDT"] = 1.0
+    tps = [dict(symbol="ETHUSDT", side="SELL", type="TAKE_PROFIT", timeInForce="GTC", price=p, stopPrice=p,
+                quantity="0.1", reduceOnly=True) for p in ("3100", "3200")]
+    before = len(sim.orders)
+    placed = trader.futures_place_orders(TimeoutAfterBatch(sim), tps)
+    duplicated = len(sim.orders) - before != len(tps)
+    print(f"   • batch timeout      {len(sim.orders) - before} order(s) created for {len(tps)} TPs, "
+          f"{sum(1 for r in placed if 'orderId' in r)} recovered from open orders")
+    failures += 1 if duplicated or not all("orderId" in r for r in placed) else 0
+
+    # Par listado depois do último load: um miss força um reload (limitado), não espera o TTL
+    listed = [{"symbol": "BTCUSDT"}]
+    registry = symbol_registry.SymbolRegistry("check", lambda: {"symbols": list(listed)}, ttl=900, miss_reload=0.05)
+    registry.load()
+    listed.append({"symbol": "NEWUSDT"})
+    time.sleep(0.06)
+    found = registry.exists("NEWUSDT")
+    throttled_miss = not registry.exists("FOOUSDT") and not registry.exists("BARUSDT")
+    print(f"   • new listing        found={found}, reloads on miss={registry.miss_reloads}")
+    failures += 0 if found and throttled_miss and registry.miss_reloads == 1 else 1
+
+    # Parcelas pequenas: a junção se repete até nenhuma ficar abaixo de minQty/minNotional
+    # (ou sobra uma parcela só, se nem o total passa)
+    prices = (50000.0, 51000.0, 52000.0)
+    for min_notional, total, weights, expect in (("160", "0.004", (0.5, 0.5), 1),
+                                                 ("110", "0.005", (0.2, 0.2, 0.6), 1),
+                                                 ("100", "0.006", (1 / 3, 1 / 3, 1 / 3), 2),
+                                                 ("100", "0.012", (1 / 3, 1 / 3, 1 / 3), 3)):
+        filters = sym_filters.SymbolFilters("BTCUSDT", [
+            {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "100"},
+            {"filterType": "NOTIONAL", "minNotional": min_notional}])
+        slices = filters.split(total, weights, prices)
+        live = sum(1 for q in slices if q > 0)
+        bad = [q for q, p in zip(slices, prices) if q > 0 and filters.violation(q, p)]
+        print(f"   • split {total} min {min_notional:<4} {[sym_filters.fmt(q) for q in slices]}")
+        failures += 1 if live != expect or sum(slices) != sym_filters._dec(total) or (bad and live > 1) else 0
+
+    print()
+    print(f"Calls: {dict(sorted(sim.calls.items()))}")
+    print(f"Rate limited: {sim.rate_limited} | limiter: spot={rate_limiter.get_limiter('spot').stats()['shed']} shed, "
+          f"futures={rate_limiter.get_limiter('futures').stats()['shed']} shed | open orders: {len(sim.orders)} | positions: {sim.positions}")
+    print(f"Spot balances: { {a: round(b['free'] + b['locked'], 8) for a, b in sim.spot_balances.items()} }")
+    print("=" * 60)
+    if failures:
+        print(f"✗ {failures} run(s) did not go through the simulated order path")
+        return 1
+    print("✓ Order paths exercised end to end against the simulated exchange")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# client_pool.py
+
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 10.0
+
+
+def _default_factory(api_key: str, api_secret: str, pool_size: int, timeout: float):
+    """Cria um Client da Binance com sessão keep-alive e pool de conexões dimensionado"""
+    from binance.client import Client
+    from requests.adapters import HTTPAdapter
+
+    client = Client(api_key, api_secret, requests_params={"timeout": timeout})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    client.session.mount("https://", adapter)
+    client.session.mount("http://", adapter)
+    return client
+
+
+class ClientPool:
+    """Mantém um Client por conjunto de credenciais durante toda a vida do processo"""
+
+    def __init__(self, factory: Optional[Callable] = None):
+        self._factory = factory or _default_factory
+        self._clients: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def get(self, api_key: str, api_secret: str,
+            pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        key = (api_key or "", api_secret or "")
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._factory(key[0], key[1], max(1, int(pool_size)), float(timeout))
+                self._clients[key] = client
+                self.created += 1
+                logging.info(f"Binance client created (pool_size={pool_size}, timeout={timeout}s)")
+            return client
+
+    def clear(self):
+        """Fecha as sessões HTTP e esquece todos os clients"""
+        with self._lock:
+            for client in self._clients.values():
+                try:
+                    client.close_connection()
+                except Exception:
+                    pass
+            self._clients.clear()
+
+
+_POOL = ClientPool()
+
+
+def get_client_pool() -> ClientPool:
+    return _POOL
+
+
+def set_client_factory(factory: Optional[Callable]):
+    """Troca a fábrica de clients do pool global (ex.: client stub ou simulador)"""
+    global _POOL
+    _POOL.clear()
+    _POOL = ClientPool(factory)
+    return _POOL
@@ -0,0 +1,141 @@
+# dedupe.py
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_WINDOW = 3600.0
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_PATH = "dedupe.sqlite"
+
+
+def _num(value) -> str:
+    # 10 dígitos significativos: "0.10" e "0.1" (ou 0.1 vindo do Gemini) viram a mesma chave
+    try:
+        return f"{float(value):.10g}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def signal_fingerprint(parsed: dict) -> str:
+    """Impressão canônica de um sinal parseado: par, lado, entrada, targets e stop"""
+    pair = str(parsed.get("pair", "")).replace("/", "").upper()
+    side = str(parsed.get("side") or "long").strip().lower()
+    targets = ",".join(_num(t) for t in parsed.get("targets") or ())
+    raw = f"{pair}|{side}|{_num(parsed.get('entry'))}|{targets}|{_num(parsed.get('stop_loss'))}"
+    return "sig:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def message_key(message_id) -> str:
+    return f"msg:{message_id}"
+
+
+class DedupeIndex:
+    """
+    Índice de sinais já executados (id da mensagem do Discord e impressão do sinal),
+    LRU limitado com janela de tempo e persistência num SQLite pequeno para sobreviver a restarts.
+    claim() é atômico: só a primeira chamada para uma chave dentro da janela retorna True.
+    """
+
+    def __init__(self, window: float = DEFAULT_WINDOW, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 path: Optional[str] = None):
+        self.window = float(window)
+        self.max_entries = max(1, int(max_entries))
+        self.path = path or None
+        self.duplicates = 0
+        self.claims = 0
+        self._entries: "OrderedDict[str, float]" = OrderedDict()   # chave -> instante (epoch) do claim
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._open_db()
+
+    # ---------------- Persistência ----------------
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS dedupe (key TEXT PRIMARY KEY, created REAL NOT NULL)")
+            self._db.execute("DELETE FROM dedupe WHERE created < ?", (time.time() - self.window,))
+            rows = self._db.execute("SELECT key, created FROM dedupe ORDER BY created DESC LIMIT ?",
+                                    (self.max_entries,)).fetchall()
+            for key, created in reversed(rows):
+                self._entries[key] = created
+            self._db.commit()
+            logging.info(f"Dedupe index loaded {len(rows)} entries from {self.path}")
+        except Exception as e:
+            logging.warning(f"Dedupe persistence disabled ({self.path}): {e}")
+            self._db = None
+
+    def _db_write(self, sql: str, args: tuple):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(sql, args)
+            self._db.commit()
+        except Exception as e:
+            logging.debug(f"Dedupe write failed: {e}")
+
+    # ---------------- API ----------------
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            created = self._entries.get(key)
+            return created is not None and time.time() - created <= self.window
+
+    def claim(self, key: str) -> bool:
+        """Marca a chave como processada; False se ela já foi vista dentro da janela"""
+        now = time.time()
+        with self._lock:
+            created = self._entries.get(key)
+            if created is not None and now - created <= self.window:
+                self.duplicates += 1
+                return False
+            self._entries[key] = now
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._db_write("DELETE FROM dedupe WHERE key = ?", (old_key,))
+            self.claims += 1
+            self._db_write("INSERT OR REPLACE INTO dedupe (key, created) VALUES (?, ?)", (key, now))
+            return True
+
+    def release(self, key: str):
+        """Desfaz um claim (ex.: a execução falhou antes de chegar na exchange)"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._db_write("DELETE FROM dedupe WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "claims": self.claims, "duplicates": self.duplicates}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_index: Optional[DedupeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_dedupe_index(cfg=None) -> DedupeIndex:
+    """Índice do processo, criado na primeira chamada com dedupe_window_sec / dedupe_max_entries / dedupe_path"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                cfg = cfg or {}
+                _index = DedupeIndex(
+                    window=cfg.get("dedupe_window_sec", DEFAULT_WINDOW),
+                    max_entries=cfg.get("dedupe_max_entries", DEFAULT_MAX_ENTRIES),
+                    path=cfg.get("dedupe_path", DEFAULT_PATH),
+                )
+    return _index
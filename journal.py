@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# journal.py
+"""
+Diário durável dos trades num SQLite (WAL): mensagens, sinais parseados, dimensionamento,
+ordens enviadas/respostas e tempos. Quem registra só enfileira; uma thread de fundo grava
+em lotes, numa transação por lote, fora do caminho do execute_trade.
+
+Uso para consultar: python journal.py [--signal ID | --symbol BTCUSDT] [--since 2026-01-01] [--until ...] [--kind order]
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import tracing
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_JOURNAL_FILE = "journal.sqlite"
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_QUEUE = 10000
+FLUSH_TIMEOUT = 5.0
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS events ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, kind TEXT NOT NULL, signal_id TEXT, "
+    "account TEXT, symbol TEXT, market TEXT, duration_ms REAL, data TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_events_signal ON events (signal_id)",
+    "CREATE INDEX IF NOT EXISTS idx_events_symbol_ts ON events (symbol, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts)",
+)
+_COLUMNS = ("id", "ts", "kind", "signal_id", "account", "symbol", "market", "duration_ms", "data")
+
+
+def _timestamp(value) -> Optional[float]:
+    """Epoch em segundos a partir de número ou data ISO (2026-01-31 / 2026-01-31T12:00)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+def _row(values) -> dict:
+    row = dict(zip(_COLUMNS, values))
+    row["data"] = json.loads(row["data"]) if row["data"] else {}
+    return row
+
+
+def query_events(path: str, signal_id: Optional[str] = None, symbol: Optional[str] = None, since=None,
+                 until=None, kind: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+    """Eventos filtrados por sinal, símbolo, período (epoch ou data ISO) e tipo, em ordem de gravação"""
+    where, args = [], []
+    for column, value in (("signal_id", signal_id), ("symbol", symbol.upper() if symbol else None), ("kind", kind)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            args.append(value)
+    since, until = _timestamp(since), _timestamp(until)
+    if since is not None:
+        where.append("ts >= ?")
+        args.append(since)
+    if until is not None:
+        where.append("ts < ?")
+        args.append(until)
+    sql = "SELECT " + ", ".join(_COLUMNS) + " FROM events"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    # Conexão própria: no WAL a leitura não bloqueia a thread escritora
+    db = sqlite3.connect(path, timeout=10)
+    try:
+        return [_row(r) for r in db.execute(sql, args)]
+    finally:
+        db.close()
+
+
+class TradeJournal:
+    """
+    Journal de eventos por sinal. log() só coloca uma tupla na fila (sem I/O nem JSON);
+    a thread escritora serializa e grava até batch_size eventos por transação,
+    no máximo a cada flush_interval segundos.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_FILE, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_queue: int = DEFAULT_MAX_QUEUE):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._stop = threading.Event()
+        db = self._connect()
+        for sql in _SCHEMA:
+            db.execute(sql)
+        db.commit()
+        db.close()
+        self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # ---------------- Escrita ----------------
+    def log(self, kind: str, signal_id: Optional[str] = None, account: Optional[str] = None,
+            symbol: Optional[str] = None, market: Optional[str] = None,
+            duration_ms: Optional[float] = None, **data) -> bool:
+        """Enfileira um evento; nunca bloqueia (fila cheia = evento descartado e contado)"""
+        try:
+            self._queue.put_nowait((time.time(), kind, signal_id, account, symbol, market, duration_ms, data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        db = self._connect()
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                try:
+                    batch = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                # Junta o que chegar até encher o lote ou passar o intervalo
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                self._write(db, batch)
+        finally:
+            db.close()
+
+    def _write(self, db: sqlite3.Connection, batch: list):
+        rows = [(ts, kind, signal_id, account, symbol, market, duration_ms,
+                 json.dumps(data, ensure_ascii=False, default=str) if data else None)
+                for ts, kind, signal_id, account, symbol, market, duration_ms, data in batch]
+        try:
+            with db:
+                db.executemany("INSERT INTO events (ts, kind, signal_id, account, symbol, market, duration_ms, data) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as e:
+            self.dropped += len(rows)
+            logging.error(f"Trade journal write failed ({len(rows)} events lost): {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT) -> bool:
+        """Espera a fila ser gravada (até timeout segundos)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline or not self._thread.is_alive():
+                return False
+            time.sleep(0.02)
+        return True
+
+    def close(self, timeout: float = FLUSH_TIMEOUT):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "batches": self.batches,
+                "dropped": self.dropped}
+
+    # ---------------- Consultas ----------------
+    def query(self, signal_id: Optional[str] = None, symbol: Optional[str] = None, since=None, until=None,
+              kind: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        return query_events(self.path, signal_id, symbol, since, until, kind, limit)
+
+    def by_signal(self, signal_id: str) -> List[dict]:
+        return self.query(signal_id=signal_id)
+
+    def by_symbol(self, symbol: str, since=None, until=None) -> List[dict]:
+        return self.query(symbol=symbol, since=since, until=until)
+
+    def between(self, since, until=None, kind: Optional[str] = None) -> List[dict]:
+        return self.query(since=since, until=until, kind=kind)
+
+
+_journal: Optional[TradeJournal] = None
+_journal_lock = threading.Lock()
+
+
+def configure(path: Optional[str], batch_size: int = DEFAULT_BATCH_SIZE,
+              flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> Optional[TradeJournal]:
+    """Abre o journal do processo (vazio/None desativa); idempotente para o mesmo arquivo"""
+    global _journal
+    with _journal_lock:
+        if _journal is not None and _journal.path == path:
+            return _journal
+        if _journal is not None:
+            _journal.close()
+            _journal = None
+        if path:
+            try:
+                _journal = TradeJournal(path, batch_size, flush_interval)
+            except Exception as e:
+                logging.warning(f"Trade journal disabled ({path}): {e}")
+        return _journal
+
+
+def get_journal() -> Optional[TradeJournal]:
+    return _journal
+
+
+def log_event(kind: str, signal_id: Optional[str] = None, **fields) -> bool:
+    """Registra um evento no journal (no-op se desativado); usa o id do trace ativo quando não informado"""
+    journal = _journal
+    if journal is None:
+        return False
+    if signal_id is None:
+        trace = tracing.current_trace()
+        signal_id = trace.signal_id if trace is not None else None
+    return journal.log(kind, signal_id, **fields)
+
+
+def record_order(endpoint: str, params: dict, result, error: Optional[Exception], latency_ms: float,
+                 account: Optional[str] = None):
+    """Hook de ordens do RateLimitedClient: requisição, resposta (ou erro) e latência"""
+    if _journal is None:
+        return
+    params = dict(params)
+    if endpoint == "futures_place_batch_order":
+        symbol = ((params.get("batchOrders") or [{}])[0]).get("symbol")
+    else:
+        symbol = params.get("symbol")
+    log_event("order", account=account, symbol=symbol, market="futures" if endpoint.startswith("futures") else "spot",
+              duration_ms=round(latency_ms, 3), endpoint=endpoint, request=params, response=result,
+              error=str(error) if error is not None else None)
+
+
+@atexit.register
+def _flush_at_exit():
+    if _journal is not None:
+        _journal.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the trade journal")
+    parser.add_argument("--path", default=DEFAULT_JOURNAL_FILE)
+    parser.add_argument("--signal", help="signal id (Discord message id)")
+    parser.add_argument("--symbol")
+    parser.add_argument("--since", help="epoch or ISO date")
+    parser.add_argument("--until", help="epoch or ISO date")
+    parser.add_argument("--kind", help="message, signal, sizing, order, result, timing")
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        rows = query_events(args.path, args.signal, args.symbol, args.since, args.until, args.kind, args.limit)
+    except sqlite3.Error as e:
+        print(f"✗ {args.path}: {e}")
+        return 1
+    for row in rows:
+        when = datetime.fromtimestamp(row["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+        took = f" {row['duration_ms']:.1f}ms" if row["duration_ms"] is not None else ""
+        who = " ".join(str(v) for v in (row["account"], row["market"], row["symbol"]) if v)
+        print(f"{when} [{row['signal_id'] or '-'}] {row['kind']:<8} {who}{took} {json.dumps(row['data'], ensure_ascii=False)}")
+    print(f"{len(rows)} event(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
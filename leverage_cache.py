@@ -0,0 +1,206 @@
+# leverage_cache.py
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from binance.exceptions import BinanceAPIException
+
+from balance_ledger import account_key, get_ledger
+
+logging.basicConfig(level=logging.INFO)
+
+MARGIN_TYPES = ("cross", "isolated")
+NO_CHANGE_CODE = -4046        # "No need to change margin type."
+DEFAULT_TTL = 300.0
+
+
+def parse_symbol_config(rows) -> Dict[str, dict]:
+    """
+    Alavancagem e margin type por símbolo a partir do /fapi/v1/symbolConfig (futures_symbol_config).
+    O position risk v3 (futures_position_information) não traz mais leverage/marginType, só as posições abertas.
+    """
+    state = {}
+    for row in rows or ():
+        try:
+            symbol = str(row["symbol"]).upper()
+            entry = {"leverage": int(float(row["leverage"]))}
+        except (KeyError, TypeError, ValueError):
+            continue
+        margin = str(row.get("marginType", "")).lower()
+        margin = "cross" if margin == "crossed" else margin
+        if margin in MARGIN_TYPES:
+            entry["margin_type"] = margin
+        state[symbol] = entry
+    return state
+
+
+class LeverageCache:
+    """
+    Alavancagem e margin type atuais por símbolo de uma conta de Futures.
+    Semeado pelo symbol config no startup e atualizado a cada mudança (e por ACCOUNT_CONFIG_UPDATE),
+    para que ensure() só chame a Binance quando o valor pedido for diferente do atual.
+    Sem o user data stream de Futures conectado, uma mudança feita no app/site não chega aqui:
+    nesse caso cada símbolo só vale por ttl_sec desde a última leitura/mudança, depois volta a ser aplicado.
+    """
+
+    def __init__(self, client, ttl_sec: float = DEFAULT_TTL):
+        self.client = client
+        self.account = account_key(client)
+        self.ttl_sec = float(ttl_sec)
+        self.hits = 0
+        self.changes = 0
+        self.expired = 0
+        self.seeded = False
+        self._state: Dict[str, dict] = {}
+        self._synced: Dict[str, float] = {}     # instante monotônico da última leitura/mudança por símbolo
+        self._lock = threading.Lock()
+        self._symbol_locks: Dict[str, threading.Lock] = {}
+
+    def seed(self) -> int:
+        """Carrega o estado de todos os símbolos do symbol config; devolve quantos foram carregados"""
+        state = parse_symbol_config(self.client.futures_symbol_config())
+        now = time.monotonic()
+        with self._lock:
+            self._state = state
+            self._synced = {symbol: now for symbol in state}
+            self.seeded = True
+        return len(state)
+
+    def _stream_connected(self) -> bool:
+        ledger = get_ledger(self.client, "futures")
+        return ledger is not None and ledger.connected
+
+    def get(self, symbol: str) -> Optional[dict]:
+        """Estado do símbolo, ou None se desconhecido ou vencido (TTL sem o stream conectado)"""
+        symbol = symbol.upper()
+        stream = self._stream_connected()
+        with self._lock:
+            entry = self._state.get(symbol)
+            if not entry:
+                return None
+            if not stream and time.monotonic() - self._synced.get(symbol, 0.0) > self.ttl_sec:
+                self._state.pop(symbol, None)
+                self._synced.pop(symbol, None)
+                self.expired += 1
+                return None
+            return dict(entry)
+
+    def update(self, symbol: str, **fields):
+        symbol = symbol.upper()
+        with self._lock:
+            self._state.setdefault(symbol, {}).update(fields)
+            self._synced[symbol] = time.monotonic()
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Esquece o estado de um símbolo (ou de todos); a próxima chamada vai para a Binance"""
+        with self._lock:
+            if symbol is None:
+                self._state.clear()
+                self._synced.clear()
+            else:
+                self._state.pop(symbol.upper(), None)
+                self._synced.pop(symbol.upper(), None)
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    def ensure(self, symbol: str, leverage: int, margin_type: Optional[str] = None) -> bool:
+        """Deixa o símbolo com a alavancagem (e o margin type, se informado); True se mudou algo na Binance"""
+        symbol = symbol.upper()
+        leverage = max(1, int(leverage))
+        margin_type = (margin_type or "").lower() or None
+        changed = False
+        # Sinais simultâneos no mesmo símbolo não disparam a mesma mudança duas vezes
+        with self._symbol_lock(symbol):
+            current = self.get(symbol) or {}
+            if margin_type and current.get("margin_type") != margin_type:
+                try:
+                    self.client.futures_change_margin_type(symbol=symbol, marginType=margin_type.upper())
+                    self.update(symbol, margin_type=margin_type)
+                    changed = True
+                except BinanceAPIException as e:
+                    if e.code == NO_CHANGE_CODE:
+                        self.update(symbol, margin_type=margin_type)
+                    else:
+                        # Com posição/ordens abertas a Binance recusa a troca; o trade segue no modo atual
+                        logging.warning(f"Margin type {margin_type} not applied on {symbol}: {e.message}")
+            if current.get("leverage") == leverage:
+                if not changed:
+                    self.hits += 1
+                return changed
+            try:
+                result = self.client.futures_change_leverage(symbol=symbol, leverage=leverage)
+            except Exception:
+                self.invalidate(symbol)
+                raise
+            self.update(symbol, leverage=int((result or {}).get("leverage", leverage)))
+            self.changes += 1
+            return True
+
+    def preset(self, symbols: Iterable[str], leverage: int, margin_type: Optional[str] = None) -> Dict[str, str]:
+        """Aplica a alavancagem numa lista de símbolos antes dos sinais; devolve o resultado por símbolo"""
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol] = "changed" if self.ensure(symbol, leverage, margin_type) else "unchanged"
+            except Exception as e:
+                logging.warning(f"Leverage preset failed for {symbol}: {e}")
+                results[symbol] = f"error: {e}"
+        return results
+
+    def on_event(self, event):
+        """ACCOUNT_CONFIG_UPDATE do user data stream: alavancagem mudada por fora (app/site)"""
+        if not isinstance(event, dict) or event.get("e") != "ACCOUNT_CONFIG_UPDATE":
+            return
+        ac = event.get("ac") or {}
+        try:
+            self.update(str(ac["s"]), leverage=int(ac["l"]))
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    def stats(self) -> dict:
+        return {"symbols": len(self._state), "seeded": self.seeded, "hits": self.hits, "changes": self.changes,
+                "expired": self.expired, "stream": self._stream_connected()}
+
+
+_CACHES: Dict[str, LeverageCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_leverage_cache(client, ttl_sec: Optional[float] = None) -> LeverageCache:
+    """Cache da conta do client (um por API key; a exchange simulada compartilha um só)"""
+    account = account_key(client)
+    cache = _CACHES.get(account)
+    if cache is None:
+        with _CACHES_LOCK:
+            cache = _CACHES.get(account)
+            if cache is None:
+                cache = _CACHES[account] = LeverageCache(client)
+    if ttl_sec is not None:
+        cache.ttl_sec = float(ttl_sec)
+    return cache
+
+
+def on_user_event(account: str, market: str, event):
+    """Listener para BalanceLedger.add_listener: repassa eventos de configuração ao cache da conta"""
+    cache = _CACHES.get(account)
+    if cache is not None and market == "futures":
+        cache.on_event(event)
+
+
+def warm_leverage_cache(cfg, client) -> str:
+    """Seed do cache pelo symbol config e preset da watch list do bloco leverage_cache do config"""
+    lc = (cfg or {}).get("leverage_cache") or {}
+    cache = get_leverage_cache(client, lc.get("ttl_sec", DEFAULT_TTL))
+    n = cache.seed()
+    symbols = [str(s).upper() for s in lc.get("watch_symbols") or ()]
+    if not symbols:
+        return f"{n} symbols"
+    leverage = int(lc.get("watch_leverage") or cfg.get("futures_default_leverage", 5))
+    results = cache.preset(symbols, leverage, lc.get("margin_type"))
+    changed = sum(1 for r in results.values() if r == "changed")
+    failed = sum(1 for r in results.values() if r.startswith("error"))
+    return f"{n} symbols, watch list {len(symbols)} at {leverage}x ({changed} changed, {failed} failed)"
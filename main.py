@@ -15,7 +15,18 @@ import platform
 # Não configurar event loop policy - usar o padrão do sistema
 # Isso evita warnings de deprecação no Python 3.14+
 
+import threading
+import time
+
 from Selfbot_listener import run_listener
+from prewarm import prewarm, format_report
+from signal_parser import warm_up_gemini
+from settings import ConfigError, compile_settings, start_config_watcher
+from market_data import start_market_data
+from balance_ledger import start_balance_ledgers
+from leverage_cache import on_user_event
+from position_manager import start_position_manager
+from trader import get_binance_client
 
 CONFIG_FILE = "config.json"
 
@@ -30,10 +41,77 @@ def create_default_config():
         "telegram_chat_id": "",
         "discord_token": "",
         "channel_id": "",
+        "channels": {},
+        "accounts": [],
         "test_mode": True,
         "trade_mode": "auto",
         "futures_default_leverage": 5,
         "futures_working_type": "MARK_PRICE",
+        "futures_batch_orders": True,
+        "allocation_fraction": 0.15,
+        "tp_weights": [0.30, 0.30, 0.20, 0.20],
+        "exchange_info_ttl_sec": 900,
+        "binance_pool_size": 10,
+        "binance_timeout_sec": 10,
+        "rate_limit_safety": 0.9,
+        "rate_limit_max_wait_sec": 5,
+        "config_reload_sec": 2,
+        "pipeline_workers": 2,
+        "pipeline_queue_size": 50,
+        "pipeline_metrics_sec": 300,
+        "trace_file": "traces.jsonl",
+        "journal_path": "journal.sqlite",
+        "journal_batch_size": 200,
+        "journal_flush_sec": 1.0,
+        "telegram_coalesce_sec": 60,
+        "parse_cache_size": 1000,
+        "parse_cache_ttl_sec": 86400,
+        "parse_cache_path": "parse_cache.sqlite",
+        "dedupe_window_sec": 3600,
+        "dedupe_max_entries": 5000,
+        "dedupe_path": "dedupe.sqlite",
+        "sim_exchange": {
+            "enabled": False,
+            "price_csv": "",
+            "symbols": ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "XRPUSDT", "DOGEUSDT", "ADAUSDT"],
+            "usdt_balance": 1000,
+            "latency_ms": 50,
+            "latency_jitter_ms": 30,
+            "rate_limit_rate": 0.0,
+            "partial_fill_rate": 0.0,
+            "seed": None
+        },
+        "user_data_stream": {
+            "enabled": False,
+            "reconcile_sec": 300,
+            "keepalive_sec": 1800,
+            "spot_url": "wss://stream.binance.com:9443",
+            "futures_url": "wss://fstream.binance.com"
+        },
+        "prewarm": {
+            "enabled": True,
+            "timeout_sec": 15
+        },
+        "leverage_cache": {
+            "enabled": True,
+            "margin_type": "",
+            "watch_symbols": [],
+            "watch_leverage": None,
+            "ttl_sec": 300
+        },
+        "position_manager": {
+            "enabled": False,
+            "breakeven_after_tp": 1,
+            "cancel_orphans": True,
+            "max_age_hours": 72
+        },
+        "market_data": {
+            "enabled": False,
+            "symbols": [],
+            "max_age_sec": 5,
+            "spot_url": "wss://stream.binance.com:9443",
+            "futures_url": "wss://fstream.binance.com"
+        },
         "target_selection": {
             "T1": True,
             "T2": True,
@@ -66,12 +144,21 @@ def load_config():
         # Validação básica
         required_fields = ["discord_token", "channel_id"]
         missing = [field for field in required_fields if not config.get(field)]
+        if "channel_id" in missing and config.get("channels"):
+            missing.remove("channel_id")
         
         if missing:
             print(f"✗ Missing required fields in config: {', '.join(missing)}")
             print("Please edit config.json and add the required information.")
             sys.exit(1)
         
+        # Valida tipos/valores usados pelo trader (mesma compilação do hot reload)
+        try:
+            compile_settings(config)
+        except ConfigError as e:
+            print(f"✗ Invalid configuration: {e}")
+            sys.exit(1)
+        
         # Avisos para campos opcionais
         if not config.get("binance_api_key") or not config.get("binance_api_secret"):
             print("⚠ Warning: Binance API credentials not configured. Trading will not work.")
@@ -105,12 +192,55 @@ def main():
     
     print(f"Mode: {'TEST (no real trades)' if test_mode else 'LIVE (real trading!)'}")
     print(f"Trade Mode: {trade_mode.upper()}")
-    print(f"Channel ID: {config['channel_id']}")
+    settings = compile_settings(config)
+    channels = settings.channels
+    print(f"Channels: {', '.join(f'{p.name} ({cid})' for cid, p in channels.items())}")
+    if settings.accounts:
+        print(f"Accounts: {', '.join(a.name for a in settings.accounts)}")
     print(f"Target Selection: T1={config['target_selection']['T1']}, "
           f"T2={config['target_selection']['T2']}, "
           f"T3={config['target_selection']['T3']}, "
           f"T4={config['target_selection']['T4']}")
     print()
+    
+    # Recarrega config.json automaticamente quando o arquivo muda
+    start_config_watcher(config.get("config_reload_sec", 2))
+    
+    # Preços via websocket (bookTicker/markPrice) no lugar do ticker REST a cada trade
+    if start_market_data(config):
+        print("Market data streams started")
+    
+    # Saldos via user data stream (listenKey), semeados por um snapshot REST
+    ledgers = []
+    if not test_mode and config.get("user_data_stream", {}).get("enabled", False):
+        for account_cfg in [settings.for_account(a) for a in settings.accounts] or [config]:
+            name = account_cfg.account.name if settings.accounts else "main"
+            try:
+                started = start_balance_ledgers(config, get_binance_client(account_cfg))
+                if started:
+                    ledgers += started.values()
+                    # Alavancagem alterada por fora (ACCOUNT_CONFIG_UPDATE) atualiza o cache da conta
+                    started["futures"].add_listener(on_user_event)
+                    print(f"Balance ledger started for {name} (user data stream)")
+            except Exception as e:
+                print(f"⚠ Balance ledger disabled for {name}: {e}")
+    
+    # Break-even após o T1 e limpeza de ordens órfãs, a partir dos eventos de ordem do mesmo stream
+    if start_position_manager(config, ledgers):
+        print("Position manager started")
+    elif config.get("position_manager", {}).get("enabled", False):
+        print("⚠ Position manager not started: it needs user_data_stream.enabled (live mode) to receive order events")
+    
+    # Pre-warm: Gemini, clients, relógio e exchange info em paralelo, para o primeiro sinal não pagar o cold start
+    start = time.perf_counter()
+    results = prewarm(config, settings)
+    if results:
+        print(format_report(results, (time.perf_counter() - start) * 1000.0))
+        print()
+    else:
+        # Pre-warm desligado: pelo menos os handles do Gemini aquecem enquanto o Discord conecta
+        threading.Thread(target=warm_up_gemini, name="gemini-warmup", daemon=True).start()
+    
     print("Starting Discord selfbot listener...")
     print("Press Ctrl+C to stop")
     print("=" * 60)
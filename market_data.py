@@ -0,0 +1,213 @@
+# market_data.py
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+
+SPOT_WS_URL = "wss://stream.binance.com:9443"
+FUTURES_WS_URL = "wss://fstream.binance.com"
+DEFAULT_MAX_AGE = 5.0
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 60.0
+MAX_STREAMS_PER_CONNECTION = 200
+
+
+def stream_names(market: str, symbols: Optional[Iterable[str]] = None):
+    """
+    Streams combinados: com lista, bookTicker (spot) / markPrice@1s (futures) por símbolo;
+    sem lista, os streams de todos os símbolos (!miniTicker@arr no spot, !markPrice@arr@1s no futures).
+    """
+    symbols = [s.lower() for s in (symbols or []) if s]
+    if not symbols:
+        return ["!markPrice@arr@1s" if market == "futures" else "!miniTicker@arr"]
+    suffix = "@markPrice@1s" if market == "futures" else "@bookTicker"
+    return [f"{s}{suffix}" for s in symbols]
+
+
+def parse_prices(payload) -> Iterable[Tuple[str, float]]:
+    """Extrai (símbolo, preço) de uma mensagem de stream combinado (bookTicker, markPrice ou miniTicker)"""
+    data = payload.get("data", payload) if isinstance(payload, dict) else payload
+    for ev in data if isinstance(data, list) else [data]:
+        if not isinstance(ev, dict) or "s" not in ev:
+            continue
+        try:
+            if "b" in ev and "a" in ev:            # bookTicker: meio do spread
+                price = (float(ev["b"]) + float(ev["a"])) / 2.0
+            elif "p" in ev:                          # markPriceUpdate
+                price = float(ev["p"])
+            elif "c" in ev:                          # 24hrMiniTicker
+                price = float(ev["c"])
+            else:
+                continue
+        except (TypeError, ValueError):
+            continue
+        if price > 0:
+            yield ev["s"].upper(), price
+
+
+class MarketDataService:
+    """
+    Último preço por símbolo alimentado por websocket (thread própria com event loop),
+    com detecção de dado velho: price() devolve None quando o valor passou de max_age
+    ou o stream caiu, e quem chamou usa o REST.
+    """
+
+    def __init__(self, market: str, url: Optional[str] = None, symbols: Optional[Iterable[str]] = None,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.market = market
+        self.url = (url or (FUTURES_WS_URL if market == "futures" else SPOT_WS_URL)).rstrip("/")
+        self.symbols = [s.upper() for s in (symbols or [])]
+        self.max_age = float(max_age)
+        self.hits = 0
+        self.misses = 0
+        self.messages = 0
+        self.reconnects = 0
+        self.connected = False
+        self._prices: Dict[str, Tuple[float, float]] = {}   # símbolo -> (preço, instante monotônico)
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+
+    # ---------------- Lookups ----------------
+    def price(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        entry = self._prices.get(symbol.upper())
+        limit = self.max_age if max_age is None else max_age
+        if entry is None or time.monotonic() - entry[1] > limit:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def age(self, symbol: str) -> float:
+        entry = self._prices.get(symbol.upper())
+        return time.monotonic() - entry[1] if entry else float("inf")
+
+    def update(self, symbol: str, price: float):
+        self._prices[symbol] = (price, time.monotonic())
+
+    def stats(self) -> dict:
+        return {"market": self.market, "connected": self.connected, "symbols": len(self._prices),
+                "messages": self.messages, "hits": self.hits, "misses": self.misses, "reconnects": self.reconnects}
+
+    # ---------------- Stream ----------------
+    def stream_urls(self):
+        names = stream_names(self.market, self.symbols)
+        return [f"{self.url}/stream?streams=" + "/".join(names[i:i + MAX_STREAMS_PER_CONNECTION])
+                for i in range(0, len(names), MAX_STREAMS_PER_CONNECTION)]
+
+    def start(self):
+        """Sobe a thread do websocket (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.market}-market-data", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:
+                pass    # loop já encerrado
+        if self._thread:
+            self._thread.join(timeout)
+
+    @staticmethod
+    def _cancel_tasks():
+        # Roda dentro do loop: cancela tudo de uma vez, sem corrida com o fechamento
+        for task in asyncio.all_tasks():
+            task.cancel()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._main())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+            self._loop = None
+            self.connected = False
+
+    async def _main(self):
+        await asyncio.gather(*(self._consume(url) for url in self.stream_urls()))
+
+    async def _consume(self, url: str):
+        import websockets
+
+        delay = RECONNECT_MIN
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(url, ping_interval=20, close_timeout=2, max_size=2 ** 22) as ws:
+                    self.connected = True
+                    delay = RECONNECT_MIN
+                    logging.info(f"[{self.market}] market data stream connected ({url.split('?')[0]})")
+                    async for raw in ws:
+                        self.messages += 1
+                        try:
+                            payload = json.loads(raw)
+                        except ValueError:
+                            continue
+                        now = time.monotonic()
+                        for symbol, price in parse_prices(payload):
+                            self._prices[symbol] = (price, now)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"[{self.market}] market data stream error: {e}")
+            self.connected = False
+            if self._stop.is_set():
+                break
+            # Binance derruba a conexão a cada 24h; reconecta com backoff
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+
+_SERVICES: Dict[str, MarketDataService] = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def _md_config(cfg) -> dict:
+    md = (cfg or {}).get("market_data") or {}
+    return dict(md) if isinstance(md, dict) else {}
+
+
+def get_market_data(market: str) -> Optional[MarketDataService]:
+    """Serviço já iniciado para o mercado (None se o market data estiver desligado)"""
+    return _SERVICES.get(market)
+
+
+def start_market_data(cfg) -> Dict[str, MarketDataService]:
+    """Inicia os streams de Spot e Futures conforme o bloco market_data do config"""
+    md = _md_config(cfg)
+    if not md.get("enabled", False):
+        return {}
+    with _SERVICES_LOCK:
+        for market in ("spot", "futures"):
+            if market in _SERVICES:
+                continue
+            service = MarketDataService(market, md.get(f"{market}_url"), md.get("symbols"),
+                                        md.get("max_age_sec", DEFAULT_MAX_AGE))
+            service.start()
+            _SERVICES[market] = service
+        return dict(_SERVICES)
+
+
+def stop_market_data():
+    with _SERVICES_LOCK:
+        for service in _SERVICES.values():
+            service.stop()
+        _SERVICES.clear()
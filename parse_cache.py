@@ -0,0 +1,118 @@
+# parse_cache.py
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL = 86400.0
+
+
+def normalize_message(message: str) -> str:
+    """Colapsa espaços/quebras de linha e ignora maiúsculas (reposts e edits triviais viram a mesma chave)"""
+    return " ".join((message or "").split()).lower()
+
+
+def message_key(message: str) -> str:
+    return hashlib.sha1(normalize_message(message).encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    Cache LRU de resultados de parse (já validados por _validate_struct),
+    com expiração por TTL e persistência opcional num SQLite pequeno.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 path: Optional[str] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.path = path or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # chave -> (criado em, resultado)
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._open_db()
+
+    # ---------------- Persistência ----------------
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS parse_cache ("
+                             "key TEXT PRIMARY KEY, created REAL NOT NULL, value TEXT NOT NULL)")
+            cutoff = time.time() - self.ttl
+            self._db.execute("DELETE FROM parse_cache WHERE created < ?", (cutoff,))
+            rows = self._db.execute("SELECT key, created, value FROM parse_cache ORDER BY created DESC LIMIT ?",
+                                    (self.max_entries,)).fetchall()
+            for key, created, value in reversed(rows):
+                self._entries[key] = (created, json.loads(value))
+            self._db.commit()
+            logging.info(f"Parse cache loaded {len(rows)} entries from {self.path}")
+        except Exception as e:
+            logging.warning(f"Parse cache persistence disabled ({self.path}): {e}")
+            self._db = None
+
+    def _db_write(self, sql: str, args: tuple):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(sql, args)
+            self._db.commit()
+        except Exception as e:
+            logging.debug(f"Parse cache write failed: {e}")
+
+    # ---------------- API ----------------
+    def get(self, message: str) -> Optional[dict]:
+        key = message_key(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._db_write("DELETE FROM parse_cache WHERE key = ?", (key,))
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1], targets=list(entry[1]["targets"]))
+
+    def put(self, message: str, result: dict):
+        if not result:
+            return
+        key = message_key(message)
+        created = time.time()
+        with self._lock:
+            self._entries[key] = (created, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                self._db_write("DELETE FROM parse_cache WHERE key = ?", (old_key,))
+            self._db_write("INSERT OR REPLACE INTO parse_cache (key, created, value) VALUES (?, ?, ?)",
+                           (key, created, json.dumps(result)))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": round(self.hit_rate, 3)}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
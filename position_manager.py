@@ -0,0 +1,490 @@
+# position_manager.py
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from balance_ledger import account_key
+from journal import log_event
+from symbol_filters import fmt
+from telegram_alert import send_telegram_message
+import tracing
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_BREAKEVEN_AFTER = 1      # nº de TPs preenchidos antes de mover o stop para a entrada
+TP_TYPES = ("LIMIT_MAKER", "LIMIT", "TAKE_PROFIT", "TAKE_PROFIT_MARKET")
+DONE_STATUSES = ("FILLED", "CANCELED", "EXPIRED", "REJECTED", "EXPIRED_IN_MATCH")
+OCO_RECREATE_ATTEMPTS = 2        # tentativas por preço de stop ao refazer uma OCO do Spot
+OCO_RETRY_DELAY = 0.2
+DEFAULT_MAX_AGE_HOURS = 72.0     # trade sem evento de encerramento nesse prazo deixa de ser acompanhado
+PRUNE_INTERVAL = 60.0
+
+
+class TrackedTrade:
+    """
+    Ordens de um trade aberto pelo trader. No Spot cada TP é uma OCO (limit + stop);
+    no Futures há um STOP_MARKET closePosition e um TAKE_PROFIT reduceOnly por target.
+    """
+
+    __slots__ = ("trade_id", "signal_id", "account", "market", "symbol", "side", "entry_price", "stop_loss",
+                 "client", "cfg", "filters", "working_type", "entry_id", "sl_id", "tps", "ocos",
+                 "tp_filled", "breakeven", "closed", "opened_at")
+
+    def __init__(self, trade_id: int, market: str, client, cfg, symbol: str, side: str, entry_price: float,
+                 stop_loss: float, filters=None, working_type: str = "MARK_PRICE"):
+        self.trade_id = trade_id
+        trace = tracing.current_trace()
+        self.signal_id = trace.signal_id if trace is not None else None
+        self.account = account_key(client)
+        self.market = market
+        self.client = client
+        self.cfg = cfg
+        self.symbol = symbol
+        self.side = side
+        self.entry_price = float(entry_price)
+        self.stop_loss = float(stop_loss)
+        self.filters = filters
+        self.working_type = working_type
+        self.entry_id: Optional[int] = None
+        self.sl_id: Optional[int] = None
+        self.tps: Dict[int, dict] = {}     # futures: orderId do TP -> {price, qty}
+        self.ocos: List[dict] = []         # spot: {list_id, tp_id, sl_id, price, qty, done}
+        self.tp_filled = 0
+        self.breakeven = False
+        self.closed = False
+        self.opened_at = time.monotonic()
+
+    def order_ids(self) -> List[int]:
+        ids = [i for i in (self.entry_id, self.sl_id) if i is not None] + list(self.tps)
+        for oco in self.ocos:
+            ids += [oco["tp_id"], oco["sl_id"]]
+        return ids
+
+    def price_str(self, value: float) -> str:
+        return fmt(self.filters.round_price(value) if self.filters is not None else value)
+
+
+def _oco_legs(oco: dict) -> Tuple[Optional[int], Optional[int]]:
+    """(id do TP, id do stop) de uma resposta de OCO; sem orderReports a Binance lista stop e depois limit"""
+    reports = oco.get("orderReports") or []
+    tp_id = sl_id = None
+    for r in reports:
+        if r.get("type") in TP_TYPES:
+            tp_id = r.get("orderId")
+        else:
+            sl_id = r.get("orderId")
+    if tp_id is None or sl_id is None:
+        legs = [o.get("orderId") for o in oco.get("orders") or []]
+        if len(legs) == 2:
+            sl_id, tp_id = legs
+    return tp_id, sl_id
+
+
+def parse_order_event(event: dict) -> Optional[dict]:
+    """Normaliza executionReport (Spot) e ORDER_TRADE_UPDATE (Futures)"""
+    kind = event.get("e")
+    if kind == "executionReport":
+        o = event
+        avg = (float(o.get("Z", 0) or 0) / float(o["z"])) if float(o.get("z", 0) or 0) else 0.0
+    elif kind == "ORDER_TRADE_UPDATE":
+        o = event.get("o") or {}
+        avg = float(o.get("ap", 0) or 0)
+    else:
+        return None
+    try:
+        return {"symbol": str(o["s"]).upper(), "order_id": int(o["i"]), "status": o.get("X"),
+                "type": o.get("o"), "avg_price": avg, "list_id": o.get("g")}
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class PositionManager:
+    """
+    Acompanha os trades abertos a partir dos eventos de ordem do user data stream:
+    move o stop para a entrada depois do primeiro TP e cancela as ordens que sobram
+    quando a posição fecha. Eventos entram numa fila e são tratados por uma thread própria,
+    com um índice (conta, orderId) -> trade para achar o trade em O(1).
+    Trades sem evento de encerramento por max_age_hours (stream que perdeu eventos) são descartados.
+    """
+
+    def __init__(self, breakeven_after: int = DEFAULT_BREAKEVEN_AFTER, cancel_orphans: bool = True,
+                 max_age_hours: float = DEFAULT_MAX_AGE_HOURS):
+        self.breakeven_after = max(0, int(breakeven_after))
+        self.cancel_orphans = bool(cancel_orphans)
+        self.max_age = float(max_age_hours) * 3600.0
+        self.events = 0
+        self.reactions = 0
+        self.breakevens = 0
+        self.cancels = 0
+        self.errors = 0
+        self.expired = 0
+        self.unprotected = 0             # OCOs do Spot que ficaram sem TP/SL (cancelada e não recriada)
+        self.last_reaction_ms = 0.0
+        self.max_reaction_ms = 0.0
+        self._index: Dict[Tuple[str, int], TrackedTrade] = {}
+        self._trades: Dict[int, TrackedTrade] = {}
+        self._next_id = 0
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="position-manager", daemon=True)
+        self._thread.start()
+
+    # ---------------- Registro ----------------
+    def _new_trade(self, market, client, cfg, symbol, side, entry_price, stop_loss, filters, working_type):
+        with self._lock:
+            self._next_id += 1
+            return TrackedTrade(self._next_id, market, client, cfg, symbol, side, entry_price, stop_loss,
+                                filters, working_type)
+
+    def _register(self, trade: TrackedTrade):
+        with self._lock:
+            self._trades[trade.trade_id] = trade
+            for oid in trade.order_ids():
+                self._index[(trade.account, oid)] = trade
+        logging.info(f"[{trade.market.upper()}] Tracking {trade.symbol} trade #{trade.trade_id} "
+                     f"({len(trade.order_ids())} orders)")
+
+    def track_spot(self, cfg, client, symbol: str, entry_price: float, stop_loss: float,
+                   ocos: List[Tuple[dict, float, float]], filters=None) -> Optional[TrackedTrade]:
+        """ocos: (resposta da OCO, quantidade, preço do TP) na ordem dos targets"""
+        trade = self._new_trade("spot", client, cfg, symbol, "long", entry_price, stop_loss, filters, None)
+        for resp, qty, price in ocos:
+            tp_id, sl_id = _oco_legs(resp)
+            if tp_id is None or sl_id is None:
+                continue
+            trade.ocos.append({"list_id": resp.get("orderListId"), "tp_id": tp_id, "sl_id": sl_id,
+                               "price": float(price), "qty": qty, "done": False, "unprotected": False})
+        if not trade.ocos:
+            return None
+        self._register(trade)
+        return trade
+
+    def track_futures(self, cfg, client, symbol: str, side: str, entry_order: dict, entry_price: float,
+                      stop_loss: float, sl_order: dict, tp_orders: List[Tuple[dict, float, float]],
+                      filters=None, working_type: str = "MARK_PRICE") -> Optional[TrackedTrade]:
+        """tp_orders: (resposta do TP, quantidade, preço) — respostas com "error" são ignoradas"""
+        avg = float(entry_order.get("avgPrice") or 0)
+        trade = self._new_trade("futures", client, cfg, symbol, side, avg or entry_price, stop_loss,
+                                filters, working_type)
+        trade.entry_id = entry_order.get("orderId")
+        trade.sl_id = sl_order.get("orderId") if "error" not in sl_order else None
+        for resp, qty, price in tp_orders:
+            if "error" not in resp and resp.get("orderId") is not None:
+                trade.tps[resp["orderId"]] = {"price": float(price), "qty": qty}
+        if trade.sl_id is None and not trade.tps:
+            return None
+        self._register(trade)
+        return trade
+
+    def open_trades(self) -> List[TrackedTrade]:
+        with self._lock:
+            return list(self._trades.values())
+
+    # ---------------- Eventos ----------------
+    def on_event(self, account: str, market: str, event: dict):
+        """Entrada dos eventos do user data stream (ou de um stand-in nos testes); não bloqueia"""
+        self._queue.put((time.perf_counter(), account, market, event))
+
+    def _run(self):
+        while True:
+            if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                self.prune()
+            try:
+                received, account, market, event = self._queue.get(timeout=PRUNE_INTERVAL)
+            except queue.Empty:
+                continue
+            try:
+                if self._handle(account, market, event):
+                    took = (time.perf_counter() - received) * 1000.0
+                    self.reactions += 1
+                    self.last_reaction_ms = took
+                    self.max_reaction_ms = max(self.max_reaction_ms, took)
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Position manager error: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _handle(self, account: str, market: str, event: dict) -> bool:
+        if not isinstance(event, dict):
+            return False
+        self.events += 1
+        if event.get("e") == "ACCOUNT_UPDATE":
+            return self._on_positions(account, event)
+        update = parse_order_event(event)
+        if update is None:
+            return False
+        with self._lock:
+            trade = self._index.get((account, update["order_id"]))
+        if trade is None or trade.closed:
+            return False
+        if trade.market == "spot":
+            return self._on_spot_order(trade, update)
+        return self._on_futures_order(trade, update)
+
+    # ---------------- Spot ----------------
+    def _on_spot_order(self, trade: TrackedTrade, update: dict) -> bool:
+        oid, status = update["order_id"], update["status"]
+        if status not in DONE_STATUSES:
+            return False
+        oco = next((o for o in trade.ocos if oid in (o["tp_id"], o["sl_id"])), None)
+        if oco is None or oco["done"]:
+            return False
+        # A Binance cancela a outra perna da OCO sozinha
+        oco["done"] = True
+        self._forget(trade, [oco["tp_id"], oco["sl_id"]])
+        acted = False
+        if status == "FILLED" and oid == oco["tp_id"]:
+            trade.tp_filled += 1
+            if self._due_breakeven(trade):
+                acted = self._spot_breakeven(trade)
+        if all(o["done"] for o in trade.ocos):
+            self._close(trade, "all OCOs done")
+            acted = True
+        return acted
+
+    def _create_oco(self, trade: TrackedTrade, oco: dict, stop: str) -> Tuple[Optional[dict], Optional[Exception]]:
+        error = None
+        for attempt in range(OCO_RECREATE_ATTEMPTS):
+            if attempt:
+                time.sleep(OCO_RETRY_DELAY)
+            try:
+                return trade.client.create_oco_order(
+                    symbol=trade.symbol, side="SELL", quantity=fmt(oco["qty"]), price=trade.price_str(oco["price"]),
+                    stopPrice=stop, stopLimitPrice=stop, stopLimitTimeInForce="GTC",
+                ), None
+            except Exception as e:
+                error = e
+        return None, error
+
+    def _spot_breakeven(self, trade: TrackedTrade) -> bool:
+        """
+        Refaz as OCOs restantes com o stop na entrada (cancelar uma perna cancela a OCO inteira).
+        Se a Binance recusar o stop na entrada, a OCO volta com o stop original; se nem isso sair,
+        a quantidade fica marcada como desprotegida e o erro vai para o Telegram.
+        """
+        trade.breakeven = True
+        stop = trade.price_str(trade.entry_price)
+        moved, failures = 0, []
+        for oco in [o for o in trade.ocos if not o["done"]]:
+            try:
+                trade.client.cancel_order(symbol=trade.symbol, orderId=oco["sl_id"])
+                self.cancels += 1
+            except Exception as e:
+                # A OCO original continua valendo (já executada ou a Binance recusou o cancel)
+                self.errors += 1
+                failures.append(f"OCO {oco['list_id']} kept its original stop ({e})")
+                continue
+            self._forget(trade, [oco["tp_id"], oco["sl_id"]])
+            resp, used = None, None
+            for candidate in (stop, trade.price_str(trade.stop_loss)):
+                resp, error = self._create_oco(trade, oco, candidate)
+                if resp is not None:
+                    used = candidate
+                    break
+            if resp is None:
+                self.errors += 1
+                self.unprotected += 1
+                oco["done"], oco["unprotected"] = True, True
+                failures.append(f"OCO {oco['list_id']} qty {fmt(oco['qty'])} cancelled and NOT re-created, "
+                                f"position has no TP/SL for it ({error})")
+                continue
+            oco["tp_id"], oco["sl_id"] = _oco_legs(resp)
+            oco["list_id"] = resp.get("orderListId")
+            self._reindex(trade, [oco["tp_id"], oco["sl_id"]])
+            if used == stop:
+                moved += 1
+            else:
+                failures.append(f"OCO {oco['list_id']} restored with the original stop {used} (entry stop rejected)")
+        if moved:
+            self.breakevens += 1
+            self._report(trade, "breakeven", f"[SPOT] {trade.symbol}: T{trade.tp_filled} filled, stop moved to entry "
+                                             f"{stop} on {moved} OCO(s)")
+        if failures:
+            self._report(trade, "breakeven_failed", f"[SPOT] {trade.symbol}: break-even incomplete: " + "; ".join(failures),
+                         error=True)
+        return True
+
+    # ---------------- Futures ----------------
+    def _on_futures_order(self, trade: TrackedTrade, update: dict) -> bool:
+        oid, status = update["order_id"], update["status"]
+        if oid == trade.entry_id:
+            if status == "FILLED" and update["avg_price"] > 0:
+                trade.entry_price = update["avg_price"]
+            return False
+        if status not in DONE_STATUSES:
+            return False
+        if oid == trade.sl_id:
+            self._forget(trade, [oid])
+            trade.sl_id = None
+            if status == "FILLED":
+                self._close(trade, "stop loss filled")
+                return True
+            return False
+        if oid in trade.tps:
+            trade.tps.pop(oid)
+            self._forget(trade, [oid])
+            if status != "FILLED":
+                return False
+            trade.tp_filled += 1
+            if not trade.tps:
+                self._close(trade, "all targets filled")
+                return True
+            if self._due_breakeven(trade):
+                return self._futures_breakeven(trade)
+        return False
+
+    def _futures_breakeven(self, trade: TrackedTrade) -> bool:
+        """Troca o STOP_MARKET closePosition por um na entrada (só pode haver um por lado)"""
+        trade.breakeven = True
+        close_side = "SELL" if trade.side == "long" else "BUY"
+        stop = trade.price_str(trade.entry_price)
+        try:
+            if trade.sl_id is not None:
+                trade.client.futures_cancel_order(symbol=trade.symbol, orderId=trade.sl_id)
+                self.cancels += 1
+                self._forget(trade, [trade.sl_id])
+                trade.sl_id = None
+            resp = trade.client.futures_create_order(
+                symbol=trade.symbol, side=close_side, type="STOP_MARKET", stopPrice=stop,
+                closePosition=True, workingType=trade.working_type,
+            )
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"[FUTURES] Break-even failed on {trade.symbol}: {e}")
+            self._report(trade, "breakeven_failed", f"[FUTURES] {trade.symbol}: could not move stop to entry: {e}",
+                         error=True)
+            return True
+        trade.sl_id = resp.get("orderId")
+        self._reindex(trade, [trade.sl_id])
+        self.breakevens += 1
+        self._report(trade, "breakeven", f"[FUTURES] {trade.symbol}: T{trade.tp_filled} filled, stop moved to entry {stop}")
+        return True
+
+    def _on_positions(self, account: str, event: dict) -> bool:
+        """Posição zerada (fechada na mão, liquidação...): encerra os trades do símbolo"""
+        acted = False
+        for p in (event.get("a") or {}).get("P", []):
+            try:
+                if float(p.get("pa", 0)) != 0:
+                    continue
+            except (TypeError, ValueError):
+                continue
+            symbol = str(p.get("s", "")).upper()
+            for trade in self.open_trades():
+                if trade.account == account and trade.market == "futures" and trade.symbol == symbol:
+                    self._close(trade, "position closed")
+                    acted = True
+        return acted
+
+    # ---------------- Encerramento ----------------
+    def _due_breakeven(self, trade: TrackedTrade) -> bool:
+        return self.breakeven_after > 0 and not trade.breakeven and trade.tp_filled >= self.breakeven_after
+
+    def _close(self, trade: TrackedTrade, reason: str):
+        trade.closed = True
+        leftovers = []
+        if trade.market == "futures":
+            leftovers = ([trade.sl_id] if trade.sl_id is not None else []) + list(trade.tps)
+        cancelled = 0
+        if self.cancel_orphans:
+            for oid in leftovers:
+                try:
+                    trade.client.futures_cancel_order(symbol=trade.symbol, orderId=oid)
+                    cancelled += 1
+                    self.cancels += 1
+                except Exception as e:
+                    # -2011: já executada/cancelada
+                    logging.debug(f"[FUTURES] Cancel {oid} on {trade.symbol}: {e}")
+        with self._lock:
+            for oid in trade.order_ids():
+                self._index.pop((trade.account, oid), None)
+            self._trades.pop(trade.trade_id, None)
+        text = f"[{trade.market.upper()}] {trade.symbol} trade closed ({reason})"
+        if cancelled:
+            text += f", {cancelled} leftover order(s) cancelled"
+        self._report(trade, "closed", text)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Descarta os trades abertos há mais de max_age sem evento de encerramento; as ordens não são tocadas"""
+        now = time.monotonic() if now is None else now
+        self._pruned_at = now
+        with self._lock:
+            stale = [t for t in self._trades.values() if now - t.opened_at > self.max_age]
+            for trade in stale:
+                for oid in trade.order_ids():
+                    self._index.pop((trade.account, oid), None)
+                self._trades.pop(trade.trade_id, None)
+                trade.closed = True
+        for trade in stale:
+            self.expired += 1
+            self._report(trade, "expired", f"[{trade.market.upper()}] {trade.symbol} trade #{trade.trade_id} "
+                         f"no longer tracked: no close event in {self.max_age / 3600.0:g}h")
+        return len(stale)
+
+    def _forget(self, trade: TrackedTrade, order_ids):
+        with self._lock:
+            for oid in order_ids:
+                self._index.pop((trade.account, oid), None)
+
+    def _reindex(self, trade: TrackedTrade, order_ids):
+        with self._lock:
+            for oid in order_ids:
+                if oid is not None:
+                    self._index[(trade.account, oid)] = trade
+
+    def _report(self, trade: TrackedTrade, action: str, text: str, error: bool = False):
+        logging.log(logging.ERROR if error else logging.INFO, text)
+        log_event("position", signal_id=trade.signal_id, symbol=trade.symbol, market=trade.market,
+                  action=action, trade_id=trade.trade_id, entry=trade.entry_price, tp_filled=trade.tp_filled)
+        send_telegram_message(text, trade.cfg, coalesce=error)
+
+    def stats(self) -> dict:
+        return {"open": len(self._trades), "events": self.events, "reactions": self.reactions,
+                "breakevens": self.breakevens, "cancels": self.cancels, "errors": self.errors,
+                "unprotected": self.unprotected, "expired": self.expired,
+                "last_reaction_ms": round(self.last_reaction_ms, 2), "max_reaction_ms": round(self.max_reaction_ms, 2)}
+
+
+_manager: Optional[PositionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_position_manager() -> Optional[PositionManager]:
+    """Manager já iniciado (None se position_manager estiver desligado)"""
+    return _manager
+
+
+def start_position_manager(cfg, ledgers=()) -> Optional[PositionManager]:
+    """
+    Cria o manager conforme o bloco position_manager e assina os eventos dos ledgers (user data stream).
+    Sem ledger não há eventos de ordem: o manager não sobe (os trades nunca seriam encerrados).
+    """
+    global _manager
+    pm = (cfg or {}).get("position_manager") or {}
+    if not isinstance(pm, dict) or not pm.get("enabled", False):
+        return None
+    ledgers = list(ledgers)
+    if not ledgers:
+        logging.warning("Position manager not started: it needs user_data_stream.enabled (live mode) for order events")
+        return None
+    with _manager_lock:
+        if _manager is None:
+            _manager = PositionManager(pm.get("breakeven_after_tp", DEFAULT_BREAKEVEN_AFTER),
+                                       pm.get("cancel_orphans", True),
+                                       pm.get("max_age_hours", DEFAULT_MAX_AGE_HOURS))
+        for ledger in ledgers:
+            ledger.add_listener(_manager.on_event)
+        return _manager
@@ -0,0 +1,153 @@
+# prewarm.py
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from settings import compile_settings
+from signal_parser import get_parse_cache, warm_up_gemini
+from dedupe import get_dedupe_index
+from sim_exchange import sim_enabled
+from trader import get_binance_client, spot_registry, futures_registry
+from leverage_cache import warm_leverage_cache
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_TIMEOUT = 15.0
+DEFAULT_WORKERS = 8
+
+
+@dataclass
+class WarmStep:
+    """Passo do pre-warm; after é o nome do passo do qual ele depende (ex.: exchange info depois do client)"""
+    name: str
+    func: Callable[[], object]
+    after: Optional[str] = None
+
+
+@dataclass
+class StepResult:
+    name: str
+    ok: bool
+    ms: float = 0.0
+    detail: str = ""
+
+
+def sync_time(client) -> float:
+    """Mede o offset do relógio local contra a Binance e aplica em timestamp_offset (requisições assinadas)"""
+    t0 = time.time() * 1000.0
+    server = float(client.get_server_time()["serverTime"])
+    t1 = time.time() * 1000.0
+    offset = server - (t0 + t1) / 2.0
+    # O proxy do rate limiter delega atributos; o offset tem que ir no Client de verdade
+    target = getattr(client, "client", client)
+    target.timestamp_offset = int(offset)
+    return offset
+
+
+def _load_registry(registry) -> int:
+    n = registry.load()
+    registry.start()
+    return n
+
+
+def build_steps(cfg, settings=None) -> List[WarmStep]:
+    """Passos do pre-warm para o config: Gemini, caches locais e, por conta, client/hora/alavancagem/exchange info"""
+    settings = settings or compile_settings(cfg)
+    test_mode = settings.test_mode
+    steps = [
+        WarmStep("gemini", lambda: "model ready" if warm_up_gemini() else "skipped"),
+        WarmStep("parse_cache", lambda: f"{get_parse_cache().stats()['entries']} entries"),
+        WarmStep("dedupe", lambda: f"{get_dedupe_index(cfg).stats()['entries']} entries"),
+    ]
+    accounts = [(a.name, settings.for_account(a)) for a in settings.accounts] or [("main", cfg)]
+    for i, (name, account_cfg) in enumerate(accounts):
+        client_step = f"client[{name}]"
+
+        def make_client(account_cfg=account_cfg):
+            client = get_binance_client(account_cfg, test_mode)
+            return "simulated" if getattr(client, "simulated", False) else ("ready" if client else "test mode")
+
+        steps.append(WarmStep(client_step, make_client))
+        if test_mode and not sim_enabled(account_cfg):
+            continue
+        steps.append(WarmStep(f"time_sync[{name}]", lambda account_cfg=account_cfg:
+                              f"offset {sync_time(get_binance_client(account_cfg, test_mode)):+.0f} ms",
+                              after=client_step))
+        if (cfg.get("leverage_cache") or {}).get("enabled", True):
+            steps.append(WarmStep(f"leverage[{name}]", lambda account_cfg=account_cfg:
+                                  warm_leverage_cache(account_cfg, get_binance_client(account_cfg, test_mode)),
+                                  after=client_step))
+        if i == 0:
+            # Os registries de símbolos são do processo (um por mercado), basta a primeira conta
+            for market, registry in (("spot", spot_registry), ("futures", futures_registry)):
+                steps.append(WarmStep(f"exchange_info[{market}]", lambda account_cfg=account_cfg, registry=registry:
+                                      f"{_load_registry(registry(get_binance_client(account_cfg, test_mode), cfg))} symbols",
+                                      after=client_step))
+    return steps
+
+
+def _timed(step: WarmStep) -> StepResult:
+    start = time.perf_counter()
+    try:
+        detail = step.func()
+        return StepResult(step.name, True, (time.perf_counter() - start) * 1000.0, str(detail or ""))
+    except Exception as e:
+        return StepResult(step.name, False, (time.perf_counter() - start) * 1000.0, f"{type(e).__name__}: {e}")
+
+
+def run_prewarm(steps: List[WarmStep], timeout: float = DEFAULT_TIMEOUT,
+                max_workers: int = DEFAULT_WORKERS) -> List[StepResult]:
+    """
+    Roda os passos em paralelo respeitando as dependências e devolve o resultado de cada um na ordem dada.
+    Passos que não terminam dentro do timeout ficam rodando em background e aparecem como não concluídos.
+    """
+    results: Dict[str, StepResult] = {}
+    pending = list(steps)
+    running = {}
+    deadline = time.monotonic() + float(timeout)
+    pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="prewarm")
+    try:
+        while pending or running:
+            for step in list(pending):
+                if step.after is not None and step.after not in results:
+                    continue
+                pending.remove(step)
+                if step.after is not None and not results[step.after].ok:
+                    results[step.name] = StepResult(step.name, False, 0.0, f"skipped ({step.after} failed)")
+                    continue
+                running[pool.submit(_timed, step)] = step
+            if not running:
+                break
+            done, _ = wait(running, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                for step in list(running.values()) + pending:
+                    results[step.name] = StepResult(step.name, False, 0.0, f"timed out after {timeout:g}s")
+                break
+            for fut in done:
+                result = fut.result()
+                results[result.name] = result
+                del running[fut]
+    finally:
+        pool.shutdown(wait=False)
+    return [results[s.name] for s in steps if s.name in results]
+
+
+def prewarm(cfg, settings=None) -> List[StepResult]:
+    """Pre-warm de startup a partir do bloco "prewarm" do config (enabled, timeout_sec)"""
+    pw = cfg.get("prewarm", {})
+    if not pw.get("enabled", True):
+        return []
+    results = run_prewarm(build_steps(cfg, settings), pw.get("timeout_sec", DEFAULT_TIMEOUT))
+    for r in results:
+        if not r.ok:
+            logging.warning(f"Pre-warm {r.name} failed: {r.detail}")
+    return results
+
+
+def format_report(results: List[StepResult], total_ms: float) -> str:
+    lines = [f"  {'✓' if r.ok else '✗'} {r.name:<24} {r.ms:8.0f} ms  {r.detail}" for r in results]
+    ok = sum(1 for r in results if r.ok)
+    return "\n".join([f"Pre-warm: {ok}/{len(results)} steps OK in {total_ms:.0f} ms"] + lines)
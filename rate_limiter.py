@@ -0,0 +1,279 @@
+# rate_limiter.py
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from binance.exceptions import BinanceAPIException
+
+logging.basicConfig(level=logging.INFO)
+
+# Prioridades: ordens podem usar todo o limite; leituras do caminho do sinal e
+# chamadas informativas de fundo deixam uma folga para as ordens.
+PRIORITY_ORDER = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+RESERVE = {PRIORITY_ORDER: 0.0, PRIORITY_NORMAL: 0.10, PRIORITY_LOW: 0.30}
+
+DEFAULT_SAFETY = 0.9        # usa no máximo 90% do limite anunciado
+DEFAULT_MAX_WAIT = 5.0      # segundos que uma chamada não-ordem pode esperar antes de ser descartada
+ORDER_MAX_WAIT = 15.0
+DEFAULT_BAN_SEC = 60.0
+
+# Limites padrão da Binance (sobrescritos pelos rateLimits do exchange info quando disponível)
+SPOT_LIMITS = {("weight", "1m"): 6000, ("orders", "10s"): 100, ("orders", "1d"): 200000}
+FUTURES_LIMITS = {("weight", "1m"): 2400, ("orders", "10s"): 300, ("orders", "1m"): 1200}
+
+_INTERVAL_SEC = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_INTERVAL_LETTER = {"SECOND": "s", "MINUTE": "m", "HOUR": "h", "DAY": "d"}
+
+# método do client -> (mercado, peso, ordens, prioridade)
+ENDPOINTS: Dict[str, Tuple[str, int, int, int]] = {
+    "get_server_time": ("spot", 1, 0, PRIORITY_NORMAL),
+    "get_exchange_info": ("spot", 20, 0, PRIORITY_LOW),
+    "get_account": ("spot", 20, 0, PRIORITY_NORMAL),
+    "get_symbol_ticker": ("spot", 2, 0, PRIORITY_NORMAL),
+    "get_open_orders": ("spot", 6, 0, PRIORITY_LOW),
+    "order_market_buy": ("spot", 1, 1, PRIORITY_ORDER),
+    "order_market_sell": ("spot", 1, 1, PRIORITY_ORDER),
+    "create_order": ("spot", 1, 1, PRIORITY_ORDER),
+    "create_oco_order": ("spot", 1, 2, PRIORITY_ORDER),
+    "cancel_order": ("spot", 1, 0, PRIORITY_ORDER),
+    "stream_get_listen_key": ("spot", 2, 0, PRIORITY_NORMAL),
+    "stream_keepalive": ("spot", 2, 0, PRIORITY_NORMAL),
+    "futures_time": ("futures", 1, 0, PRIORITY_NORMAL),
+    "futures_exchange_info": ("futures", 1, 0, PRIORITY_LOW),
+    "futures_account_balance": ("futures", 5, 0, PRIORITY_NORMAL),
+    "futures_account": ("futures", 5, 0, PRIORITY_NORMAL),
+    "futures_symbol_ticker": ("futures", 1, 0, PRIORITY_NORMAL),
+    "futures_mark_price": ("futures", 1, 0, PRIORITY_NORMAL),
+    "futures_position_information": ("futures", 5, 0, PRIORITY_NORMAL),
+    "futures_symbol_config": ("futures", 5, 0, PRIORITY_NORMAL),
+    "futures_change_leverage": ("futures", 1, 0, PRIORITY_NORMAL),
+    "futures_change_margin_type": ("futures", 1, 0, PRIORITY_NORMAL),
+    "futures_create_order": ("futures", 1, 1, PRIORITY_ORDER),
+    "futures_place_batch_order": ("futures", 5, 1, PRIORITY_ORDER),   # ordens = tamanho do batch
+    "futures_cancel_order": ("futures", 1, 0, PRIORITY_ORDER),
+    "futures_get_open_orders": ("futures", 1, 0, PRIORITY_LOW),
+    "futures_stream_get_listen_key": ("futures", 1, 0, PRIORITY_NORMAL),
+    "futures_stream_keepalive": ("futures", 1, 0, PRIORITY_NORMAL),
+}
+
+
+class RateLimitShed(Exception):
+    """Chamada descartada localmente para não estourar o limite de peso/ordens da Binance"""
+
+
+def interval_seconds(label: str) -> float:
+    return float(label[:-1]) * _INTERVAL_SEC[label[-1]]
+
+
+class TokenBucket:
+    """Bucket de um limite (ex. peso/1m): reabastece continuamente e é corrigido pelos headers da Binance"""
+
+    def __init__(self, capacity: float, interval: float):
+        self.capacity = float(capacity)
+        self.interval = float(interval)
+        self.tokens = self.capacity
+        self._stamp = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.capacity / self.interval)
+        self._stamp = now
+
+    def wait_for(self, amount: float, floor: float) -> float:
+        """Segundos até sobrar `amount` acima de `floor` (0 se já dá)"""
+        missing = amount + floor - self.tokens
+        return 0.0 if missing <= 0 else missing * self.interval / self.capacity
+
+    def sync_used(self, used: float):
+        # O servidor é a fonte da verdade: nunca acredita em mais tokens do que ele permite
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+class RateLimiter:
+    """
+    Limitador de um mercado (Spot ou Futures): um token bucket por limite de peso
+    e de ordens, sincronizado pelos headers X-MBX-USED-WEIGHT-* / X-MBX-ORDER-COUNT-*.
+    Chamadas de prioridade baixa esperam ou são descartadas antes de consumir a folga das ordens.
+    """
+
+    def __init__(self, market: str, limits: Dict[Tuple[str, str], int], safety: float = DEFAULT_SAFETY):
+        self.market = market
+        self.safety = float(safety)
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.banned_until = 0.0
+        self.shed = 0
+        self.waited = 0.0
+        self.bans = 0
+        self._cond = threading.Condition()
+        self.set_limits(limits)
+
+    def set_limits(self, limits: Dict[Tuple[str, str], int]):
+        with self._cond:
+            for key, limit in limits.items():
+                capacity = max(1.0, limit * self.safety)
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    self.buckets[key] = TokenBucket(capacity, interval_seconds(key[1]))
+                else:
+                    bucket.tokens = min(bucket.tokens, capacity)
+                    bucket.capacity = capacity
+
+    def set_limits_from_exchange_info(self, info: dict):
+        """Usa os rateLimits anunciados no exchange info (REQUEST_WEIGHT e ORDERS)"""
+        limits = {}
+        for rl in (info or {}).get("rateLimits", []):
+            kind = {"REQUEST_WEIGHT": "weight", "ORDERS": "orders"}.get(rl.get("rateLimitType"))
+            letter = _INTERVAL_LETTER.get(rl.get("interval"))
+            if kind and letter and rl.get("limit"):
+                limits[(kind, f"{rl.get('intervalNum', 1)}{letter}")] = int(rl["limit"])
+        if limits:
+            self.set_limits(limits)
+
+    def acquire(self, weight: float, orders: int = 0, priority: int = PRIORITY_NORMAL,
+                max_wait: Optional[float] = None):
+        """Reserva peso/ordens; bloqueia até haver folga ou levanta RateLimitShed após max_wait"""
+        if max_wait is None:
+            max_wait = ORDER_MAX_WAIT if priority == PRIORITY_ORDER else DEFAULT_MAX_WAIT
+        reserve = RESERVE.get(priority, RESERVE[PRIORITY_LOW])
+        start = time.monotonic()
+        deadline = start + max_wait
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = max(0.0, self.banned_until - now)
+                for (kind, _), bucket in self.buckets.items():
+                    bucket.refill(now)
+                    amount = weight if kind == "weight" else orders
+                    if amount:
+                        wait = max(wait, bucket.wait_for(amount, reserve * bucket.capacity))
+                if wait <= 0:
+                    for (kind, _), bucket in self.buckets.items():
+                        bucket.tokens -= weight if kind == "weight" else orders
+                    self.waited += now - start
+                    return
+                if now + wait > deadline:
+                    self.shed += 1
+                    raise RateLimitShed(f"{self.market} rate limit: request (weight={weight}, orders={orders}, "
+                                        f"priority={priority}) shed, would wait {wait:.1f}s")
+                self._cond.wait(min(wait, deadline - now))
+
+    def observe(self, headers):
+        """Corrige os buckets com os contadores devolvidos pela Binance"""
+        if not headers:
+            return
+        with self._cond:
+            for name, value in headers.items():
+                name = name.lower()
+                if name.startswith("x-mbx-used-weight-"):
+                    key = ("weight", name[len("x-mbx-used-weight-"):])
+                elif name.startswith("x-mbx-order-count-"):
+                    key = ("orders", name[len("x-mbx-order-count-"):])
+                else:
+                    continue
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    continue
+                try:
+                    used = float(value)
+                except ValueError:
+                    continue
+                bucket.refill(time.monotonic())
+                bucket.sync_used(used)
+
+    def penalize(self, status_code: int, retry_after: Optional[float] = None):
+        """429/418: suspende todas as chamadas do mercado até o Retry-After"""
+        delay = float(retry_after) if retry_after else DEFAULT_BAN_SEC
+        with self._cond:
+            self.banned_until = max(self.banned_until, time.monotonic() + delay)
+            self.bans += 1
+            for bucket in self.buckets.values():
+                bucket.tokens = min(bucket.tokens, 0.0)
+        logging.warning(f"Binance {self.market} returned {status_code}, pausing requests for {delay:.0f}s")
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"shed": self.shed, "bans": self.bans, "waited_s": round(self.waited, 2),
+                    "tokens": {f"{k}/{i}": round(b.tokens, 1) for (k, i), b in self.buckets.items()}}
+
+
+class RateLimitedClient:
+    """
+    Proxy do binance.Client que passa cada chamada de endpoint pelo limitador do seu mercado.
+    on_order(endpoint, params, resposta, erro, latência_ms), se definido, é chamado após cada ordem.
+    """
+
+    def __init__(self, client, spot: RateLimiter, futures: RateLimiter, max_wait: float = DEFAULT_MAX_WAIT):
+        self.client = client
+        self.limiters = {"spot": spot, "futures": futures}
+        self.max_wait = float(max_wait)
+        self.on_order = None
+        # client.response é compartilhado entre threads (fan-out, pipeline, fallback do batch);
+        # um hook da sessão guarda a resposta de cada request na thread que a fez
+        self._local = threading.local()
+        session = getattr(client, "session", None)
+        if session is not None and isinstance(getattr(session, "hooks", None), dict):
+            session.hooks.setdefault("response", []).append(self._capture_response)
+
+    def _capture_response(self, response, *args, **kwargs):
+        self._local.response = response
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.client, name)
+        if name not in ENDPOINTS or not callable(attr):
+            return attr
+        market, weight, orders, priority = ENDPOINTS[name]
+        limiter = self.limiters[market]
+        max_wait = None if priority == PRIORITY_ORDER else self.max_wait
+
+        def call(*args, **kwargs):
+            n_orders = len(kwargs.get("batchOrders") or ()) if name == "futures_place_batch_order" else orders
+            limiter.acquire(weight, n_orders, priority, max_wait)
+            start, result, error = time.perf_counter(), None, None
+            self._local.response = None
+            try:
+                result = attr(*args, **kwargs)
+            except BinanceAPIException as e:
+                error = e
+                if e.status_code in (418, 429):
+                    headers = getattr(e.response, "headers", None) or {}
+                    limiter.penalize(e.status_code, headers.get("Retry-After"))
+                raise
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                response = getattr(self._local, "response", None)
+                limiter.observe(getattr(response, "headers", None))
+                if priority == PRIORITY_ORDER and self.on_order is not None:
+                    self.on_order(name, kwargs, result, error, (time.perf_counter() - start) * 1000.0)
+            if name.endswith("exchange_info") and isinstance(result, dict):
+                limiter.set_limits_from_exchange_info(result)
+            return result
+
+        call.__name__ = name
+        self.__dict__[name] = call   # próximas chamadas não passam pelo __getattr__
+        return call
+
+
+_LIMITERS: Dict[str, RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(market: str, safety: float = DEFAULT_SAFETY) -> RateLimiter:
+    """Limitador do processo para o mercado; todos os clients (mesmo IP) compartilham o mesmo"""
+    limiter = _LIMITERS.get(market)
+    if limiter is not None:
+        return limiter
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(market)
+        if limiter is None:
+            limiter = RateLimiter(market, SPOT_LIMITS if market == "spot" else FUTURES_LIMITS, safety)
+            _LIMITERS[market] = limiter
+        return limiter
+
+
+def rate_limited(client, safety: float = DEFAULT_SAFETY, max_wait: float = DEFAULT_MAX_WAIT) -> RateLimitedClient:
+    return RateLimitedClient(client, get_limiter("spot", safety), get_limiter("futures", safety), max_wait)
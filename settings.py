@@ -0,0 +1,451 @@
+# settings.py
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+
+CONFIG_FILE = "config.json"
+TARGET_KEYS = ("T1", "T2", "T3", "T4")
+TP_WEIGHTS = (0.30, 0.30, 0.20, 0.20)
+DEFAULT_ALLOCATION = 0.15
+TRADE_MODES = ("auto", "spot", "futures")
+WORKING_TYPES = ("MARK_PRICE", "CONTRACT_PRICE")
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+# (índices dos targets escolhidos, pesos normalizados)
+SelectionPlan = Tuple[Tuple[int, ...], Tuple[float, ...]]
+HINT_KEYS = ("market", "side", "leverage")
+
+
+class ConfigError(ValueError):
+    """Configuração inválida (valor fora do domínio ou tipo errado)"""
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Snapshot imutável e validado do config.json"""
+
+    __slots__ = (
+        "raw", "mtime", "test_mode", "trade_mode", "futures_default_leverage",
+        "futures_working_type", "gemini_api_key", "gemini_model",
+        "target_selection", "selection_plans", "tp_weights", "allocation", "channels", "accounts",
+    )
+
+    raw: Mapping[str, Any]
+    mtime: float
+    test_mode: bool
+    trade_mode: str
+    futures_default_leverage: int
+    futures_working_type: str
+    gemini_api_key: str
+    gemini_model: str
+    target_selection: Mapping[str, bool]
+    selection_plans: Tuple[SelectionPlan, ...]
+    tp_weights: Tuple[float, ...]
+    allocation: float
+    channels: Mapping[int, "ChannelProfile"]
+    accounts: Tuple["AccountProfile", ...]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.raw.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.raw[key]
+
+    def selection_for(self, n_targets: int) -> SelectionPlan:
+        """Plano pré-calculado de targets/pesos para um sinal com n targets"""
+        return self.selection_plans[max(0, min(n_targets, len(TARGET_KEYS)))]
+
+    def for_account(self, account: "AccountProfile") -> "AccountSettings":
+        return AccountSettings(self, account)
+
+
+@dataclass(frozen=True)
+class AccountProfile:
+    """Conta Binance que recebe cada sinal (config accounts)"""
+
+    __slots__ = ("name", "api_key", "api_secret", "allocation")
+
+    name: str
+    api_key: str
+    api_secret: str
+    allocation: Optional[float]    # None = usa a alocação do canal / global
+
+
+class AccountSettings:
+    """Settings visto por uma conta: mesmas chaves, com as credenciais e a alocação da conta"""
+
+    __slots__ = ("settings", "account", "_overrides")
+
+    def __init__(self, settings: Settings, account: AccountProfile):
+        self.settings = settings
+        self.account = account
+        self._overrides = {"binance_api_key": account.api_key, "binance_api_secret": account.api_secret}
+        if account.allocation is not None:
+            self._overrides["allocation_fraction"] = account.allocation
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._overrides:
+            return self._overrides[key]
+        return self.settings.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._overrides:
+            return self._overrides[key]
+        return self.settings[key]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.settings, name)
+
+
+@dataclass(frozen=True)
+class ChannelProfile:
+    """Perfil de um canal de sinais, já resolvido contra os valores globais do config"""
+
+    __slots__ = ("channel_id", "name", "trade_mode", "selection_plans", "allocation", "max_leverage", "hints")
+
+    channel_id: int
+    name: str
+    trade_mode: str
+    selection_plans: Tuple[SelectionPlan, ...]
+    allocation: float
+    max_leverage: Optional[int]
+    hints: Mapping[str, Any]     # valores usados quando o parser não extrai market/side/leverage
+
+    def selection_for(self, n_targets: int) -> SelectionPlan:
+        return self.selection_plans[max(0, min(n_targets, len(TARGET_KEYS)))]
+
+    def cap_leverage(self, leverage: Optional[int]) -> Optional[int]:
+        if leverage is None or self.max_leverage is None:
+            return leverage
+        return min(int(leverage), self.max_leverage)
+
+
+def read_target_selection(cfg: Mapping[str, Any]) -> dict:
+    sel = cfg.get("target_selection")
+    if isinstance(sel, dict):
+        return {"T1": bool(sel.get("T1", True)), "T2": bool(sel.get("T2", True)),
+                "T3": bool(sel.get("T3", False)), "T4": bool(sel.get("T4", False))}
+    return {"T1": bool(cfg.get("buy_T1", True)), "T2": bool(cfg.get("buy_T2", True)),
+            "T3": bool(cfg.get("buy_T3", False)), "T4": bool(cfg.get("buy_T4", False))}
+
+
+def read_tp_weights(cfg: Mapping[str, Any]) -> Tuple[float, ...]:
+    """Pesos relativos de T1..T4 (config tp_weights); renormalizados sobre os targets escolhidos"""
+    raw = cfg.get("tp_weights", TP_WEIGHTS)
+    try:
+        weights = tuple(float(w) for w in raw)
+    except (TypeError, ValueError):
+        raise ConfigError("tp_weights must be a list of 4 numbers")
+    if len(weights) != len(TARGET_KEYS) or min(weights) < 0 or sum(weights) <= 0:
+        raise ConfigError("tp_weights must be 4 non-negative numbers with a positive sum")
+    return weights
+
+
+def compile_selection_plans(selection: Mapping[str, bool], base=TP_WEIGHTS,
+                            where: str = "target_selection") -> Tuple[SelectionPlan, ...]:
+    plans = []
+    for n in range(len(TARGET_KEYS) + 1):
+        idx = tuple(i for i in range(n) if selection.get(TARGET_KEYS[i], False))
+        total = sum(base[i] for i in idx)
+        if idx and total <= 0:
+            keys = "+".join(TARGET_KEYS[i] for i in idx)
+            raise ConfigError(f"{where}: selected targets {keys} have zero total weight in tp_weights")
+        plans.append((idx, tuple(base[i] / total for i in idx)) if idx else ((), ()))
+    return tuple(plans)
+
+
+def _channel_id(value) -> int:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        raise ConfigError(f"invalid channel id {value!r}")
+
+
+def _read_allocation(value, where: str) -> float:
+    try:
+        allocation = float(value)
+    except (TypeError, ValueError):
+        allocation = -1.0
+    if not 0.0 < allocation <= 1.0:
+        raise ConfigError(f"{where} must be in (0, 1]")
+    return allocation
+
+
+def compile_channels(cfg: Mapping[str, Any], trade_mode: str, selection: Mapping[str, bool],
+                     tp_weights: Tuple[float, ...], allocation: float) -> Mapping[int, ChannelProfile]:
+    """
+    Tabela canal (int) -> ChannelProfile a partir de channel_id (um id, lista ou ids separados
+    por vírgula, com o perfil global) e de channels ({id: perfil}); chaves ausentes herdam o global.
+    """
+    raw = cfg.get("channel_id", "")
+    ids = raw if isinstance(raw, (list, tuple)) else [c for c in str(raw or "").split(",") if c.strip()]
+    profiles = {str(c).strip(): {} for c in ids}
+    extra = cfg.get("channels") or {}
+    if isinstance(extra, list):
+        extra = {str(p.get("id", "")).strip(): p for p in extra if isinstance(p, dict)}
+    if not isinstance(extra, dict):
+        raise ConfigError("channels must be a JSON object of channel id -> profile")
+    for key, profile in extra.items():
+        if not isinstance(profile, dict):
+            raise ConfigError(f"channels.{key} must be a JSON object")
+        profiles[str(key).strip()] = profile
+
+    default_plans = compile_selection_plans(selection, tp_weights)
+    table = {}
+    for key, profile in profiles.items():
+        channel_id = _channel_id(key)
+        mode = str(profile.get("trade_mode", trade_mode)).strip().lower()
+        if mode not in TRADE_MODES:
+            raise ConfigError(f"channels.{key}.trade_mode must be one of {TRADE_MODES}")
+        plans = default_plans
+        if "target_selection" in profile:
+            plans = compile_selection_plans(read_target_selection(profile), tp_weights,
+                                            f"channels.{key}.target_selection")
+        alloc = allocation
+        if "allocation_fraction" in profile:
+            alloc = _read_allocation(profile["allocation_fraction"], f"channels.{key}.allocation_fraction")
+        max_leverage = profile.get("max_leverage")
+        if max_leverage is not None:
+            try:
+                max_leverage = int(max_leverage)
+            except (TypeError, ValueError):
+                max_leverage = 0
+            if max_leverage < 1:
+                raise ConfigError(f"channels.{key}.max_leverage must be an integer >= 1")
+        hints = profile.get("parser_hints") or {}
+        if not isinstance(hints, dict) or set(hints) - set(HINT_KEYS):
+            raise ConfigError(f"channels.{key}.parser_hints accepts only {HINT_KEYS}")
+        if str(hints.get("market") or "spot").lower() not in ("spot", "futures") \
+                or str(hints.get("side") or "long").lower() not in ("long", "short"):
+            raise ConfigError(f"channels.{key}.parser_hints: market must be spot/futures and side long/short")
+        hints = {k: v for k, v in hints.items() if v not in (None, "")}
+        if "leverage" in hints:
+            try:
+                hints["leverage"] = int(hints["leverage"])
+            except (TypeError, ValueError):
+                hints["leverage"] = 0
+            if hints["leverage"] < 1:
+                raise ConfigError(f"channels.{key}.parser_hints.leverage must be an integer >= 1")
+        table[channel_id] = ChannelProfile(
+            channel_id=channel_id,
+            name=str(profile.get("name") or key),
+            trade_mode=mode,
+            selection_plans=plans,
+            allocation=alloc,
+            max_leverage=max_leverage,
+            hints=MappingProxyType(hints),
+        )
+    return MappingProxyType(table)
+
+
+def compile_accounts(cfg: Mapping[str, Any]) -> Tuple[AccountProfile, ...]:
+    """Contas de accounts (lista de {name, binance_api_key, binance_api_secret, allocation_fraction}); vazio = só a conta do topo"""
+    raw = cfg.get("accounts") or []
+    if not isinstance(raw, list):
+        raise ConfigError("accounts must be a list of account objects")
+    accounts, names = [], set()
+    for i, entry in enumerate(raw):
+        if not isinstance(entry, dict):
+            raise ConfigError(f"accounts[{i}] must be a JSON object")
+        if not entry.get("enabled", True):
+            continue
+        name = str(entry.get("name") or f"account{i + 1}").strip()
+        if name in names:
+            raise ConfigError(f"duplicate account name {name!r}")
+        key, secret = str(entry.get("binance_api_key") or "").strip(), str(entry.get("binance_api_secret") or "").strip()
+        if not key or not secret:
+            raise ConfigError(f"accounts[{i}] ({name}) needs binance_api_key and binance_api_secret")
+        allocation = None
+        if "allocation_fraction" in entry:
+            allocation = _read_allocation(entry["allocation_fraction"], f"accounts[{i}].allocation_fraction")
+        names.add(name)
+        accounts.append(AccountProfile(name=name, api_key=key, api_secret=secret, allocation=allocation))
+    return tuple(accounts)
+
+
+def compile_settings(cfg: Mapping[str, Any], mtime: float = 0.0) -> Settings:
+    """Valida o dict do config e pré-calcula tudo que o caminho do sinal precisa"""
+    if not isinstance(cfg, dict):
+        raise ConfigError("config root must be a JSON object")
+    trade_mode = str(cfg.get("trade_mode", "auto")).strip().lower()
+    if trade_mode not in TRADE_MODES:
+        raise ConfigError(f"trade_mode must be one of {TRADE_MODES}, got {trade_mode!r}")
+    try:
+        leverage = int(cfg.get("futures_default_leverage", 5))
+    except (TypeError, ValueError):
+        raise ConfigError("futures_default_leverage must be an integer")
+    if leverage < 1:
+        raise ConfigError("futures_default_leverage must be >= 1")
+    working_type = str(cfg.get("futures_working_type", "MARK_PRICE")).strip().upper()
+    if working_type not in WORKING_TYPES:
+        raise ConfigError(f"futures_working_type must be one of {WORKING_TYPES}")
+    for key in ("exchange_info_ttl_sec", "binance_pool_size", "binance_timeout_sec", "config_reload_sec",
+                "pipeline_workers", "pipeline_queue_size", "rate_limit_safety", "rate_limit_max_wait_sec",
+                "journal_batch_size", "journal_flush_sec", "dedupe_window_sec", "dedupe_max_entries"):
+        if key in cfg:
+            try:
+                if float(cfg[key]) <= 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                raise ConfigError(f"{key} must be a positive number")
+    sim = cfg.get("sim_exchange", {})
+    if not isinstance(sim, dict):
+        raise ConfigError("sim_exchange must be a JSON object")
+    for key in ("rate_limit_rate", "partial_fill_rate"):
+        try:
+            if not 0.0 <= float(sim.get(key, 0.0)) <= 1.0:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ConfigError(f"sim_exchange.{key} must be between 0 and 1")
+    uds = cfg.get("user_data_stream", {})
+    if not isinstance(uds, dict):
+        raise ConfigError("user_data_stream must be a JSON object")
+    for key in ("reconcile_sec", "keepalive_sec"):
+        try:
+            if float(uds.get(key, 1)) <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ConfigError(f"user_data_stream.{key} must be a positive number")
+    pw = cfg.get("prewarm", {})
+    if not isinstance(pw, dict):
+        raise ConfigError("prewarm must be a JSON object")
+    try:
+        if float(pw.get("timeout_sec", 15)) <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ConfigError("prewarm.timeout_sec must be a positive number")
+    lc = cfg.get("leverage_cache", {})
+    if not isinstance(lc, dict):
+        raise ConfigError("leverage_cache must be a JSON object")
+    if str(lc.get("margin_type") or "").lower() not in ("", "cross", "isolated"):
+        raise ConfigError("leverage_cache.margin_type must be \"cross\", \"isolated\" or empty (leave as is)")
+    if not isinstance(lc.get("watch_symbols", []), list):
+        raise ConfigError("leverage_cache.watch_symbols must be a list of symbols")
+    try:
+        if lc.get("watch_leverage") is not None and int(lc["watch_leverage"]) < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ConfigError("leverage_cache.watch_leverage must be an integer >= 1 (null = futures_default_leverage)")
+    try:
+        if float(lc.get("ttl_sec", 300)) < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ConfigError("leverage_cache.ttl_sec must be a number >= 0 (0 = only trust the cache while the futures user data stream is connected)")
+    pm = cfg.get("position_manager", {})
+    if not isinstance(pm, dict):
+        raise ConfigError("position_manager must be a JSON object")
+    try:
+        if int(pm.get("breakeven_after_tp", 1)) < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ConfigError("position_manager.breakeven_after_tp must be an integer >= 0 (0 disables)")
+    try:
+        if float(pm.get("max_age_hours", 72)) <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ConfigError("position_manager.max_age_hours must be a positive number")
+    md = cfg.get("market_data", {})
+    if not isinstance(md, dict):
+        raise ConfigError("market_data must be a JSON object")
+    try:
+        if float(md.get("max_age_sec", 5)) <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ConfigError("market_data.max_age_sec must be a positive number")
+    allocation = _read_allocation(cfg.get("allocation_fraction", DEFAULT_ALLOCATION), "allocation_fraction")
+    tp_weights = read_tp_weights(cfg)
+    selection = read_target_selection(cfg)
+    channels = compile_channels(cfg, trade_mode, selection, tp_weights, allocation)
+    return Settings(
+        raw=MappingProxyType(dict(cfg)),
+        mtime=mtime,
+        test_mode=bool(cfg.get("test_mode", True)),
+        trade_mode=trade_mode,
+        futures_default_leverage=leverage,
+        futures_working_type=working_type,
+        gemini_api_key=str(cfg.get("gemini_api_key") or "").strip(),
+        gemini_model=str(cfg.get("gemini_model") or "gemini-1.5-flash").strip(),
+        target_selection=MappingProxyType(selection),
+        selection_plans=compile_selection_plans(selection, tp_weights),
+        tp_weights=tp_weights,
+        allocation=allocation,
+        channels=channels,
+        accounts=compile_accounts(cfg),
+    )
+
+
+class ConfigStore:
+    """Guarda o Settings atual e troca por um novo snapshot quando o arquivo muda"""
+
+    def __init__(self, path: str = CONFIG_FILE):
+        self.path = path
+        self._current: Optional[Settings] = None
+        self._rejected_mtime = 0.0
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def get(self) -> Settings:
+        current = self._current
+        if current is None:
+            self.reload()
+            current = self._current
+        return current
+
+    def reload(self) -> bool:
+        """Recompila se o mtime mudou; retorna True quando um novo snapshot foi publicado"""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"{self.path} not found. Create it first.")
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            if self._current is not None and mtime in (self._current.mtime, self._rejected_mtime):
+                return False
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    compiled = compile_settings(json.load(f), mtime)
+            except ValueError:
+                # Não reporta de novo a mesma versão inválida do arquivo
+                self._rejected_mtime = mtime
+                raise
+            # Troca de referência única: leitores veem o snapshot antigo ou o novo, nunca um misto
+            self._current = compiled
+            return True
+
+    def start_watching(self, interval: float = DEFAULT_RELOAD_INTERVAL):
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, args=(max(0.1, float(interval)),),
+                                         name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                if self.reload():
+                    logging.info(f"{self.path} changed, configuration reloaded")
+            except (ConfigError, json.JSONDecodeError) as e:
+                logging.error(f"Ignoring invalid {self.path} (keeping previous config): {e}")
+            except Exception as e:
+                logging.warning(f"Config watcher error: {e}")
+
+
+_STORE = ConfigStore()
+
+
+def get_settings() -> Settings:
+    return _STORE.get()
+
+
+def start_config_watcher(interval: float = DEFAULT_RELOAD_INTERVAL):
+    _STORE.start_watching(interval)
@@ -1,27 +1,113 @@
 # signal_parser.py
 
-import os, json, re, logging
+import json, re, logging, threading
+from settings import get_settings
+from parse_cache import ParseCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+from tracing import span
 logging.basicConfig(level=logging.INFO)
 
-CONFIG_FILE = "config.json"
-
 try:
     import google.generativeai as genai
     _HAS_GEMINI = True
 except Exception:
     _HAS_GEMINI = False
 
-def _load_config():
-    if not os.path.exists(CONFIG_FILE):
-        return {}
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+# Modelos tentados depois do configurado, se ele falhar
+GEMINI_FALLBACK_MODELS = (
+    "gemini-1.5-flash-latest",
+    "gemini-1.5-pro-latest",
+    "gemini-pro",
+)
+
+GEMINI_SYSTEM_PROMPT = (
+    "Extract a crypto trading signal into strict JSON with keys: "
+    "pair, entry, targets (array of numbers), stop_loss, side, leverage, market. "
+    "IMPORTANT: Do NOT include stop_loss in the targets array. "
+    "Targets should only contain take profit levels. "
+    "Return ONLY valid JSON, nothing else."
+)
+
+# Handles de modelo reutilizados entre mensagens (genai.configure só quando a key muda)
+_gemini_lock = threading.Lock()
+_gemini_key = None
+_gemini_models = {}
+_gemini_last_good = None
+
+def _gemini_model(api_key: str, name: str):
+    global _gemini_key
+    with _gemini_lock:
+        if api_key != _gemini_key:
+            genai.configure(api_key=api_key)
+            _gemini_models.clear()
+            _gemini_key = api_key
+        model = _gemini_models.get(name)
+        if model is None:
+            model = _gemini_models[name] = genai.GenerativeModel(name)
+        return model
+
+def _gemini_chain(model_name: str):
+    """Ordem de tentativa: último modelo que funcionou, depois o configurado e os fallbacks"""
+    chain = [model_name] + [m for m in GEMINI_FALLBACK_MODELS if m != model_name]
+    if _gemini_last_good in chain:
+        chain.remove(_gemini_last_good)
+        chain.insert(0, _gemini_last_good)
+    return chain
+
+def _gemini_generate(api_key: str, model_name: str, message: str, validate=None):
+    """
+    Retorna (modelo, resultado) do primeiro modelo da cadeia cuja resposta passar em validate
+    (sem validate: o texto, se não vazio). Resposta inválida passa para o próximo modelo, e só uma
+    resposta validada torna o modelo o primeiro da cadeia nas próximas mensagens.
+    """
+    global _gemini_last_good
+    for model in _gemini_chain(model_name):
+        try:
+            resp = _gemini_model(api_key, model).generate_content(
+                contents=[{"role": "user", "parts": [{"text": GEMINI_SYSTEM_PROMPT + "\n\nText:\n" + message}]}],
+                generation_config={"temperature": 0.0, "response_mime_type": "application/json"},
+            )
+            raw = getattr(resp, "text", "") or ""
+            if not raw.strip():
+                continue
+            if validate is None:
+                return model, raw
+            result = validate(raw)
+            if not result:
+                logging.debug(f"Model {model} returned no valid signal")
+                continue
+            if model != _gemini_last_good:
+                logging.info(f"Gemini model in use: {model}")
+            _gemini_last_good = model
+            return model, result
+        except Exception as e:
+            logging.debug(f"Failed with model {model}: {e}")
+            continue
+    return None, None
+
+def warm_up_gemini() -> bool:
+    """Cria os handles e faz uma chamada curta para o primeiro sinal não pagar o cold start"""
+    if not _HAS_GEMINI:
+        return False
+    try:
+        cfg = get_settings()
+    except (FileNotFoundError, ValueError):
+        return False
+    if not cfg.gemini_api_key:
+        return False
+    model, _ = _gemini_generate(cfg.gemini_api_key, cfg.gemini_model, "ping")
+    if model:
+        logging.info(f"Gemini warm-up OK ({model})")
+    else:
+        logging.warning("Gemini warm-up failed: no model responded")
+    return bool(model)
+
+_PAIR_STRICT_RE = re.compile(r"^([A-Z]{2,10})/(USDT|USDC)$")
 
 def _validate_struct(data):
     if not isinstance(data, dict):
         return None
     pair_raw = str(data.get("pair", "")).upper().replace(" ", "")
-    m = re.match(r"^([A-Z]{2,10})/(USDT|USDC)$", pair_raw)
+    m = _PAIR_STRICT_RE.match(pair_raw)
     if not m:
         return None
     pair = f"{m.group(1)}/{m.group(2)}"
@@ -68,20 +154,95 @@ def _validate_struct(data):
     return { "pair": pair, "entry": entry, "targets": targets, "stop_loss": stop_loss,
              "side": side, "leverage": leverage, "market": market }
 
+# ------------- Regex engine -------------
+# Padrões compilados uma vez. Um único scan (_KEYWORD_RE) acha todas as posições onde
+# uma palavra-chave começa; cada campo é extraído com match ancorado nessas posições,
+# sem re-varrer a mensagem inteira. Cada alternativa consome a palavra menos o último
+# caractere (lookahead), o único ponto onde outra palavra-chave poderia começar
+# ("sleverage", "/USDTTP"...), então nenhuma ocorrência é pulada e o resultado é
+# idêntico ao de um re.search por campo.
+_KEYWORD_PATTERN = r"entr(?=y)|stop\s*los(?=s)|s(?=l)|targe(?=t)|t(?=p)|/usd(?=[tc])|leverag(?=e)|futur(?=e)"
+_KEYWORD_KINDS = {"e": "entry", "s": "stop", "t": "targets", "/": "pair", "l": "leverage", "f": "futures"}
+# Scan sobre message.lower() é bem mais rápido que IGNORECASE; estes caracteres casam com
+# letras ASCII sob IGNORECASE mas não viram ASCII (ou mudam de tamanho) com lower()
+_KEYWORD_RE = re.compile(_KEYWORD_PATTERN)
+_KEYWORD_RE_I = re.compile(_KEYWORD_PATTERN, re.IGNORECASE)
+_CASEFOLD_UNSAFE_RE = re.compile("[\u0130\u0131\u017f]")
+_PAIR_RE = re.compile(r"#?([A-Z]{2,10})/(USDT|USDC)", re.IGNORECASE)
+_ENTRY_RE = re.compile(r"(Entry\s+around|Entry\s+Point|Entry)\s*[:\-]?\s*([\d.]+)", re.IGNORECASE)
+_STOP_RE = re.compile(r"(Stop\s*Loss|SL)\s*[:\-]?\s*([\d.]+)", re.IGNORECASE)
+_TARGETS_HEAD_RE = re.compile(r"(Targets?|TP)\s*[:\-]?\s*", re.IGNORECASE)
+_LEVERAGE_RE = re.compile(r"leverage\s*[:\-]?\s*(\d+)\s*x", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"[\d.]+")
+_SHORT_RE = re.compile(r"\bshort\b|\bsell\b", re.IGNORECASE)
+_LONG_RE = re.compile(r"\blong\b|\bbuy\b", re.IGNORECASE)
+
+def _scan_keywords(message: str) -> dict:
+    """Um passe pela mensagem: {tipo de palavra-chave: [posições em ordem]}"""
+    found = {}
+    if _CASEFOLD_UNSAFE_RE.search(message):
+        text, pattern = message, _KEYWORD_RE_I
+    else:
+        text, pattern = message.lower(), _KEYWORD_RE
+    kinds = _KEYWORD_KINDS
+    for m in pattern.finditer(text):
+        pos = m.start()
+        kind = kinds.get(text[pos])
+        if kind is None:
+            kind = kinds[text[pos].casefold()]
+        if kind in found:
+            found[kind].append(pos)
+        else:
+            found[kind] = [pos]
+    return found
+
+def _first_match(pattern, message: str, positions):
+    for pos in positions:
+        m = pattern.match(message, pos)
+        if m:
+            return m
+    return None
+
+def _find_pair(message: str, slashes):
+    # O par termina no "/USDT": basta procurar na janela de até 11 caracteres antes da barra
+    for pos in slashes:
+        m = _PAIR_RE.search(message, max(0, pos - 11), pos + 5)
+        if m:
+            return m
+    return None
+
+def _targets_span(message: str, starts, stops):
+    """Equivalente a (Targets?|TP)\\s*[:\\-]?\\s*(.+?)(?=(Stop\\s*Loss|SL|$)) com DOTALL"""
+    n = len(message)
+    for pos in starts:
+        begin = _TARGETS_HEAD_RE.match(message, pos).end()
+        if begin >= n:
+            # Só separadores até o fim da mensagem: não há números de targets
+            return None
+        ends = [p for p in stops if p > begin][:1]
+        if message.endswith("\n") and n - 1 > begin:
+            ends.append(n - 1)
+        ends.append(n)
+        return begin, min(ends)
+    return None
+
 def _regex_parse(message: str):
     try:
-        pair_match = re.search(r"#?([A-Z]{2,10})/(USDT|USDC)", message, re.IGNORECASE)
+        keywords = _scan_keywords(message)
+        
+        pair_match = _find_pair(message, keywords.get("pair", ()))
         if not pair_match:
             return None
         pair = f"{pair_match.group(1).upper()}/{pair_match.group(2).upper()}"
         
-        entry_match = re.search(r"(Entry\s+around|Entry\s+Point|Entry)\s*[:\-]?\s*([\d.]+)", message, re.IGNORECASE)
+        entry_match = _first_match(_ENTRY_RE, message, keywords.get("entry", ()))
         if not entry_match:
             return None
         entry_price = float(entry_match.group(2))
         
         # Primeiro, encontra o Stop Loss
-        stop_match = re.search(r"(Stop\s*Loss|SL)\s*[:\-]?\s*([\d.]+)", message, re.IGNORECASE)
+        stops = keywords.get("stop", ())
+        stop_match = _first_match(_STOP_RE, message, stops)
         stop_loss = float(stop_match.group(2)) if stop_match else None
         
         if stop_loss is None:
@@ -89,15 +250,11 @@ def _regex_parse(message: str):
         
         # Agora procura targets, MAS para antes do Stop Loss
         targets = []
+        span = _targets_span(message, keywords.get("targets", ()), stops)
         
-        # Procura a seção de targets
-        targets_match = re.search(r"(Targets?|TP)\s*[:\-]?\s*(.+?)(?=(Stop\s*Loss|SL|$))", message, re.IGNORECASE | re.DOTALL)
-        
-        if targets_match:
-            targets_text = targets_match.group(2)
+        if span:
             # Extrai apenas números da seção de targets
-            nums = re.findall(r"[\d.]+", targets_text)
-            for num in nums:
+            for num in _NUMBER_RE.findall(message, *span):
                 try:
                     val = float(num)
                     # Ignora se for igual ao stop loss ou entry
@@ -118,20 +275,20 @@ def _regex_parse(message: str):
         
         # Se não detectou, procura palavras-chave
         if not side:
-            if re.search(r"\bshort\b|\bsell\b", message, re.IGNORECASE):
+            if _SHORT_RE.search(message):
                 side = "short"
-            elif re.search(r"\blong\b|\bbuy\b", message, re.IGNORECASE):
+            elif _LONG_RE.search(message):
                 side = "long"
         
         # Leverage
         lev = None
-        lev_m = re.search(r"leverage\s*[:\-]?\s*(\d+)\s*x", message, re.IGNORECASE)
+        lev_m = _first_match(_LEVERAGE_RE, message, keywords.get("leverage", ()))
         if lev_m:
             lev = int(lev_m.group(1))
         
         # Market
         market = None
-        if re.search(r"futures?", message, re.IGNORECASE) or side == "short" or lev:
+        if "futures" in keywords or side == "short" or lev:
             market = "futures"
         
         return _validate_struct({
@@ -151,78 +308,85 @@ def _regex_parse(message: str):
 def _gemini_parse(message: str):
     if not _HAS_GEMINI:
         return None
-    cfg = _load_config()
-    api_key = (cfg.get("gemini_api_key") or "").strip()
-    model_name = (cfg.get("gemini_model") or "gemini-1.5-flash").strip()
+    try:
+        cfg = get_settings()
+    except (FileNotFoundError, ValueError):
+        return None
+    api_key = cfg.gemini_api_key
+    model_name = cfg.gemini_model
     
     if not api_key:
         return None
     
     try:
-        genai.configure(api_key=api_key)
-        
-        # Tenta diferentes versões do modelo se o padrão falhar
-        models_to_try = [
-            model_name,
-            "gemini-1.5-flash-latest",
-            "gemini-1.5-pro-latest",
-            "gemini-pro"
-        ]
-        
-        for model in models_to_try:
-            try:
-                model_obj = genai.GenerativeModel(model)
-                
-                system = (
-                    "Extract a crypto trading signal into strict JSON with keys: "
-                    "pair, entry, targets (array of numbers), stop_loss, side, leverage, market. "
-                    "IMPORTANT: Do NOT include stop_loss in the targets array. "
-                    "Targets should only contain take profit levels. "
-                    "Return ONLY valid JSON, nothing else."
-                )
-                
-                resp = model_obj.generate_content(
-                    contents=[{"role": "user", "parts": [{"text": system + "\n\nText:\n" + message}]}],
-                    generation_config={"temperature": 0.0, "response_mime_type": "application/json"},
-                )
-                
-                raw = getattr(resp, "text", "") or ""
-                if not raw.strip():
-                    continue
-                
-                data = json.loads(raw)
-                validated = _validate_struct(data)
-                
-                if validated:
-                    logging.info(f"Gemini parse successful with model: {model}")
-                    return validated
-                    
-            except Exception as e:
-                logging.debug(f"Failed with model {model}: {e}")
-                continue
+        # Tenta diferentes versões do modelo se o padrão falhar ou devolver um sinal inválido
+        model, validated = _gemini_generate(api_key, model_name, message,
+                                            validate=lambda raw: _validate_struct(json.loads(raw)))
         
-        # Se chegou aqui, nenhum modelo funcionou
-        logging.warning("All Gemini models failed, falling back to regex")
-        return None
+        if not model:
+            # Se chegou aqui, nenhum modelo funcionou
+            logging.warning("All Gemini models failed, falling back to regex")
+            return None
+        
+        logging.info(f"Gemini parse successful with model: {model}")
+        return validated
         
     except Exception as e:
         logging.error(f"Gemini parsing error: {e}")
         return None
 
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache() -> ParseCache:
+    """Cache de resultados de parse do processo (criado na primeira chamada a partir do config)"""
+    global _parse_cache
+    if _parse_cache is None:
+        with _parse_cache_lock:
+            if _parse_cache is None:
+                try:
+                    cfg = get_settings()
+                except (FileNotFoundError, ValueError):
+                    cfg = {}
+                _parse_cache = ParseCache(
+                    max_entries=cfg.get("parse_cache_size", DEFAULT_MAX_ENTRIES),
+                    ttl=cfg.get("parse_cache_ttl_sec", DEFAULT_TTL),
+                    path=cfg.get("parse_cache_path"),
+                )
+    return _parse_cache
+
 def parse_signal(message: str):
     """
-    Tenta fazer parse do sinal, primeiro com Gemini AI, depois com regex
+    Tenta fazer parse do sinal, primeiro pelo cache, depois com Gemini AI e por fim com regex
     """
+    with span("parse", source="none") as tags:
+        return _parse_signal(message, tags)
+
+def _parse_signal(message: str, tags: dict):
+    cache = get_parse_cache()
+    with span("parse.cache"):
+        data = cache.get(message)
+    if data:
+        tags["source"] = "cache"
+        logging.info(f"Signal parsed via cache: {data} (hit rate {cache.hit_rate:.0%})")
+        return data
+    
     # Tenta Gemini primeiro (se configurado)
-    data = _gemini_parse(message)
+    with span("parse.gemini"):
+        data = _gemini_parse(message)
     if data:
+        tags["source"] = "gemini"
         logging.info(f"Signal parsed via Gemini: {data}")
+        cache.put(message, data)
         return data
     
     # Fallback para regex
-    data = _regex_parse(message)
+    with span("parse.regex"):
+        data = _regex_parse(message)
     if data:
+        tags["source"] = "regex"
         logging.info(f"Signal parsed via regex: {data}")
+        cache.put(message, data)
         return data
     
     logging.warning("No valid signal could be parsed.")
@@ -0,0 +1,141 @@
+# signal_pipeline.py
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 50
+DEFAULT_METRICS_INTERVAL = 300.0
+
+
+class PipelineStats:
+    """Contadores de throughput e backpressure do pipeline"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_depth = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def snapshot(self, depth: int) -> Dict[str, Any]:
+        done = self.completed + self.failed
+        return {
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "avg_wait_ms": round(self.wait_total / done * 1000, 1) if done else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 1),
+            "avg_run_ms": round(self.run_total / done * 1000, 1) if done else 0.0,
+            "max_run_ms": round(self.run_max * 1000, 1),
+        }
+
+
+class SignalPipeline:
+    """
+    Estágio de execução entre o event loop do Discord e o código bloqueante
+    (parse via Gemini, chamadas REST da Binance). O listener só enfileira;
+    os workers rodam o handler num ThreadPoolExecutor.
+    """
+
+    def __init__(self, handler: Callable[[Any], Any], workers: int = DEFAULT_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, metrics_interval: float = DEFAULT_METRICS_INTERVAL):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.metrics_interval = float(metrics_interval)
+        self.stats = PipelineStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self):
+        """Cria a fila e os workers no event loop atual (idempotente)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="signal-worker")
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+        if self.metrics_interval > 0:
+            self._tasks.append(asyncio.ensure_future(self._report_loop()))
+        logging.info(f"Signal pipeline started: workers={self.workers}, queue_size={self.queue_size}")
+
+    def submit(self, job: Any) -> bool:
+        """Enfileira sem bloquear; retorna False se a fila estiver cheia (backpressure)"""
+        if not self.running:
+            self.start()
+        try:
+            self._queue.put_nowait((time.perf_counter(), job))
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            logging.warning(f"Signal queue full ({self.queue_size}), job rejected")
+            return False
+        self.stats.submitted += 1
+        self.stats.max_depth = max(self.stats.max_depth, self._queue.qsize())
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.stats.snapshot(self.depth)
+
+    async def _worker(self, n: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            enqueued_at, job = await self._queue.get()
+            started = time.perf_counter()
+            wait = started - enqueued_at
+            self.stats.wait_total += wait
+            self.stats.wait_max = max(self.stats.wait_max, wait)
+            self.stats.in_flight += 1
+            try:
+                await loop.run_in_executor(self._executor, self.handler, job)
+                self.stats.completed += 1
+            except Exception as e:
+                self.stats.failed += 1
+                logging.error(f"Signal worker {n} error: {e}")
+            finally:
+                run = time.perf_counter() - started
+                self.stats.run_total += run
+                self.stats.run_max = max(self.stats.run_max, run)
+                self.stats.in_flight -= 1
+                self._queue.task_done()
+
+    async def _report_loop(self):
+        last = -1
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            if self.stats.submitted != last:
+                last = self.stats.submitted
+                logging.info(f"Signal pipeline metrics: {self.metrics()}")
+
+    async def stop(self, drain: bool = True):
+        if not self.running:
+            return
+        if drain:
+            await self._queue.join()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False)
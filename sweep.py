@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Varredura de parâmetros sobre o backtest: pesos dos TPs, seleção de targets,
+fração alocada por trade e teto de alavancagem, em grid ou busca aleatória.
+
+Os candles de cada símbolo vão uma única vez para memória compartilhada
+(multiprocessing.shared_memory); as tasks do pool levam só índices e níveis
+de preço. Cada worker calcula, por teto de alavancagem, a saída de cada
+parcela (first touch de TP x SL); pesos, seleção e alocação são combinados
+depois, vetorizados, sem refazer a varredura dos candles.
+
+Uso: python sweep.py sinais.jsonl --klines klines/ [--random 500] [--workers 8] [--out sweep.csv]
+"""
+
+import argparse
+import csv
+import itertools
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import backtest
+from settings import TARGET_KEYS, ConfigError, compile_selection_plans, read_tp_weights
+
+N_TARGETS = len(TARGET_KEYS)
+WEIGHT_PRESETS = ((0.25, 0.25, 0.25, 0.25), (0.40, 0.30, 0.20, 0.10), (0.50, 0.30, 0.20, 0.00), (0.10, 0.20, 0.30, 0.40))
+SELECTION_PRESETS = ("T1", "T1T2", "T1T2T3", "T1T2T3T4")
+ALLOCATION_PRESETS = (0.05, 0.10, 0.15, 0.20, 0.25)
+LEVERAGE_CAP_PRESETS = (0, 5, 10, 20)     # 0 = sem teto
+METRICS = ("total_return", "profit_factor", "win_rate", "avg_return", "max_drawdown")
+
+
+# ---------------- Memória compartilhada ----------------
+_SHARED: Dict[str, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def share_klines(klines: Dict[str, "backtest.Klines"]) -> Dict[str, Tuple[str, int]]:
+    """Copia open/high/low/close de cada símbolo para um bloco compartilhado; retorna {símbolo: (nome, n)}"""
+    layout = {}
+    for symbol, k in klines.items():
+        n = len(k)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, 4 * n * 8))
+        arr = np.ndarray((4, n), dtype=np.float64, buffer=shm.buf)
+        arr[0], arr[1], arr[2], arr[3] = k.open, k.high, k.low, k.close
+        _SHARED[symbol] = (shm, arr)
+        layout[symbol] = (shm.name, n)
+    return layout
+
+
+def release_shared():
+    for shm, _ in _SHARED.values():
+        shm.close()
+        shm.unlink()
+    _SHARED.clear()
+
+
+def _attach(layout: Dict[str, Tuple[str, int]]):
+    """Initializer dos workers: mapeia os blocos do processo pai (sem cópia)"""
+    for symbol, (name, n) in layout.items():
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray((4, n), dtype=np.float64, buffer=shm.buf)
+        _SHARED[symbol] = (shm, arr)
+
+
+def _shared_klines(symbol: str) -> "backtest.Klines":
+    # Views sobre o bloco compartilhado; o candle de entrada já vem calculado, então open_time não é usado
+    arr = _SHARED[symbol][1]
+    return backtest.Klines(symbol, None, arr[0], arr[1], arr[2], arr[3])
+
+
+# ---------------- Tasks ----------------
+# item: (posição do sinal, símbolo, candle de entrada, lado, alavancagem do sinal, targets (até 4), stop)
+Item = Tuple[int, str, int, str, float, Tuple[float, ...], float]
+
+
+def _touch_task(leverage_cap: float, items: Sequence[Item], max_bars: int, sl_first: bool):
+    """Retorno bruto de cada parcela (NaN onde o sinal não tem o target) e a alavancagem efetiva"""
+    pos = np.empty(len(items), dtype=np.int64)
+    gross = np.full((len(items), N_TARGETS), np.nan)
+    leverage = np.ones(len(items))
+    for row, (i, symbol, start, side, lev, targets, stop) in enumerate(items):
+        k = _shared_klines(symbol)
+        lev = min(lev, leverage_cap) if leverage_cap and lev > 1 else lev
+        entry = float(k.open[start])
+        eff_stop = backtest.effective_stop(entry, stop, side, lev)
+        _, exit_px, _ = backtest.first_touch(k, start, side, targets, eff_stop, max_bars, sl_first)
+        direction = 1.0 if side == "long" else -1.0
+        pos[row] = i
+        gross[row, :len(targets)] = direction * (exit_px / entry - 1.0)
+        leverage[row] = lev
+    return leverage_cap, pos, gross, leverage
+
+
+# ---------------- Combinação vetorizada ----------------
+def parse_selection(text: str) -> Dict[str, bool]:
+    chosen = {f"T{c}" for c in text.upper().replace("T", " ").split() if c.isdigit()}
+    return {key: key in chosen for key in TARGET_KEYS}
+
+
+def selection_name(selection: Dict[str, bool]) -> str:
+    return "".join(k for k in TARGET_KEYS if selection.get(k)) or "-"
+
+
+def plan_matrix(selection: Dict[str, bool], weights: Sequence[float]) -> np.ndarray:
+    """(N_TARGETS+1) x N_TARGETS: pesos normalizados por número de targets do sinal"""
+    m = np.zeros((N_TARGETS + 1, N_TARGETS))
+    for n, (idx, w) in enumerate(compile_selection_plans(selection, tuple(weights))):
+        m[n, list(idx)] = w
+    return m
+
+
+def score(rets: np.ndarray, mask: np.ndarray, allocation: float) -> Dict[str, np.ndarray]:
+    """Métricas do backtest.summarize para várias combinações de uma vez (linhas = combinações)"""
+    r = np.where(mask, rets, 0.0)
+    count = mask.sum(axis=1)
+    equity = np.cumprod(1.0 + allocation * r, axis=1)
+    peak = np.maximum.accumulate(np.concatenate((np.ones((len(r), 1)), equity), axis=1), axis=1)[:, 1:]
+    gains = np.where(r > 0, r, 0.0).sum(axis=1)
+    losses = -np.where(r < 0, r, 0.0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "trades": count,
+            "win_rate": np.where(count, (r > 0).sum(axis=1) / np.maximum(count, 1), 0.0),
+            "avg_return": np.where(count, r.sum(axis=1) / np.maximum(count, 1), 0.0),
+            "profit_factor": np.where(losses > 0, gains / losses, np.inf),
+            "total_return": equity[:, -1] - 1.0 if r.shape[1] else np.zeros(len(r)),
+            "max_drawdown": (1.0 - equity / peak).max(axis=1) if r.shape[1] else np.zeros(len(r)),
+        }
+
+
+def evaluate(gross: np.ndarray, leverage: np.ndarray, n_targets: np.ndarray, combos: List[tuple],
+             allocations: Sequence[float], fee: float, chunk: int = 256) -> List[dict]:
+    """Avalia (pesos, seleção) x alocações sobre a matriz de parcelas de um teto de alavancagem"""
+    g = np.nan_to_num(gross)
+    rows = []
+    for c0 in range(0, len(combos), chunk):
+        block = combos[c0:c0 + chunk]
+        W = np.stack([plan_matrix(sel, w)[n_targets] for w, sel in block])          # combos x sinais x 4
+        mask = W.sum(axis=2) > 0
+        rets = np.maximum(leverage * ((W * g).sum(axis=2) - 2.0 * fee), -1.0)
+        for allocation in allocations:
+            metrics = score(rets, mask, allocation)
+            for j, (w, sel) in enumerate(block):
+                rows.append(dict({k: float(v[j]) for k, v in metrics.items()},
+                                 weights=tuple(w), selection=selection_name(sel), allocation=allocation))
+    return rows
+
+
+# ---------------- Grid / busca aleatória ----------------
+def build_combos(weights: List[tuple], selections: List[dict]) -> List[tuple]:
+    return [(w, s) for w, s in itertools.product(weights, selections)]
+
+
+def random_combos(n: int, rng: np.random.Generator) -> List[tuple]:
+    combos = []
+    while len(combos) < n:
+        w = tuple(round(float(x), 4) for x in rng.dirichlet(np.ones(N_TARGETS)))
+        bits = rng.integers(0, 2, N_TARGETS)
+        if not bits.any():
+            bits[0] = 1
+        if w[int(np.argmax(bits))] <= 0:
+            continue    # primeiro target escolhido com peso 0 (arredondamento): plano sem peso
+        combos.append((w, {k: bool(b) for k, b in zip(TARGET_KEYS, bits)}))
+    return combos
+
+
+def prepare_items(signals, store: "backtest.KlineStore", default_leverage: int, trade_mode: str):
+    """Resolve mercado, alavancagem e candle de entrada de cada sinal (uma vez, no processo pai)"""
+    items: List[Item] = []
+    n_targets = []
+    for rec in signals:
+        p = rec.parsed
+        if not p:
+            continue
+        k = store.get(rec.symbol)
+        if k is None or not len(k):
+            continue
+        start = int(np.searchsorted(k.open_time, rec.time_ms, side="right"))
+        side = (p.get("side") or "long").lower()
+        market = backtest.resolve_market(p, trade_mode)
+        if start >= len(k) or (market == "spot" and side == "short"):
+            continue
+        lev = float(p.get("leverage") or default_leverage) if market == "futures" else 1.0
+        targets = tuple(float(t) for t in p["targets"][:N_TARGETS])
+        items.append((len(items), rec.symbol, start, side, lev, targets, float(p["stop_loss"])))
+        n_targets.append(min(len(p["targets"]), N_TARGETS))
+    return items, np.array(n_targets, dtype=np.int64)
+
+
+def run_sweep(items: List[Item], n_targets: np.ndarray, klines: Dict[str, "backtest.Klines"], combos: List[tuple],
+              allocations: Sequence[float], leverage_caps: Sequence[float], workers: int, fee: float,
+              max_bars: int, sl_first: bool) -> List[dict]:
+    layout = share_klines(klines)
+    try:
+        shards = max(1, workers * 4)
+        size = max(1, -(-len(items) // shards))
+        per_cap = {cap: (np.full((len(items), N_TARGETS), np.nan), np.ones(len(items))) for cap in leverage_caps}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(layout,)) as pool:
+            futures = [pool.submit(_touch_task, cap, items[s:s + size], max_bars, sl_first)
+                       for cap in leverage_caps for s in range(0, len(items), size)]
+            for fut in futures:
+                cap, pos, gross, leverage = fut.result()
+                per_cap[cap][0][pos] = gross
+                per_cap[cap][1][pos] = leverage
+    finally:
+        release_shared()
+    rows = []
+    for cap, (gross, leverage) in per_cap.items():
+        for row in evaluate(gross, leverage, n_targets, combos, allocations, fee):
+            row["leverage_cap"] = cap
+            rows.append(row)
+    return rows
+
+
+def _floats(text: str) -> tuple:
+    return tuple(float(x) for x in text.split(","))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over the signal backtest")
+    parser.add_argument("signals", help="JSON lines com time e message")
+    parser.add_argument("--klines", required=True, help="diretório com <SYMBOL>*.csv")
+    parser.add_argument("--weights", nargs="*", type=_floats, help="vetores de pesos, ex.: 0.3,0.3,0.2,0.2")
+    parser.add_argument("--selections", nargs="*", help="seleções de targets, ex.: T1T2 T1T2T3")
+    parser.add_argument("--allocations", nargs="*", type=float)
+    parser.add_argument("--leverage-caps", nargs="*", type=float, help="0 = sem teto")
+    parser.add_argument("--random", type=int, default=0, help="N combinações aleatórias de pesos/seleção")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--fee", type=float, default=backtest.DEFAULT_FEE)
+    parser.add_argument("--max-hold-bars", type=int, default=backtest.DEFAULT_MAX_HOLD_BARS)
+    parser.add_argument("--optimistic", action="store_true")
+    parser.add_argument("--metric", choices=METRICS, default="total_return")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", default="", help="CSV com todas as combinações")
+    args = parser.parse_args()
+
+    import signal_parser
+    from parse_cache import ParseCache
+    from settings import get_settings
+    logging.disable(logging.INFO)
+    cfg = get_settings()
+    signal_parser._parse_cache = ParseCache(max_entries=100000, path=None)
+    signal_parser._gemini_parse = lambda message: None
+
+    weights = list(args.weights or [cfg.tp_weights, *WEIGHT_PRESETS])
+    selections = [parse_selection(s) for s in (args.selections or SELECTION_PRESETS)]
+    if not args.selections and dict(cfg.target_selection) not in selections:
+        selections.insert(0, dict(cfg.target_selection))
+    allocations = args.allocations or sorted({cfg.allocation, *ALLOCATION_PRESETS})
+    caps = args.leverage_caps if args.leverage_caps is not None else LEVERAGE_CAP_PRESETS
+    combos = random_combos(args.random, np.random.default_rng(args.seed)) if args.random else build_combos(weights, selections)
+    for w, sel in combos:
+        try:
+            read_tp_weights({"tp_weights": w})
+            plan_matrix(sel, w)
+        except ConfigError as e:
+            parser.error(f"--weights {','.join(map(str, w))} with {selection_name(sel)}: {e}")
+
+    t0 = time.perf_counter()
+    signals = backtest.load_signals(args.signals, signal_parser.parse_signal)
+    store = backtest.KlineStore(args.klines)
+    items, n_targets = prepare_items(signals, store, cfg.futures_default_leverage, cfg.trade_mode)
+    klines = {sym: store.get(sym) for sym in {it[1] for it in items}}
+    t_load = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    rows = run_sweep(items, n_targets, klines, combos, allocations, caps, max(1, args.workers), args.fee,
+                     args.max_hold_bars, not args.optimistic)
+    t_sweep = time.perf_counter() - t0
+
+    reverse = args.metric != "max_drawdown"
+    rows.sort(key=lambda r: r[args.metric], reverse=reverse)
+
+    print("=" * 96)
+    print("  Parameter Sweep")
+    print("=" * 96)
+    print(f"Trades: {len(items)} | combinations: {len(rows)} ({len(combos)} weight/selection x "
+          f"{len(allocations)} allocations x {len(caps)} leverage caps) | workers: {args.workers}")
+    print(f"Load+parse: {t_load:.2f}s | sweep: {t_sweep:.2f}s")
+    print()
+    print(f"   {'weights':<26}{'targets':<11}{'alloc':>6}{'levcap':>7}{'trades':>7}{'win':>7}"
+          f"{'pf':>7}{'total':>10}{'maxdd':>8}")
+    for r in rows[:args.top]:
+        w = ",".join(f"{x:.2f}" for x in r["weights"])
+        print(f"   {w:<26}{r['selection']:<11}{r['allocation']:>6.2f}{r['leverage_cap'] or '-':>7}{int(r['trades']):>7}"
+              f"{r['win_rate']:>7.2f}{r['profit_factor']:>7.2f}{r['total_return']:>10.2%}{r['max_drawdown']:>8.2%}")
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["weights", "selection", "allocation", "leverage_cap", "trades", *METRICS])
+            for r in rows:
+                w.writerow([" ".join(map(str, r["weights"])), r["selection"], r["allocation"], r["leverage_cap"],
+                            int(r["trades"]), *(round(r[m], 6) for m in METRICS)])
+        print(f"\n✓ {len(rows)} combinations written to {args.out}")
+    print("=" * 96)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
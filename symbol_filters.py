@@ -0,0 +1,112 @@
+# symbol_filters.py
+
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Dict, List, Optional, Sequence
+
+_ZERO = Decimal("0")
+
+
+def _dec(value) -> Decimal:
+    try:
+        return Decimal(str(value)) if value not in (None, "") else _ZERO
+    except ArithmeticError:
+        return _ZERO
+
+
+def fmt(value) -> str:
+    """Número (float ou Decimal) como string sem notação científica (formato aceito pela Binance)"""
+    text = format(_dec(value), "f")
+    return text.rstrip("0").rstrip(".") if "." in text else text
+
+
+class SymbolFilters:
+    """
+    Filtros de um símbolo (LOT_SIZE, MARKET_LOT_SIZE, PRICE_FILTER, MIN_NOTIONAL/NOTIONAL)
+    pré-calculados a partir do exchange info, para arredondar antes de enviar a ordem.
+    """
+
+    __slots__ = ("symbol", "step_size", "min_qty", "max_qty", "market_step_size", "market_min_qty",
+                 "market_max_qty", "tick_size", "min_price", "max_price", "min_notional")
+
+    def __init__(self, symbol: str, filters: Sequence[dict]):
+        self.symbol = symbol
+        self.step_size = self.min_qty = self.max_qty = _ZERO
+        self.market_step_size = self.market_min_qty = self.market_max_qty = _ZERO
+        self.tick_size = self.min_price = self.max_price = self.min_notional = _ZERO
+        for f in filters or ():
+            kind = f.get("filterType")
+            if kind == "LOT_SIZE":
+                self.step_size, self.min_qty, self.max_qty = _dec(f.get("stepSize")), _dec(f.get("minQty")), _dec(f.get("maxQty"))
+            elif kind == "MARKET_LOT_SIZE":
+                self.market_step_size = _dec(f.get("stepSize"))
+                self.market_min_qty, self.market_max_qty = _dec(f.get("minQty")), _dec(f.get("maxQty"))
+            elif kind == "PRICE_FILTER":
+                self.tick_size, self.min_price, self.max_price = _dec(f.get("tickSize")), _dec(f.get("minPrice")), _dec(f.get("maxPrice"))
+            elif kind in ("MIN_NOTIONAL", "NOTIONAL"):
+                # Spot usa minNotional; Futures usa notional
+                self.min_notional = max(self.min_notional, _dec(f.get("minNotional", f.get("notional"))))
+
+    # ---------------- Arredondamento ----------------
+    def round_qty(self, qty, market: bool = False) -> Decimal:
+        """Arredonda para baixo no stepSize (MARKET_LOT_SIZE em ordens a mercado) e limita ao maxQty"""
+        step = self.market_step_size if market and self.market_step_size > 0 else self.step_size
+        max_qty = self.market_max_qty if market and self.market_max_qty > 0 else self.max_qty
+        q = _dec(qty)
+        if step > 0:
+            q = (q / step).to_integral_value(rounding=ROUND_DOWN) * step
+        if max_qty > 0:
+            q = min(q, max_qty)
+        return max(q, _ZERO)
+
+    def round_price(self, price) -> Decimal:
+        """Arredonda para o tick mais próximo"""
+        p = _dec(price)
+        if self.tick_size > 0:
+            p = (p / self.tick_size).to_integral_value(rounding=ROUND_HALF_UP) * self.tick_size
+        return p
+
+    def violation(self, qty, price, market: bool = False) -> Optional[str]:
+        """Motivo pelo qual a Binance rejeitaria a ordem (ou None), sem arredondar"""
+        q, p = _dec(qty), _dec(price)
+        step = self.market_step_size if market and self.market_step_size > 0 else self.step_size
+        min_qty = self.market_min_qty if market and self.market_min_qty > 0 else self.min_qty
+        if q <= 0 or q < min_qty or (step > 0 and q % step != 0):
+            return "LOT_SIZE"
+        if p > 0 and self.tick_size > 0 and p % self.tick_size != 0:
+            return "PRICE_FILTER"
+        if p > 0 and q * p < self.min_notional:
+            return "NOTIONAL"
+        return None
+
+    def split(self, total_qty, weights: Sequence[float], prices: Sequence[float]) -> List[Decimal]:
+        """
+        Divide a quantidade entre os TPs no stepSize. A última parcela fica com o resto;
+        parcelas abaixo de minQty/minNotional são somadas à parcela não zerada mais próxima
+        (a anterior no empate), repetindo até nenhuma violar, para que nada seja rejeitado e o
+        total continue sendo vendido. Se nem o total passa, sobra uma parcela só.
+        """
+        total = self.round_qty(total_qty)
+        slices, acc = [], _ZERO
+        for i, w in enumerate(weights):
+            q = self.round_qty(total * _dec(w) if i < len(weights) - 1 else total - acc)
+            slices.append(q)
+            acc += q
+        while True:
+            live = [i for i, q in enumerate(slices) if q > 0]
+            bad = [i for i in live if self.violation(slices[i], self.round_price(prices[i])) in ("LOT_SIZE", "NOTIONAL")]
+            if not bad or len(live) < 2:
+                return slices
+            i = bad[0]
+            j = min((k for k in live if k != i), key=lambda k: (abs(k - i), k > i))
+            slices[j] += slices[i]
+            slices[i] = _ZERO
+
+
+def build_filter_table(info: dict) -> Dict[str, SymbolFilters]:
+    """Tabela símbolo -> SymbolFilters a partir da resposta do exchange info"""
+    table = {}
+    for s in (info or {}).get("symbols", []):
+        symbol = str(s.get("symbol", "")).upper()
+        if symbol:
+            table[symbol] = SymbolFilters(symbol, s.get("filters", []))
+    return table
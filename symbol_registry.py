@@ -0,0 +1,144 @@
+# symbol_registry.py
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from symbol_filters import SymbolFilters, build_filter_table
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_TTL = 900.0
+RETRY_DELAY = 30.0
+MISS_RELOAD_INTERVAL = 30.0     # símbolo desconhecido: no máximo um reload forçado nesse intervalo
+
+
+class SymbolRegistry:
+    """Índice em memória do exchange info (símbolo -> metadados) com refresh em background"""
+
+    def __init__(self, name: str, fetch: Callable[[], dict], ttl: float = DEFAULT_TTL,
+                 miss_reload: float = MISS_RELOAD_INTERVAL):
+        self.name = name
+        self.ttl = max(1.0, float(ttl))
+        self.miss_reload = float(miss_reload)
+        self.miss_reloads = 0
+        self._fetch = fetch
+        self._index: Dict[str, dict] = {}
+        self._filters: Dict[str, SymbolFilters] = {}
+        self._loaded_at = 0.0
+        self._miss_reload_at = 0.0
+        self._load_lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------------- Loading ----------------
+    def load(self) -> int:
+        """Baixa o exchange info e troca o índice de uma vez (leituras nunca veem um índice parcial)"""
+        info = self._fetch() or {}
+        index = {str(s.get("symbol", "")).upper(): s for s in info.get("symbols", [])}
+        index.pop("", None)
+        filters = build_filter_table(info)
+        self._index, self._filters = index, filters
+        self._loaded_at = time.monotonic()
+        logging.info(f"[{self.name}] exchange info loaded: {len(index)} symbols")
+        return len(index)
+
+    def _ensure_loaded(self):
+        if self._loaded_at:
+            return
+        with self._load_lock:
+            if not self._loaded_at:
+                self.load()
+                self.start()
+
+    def _reload_on_miss(self, symbol: str) -> bool:
+        """
+        Símbolo fora do índice: pode ter sido listado depois do último load. Recarrega uma vez
+        (no máximo a cada miss_reload segundos) antes de responder; True se recarregou.
+        """
+        with self._load_lock:
+            now = time.monotonic()
+            if symbol in self._index or now - max(self._loaded_at, self._miss_reload_at) < self.miss_reload:
+                return False
+            self._miss_reload_at = now
+            try:
+                self.load()
+            except Exception as e:
+                logging.warning(f"[{self.name}] exchange info reload for {symbol} failed: {e}")
+                return False
+            self.miss_reloads += 1
+            return True
+
+    def _lookup(self, table: str, symbol: str):
+        self._ensure_loaded()
+        symbol = symbol.upper()
+        value = getattr(self, table).get(symbol)
+        if value is None and self._reload_on_miss(symbol):
+            value = getattr(self, table).get(symbol)
+        return value
+
+    def start(self):
+        """Inicia a thread de refresh periódico (idempotente)"""
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name=f"{self.name}-symbols", daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        delay = self.ttl
+        while not self._stop.wait(delay):
+            try:
+                self.load()
+                delay = self.ttl
+            except Exception as e:
+                # Mantém o índice antigo e tenta de novo mais cedo
+                logging.warning(f"[{self.name}] exchange info refresh failed: {e}")
+                delay = min(self.ttl, RETRY_DELAY)
+
+    # ---------------- Lookups ----------------
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self._loaded_at if self._loaded_at else float("inf")
+
+    def exists(self, symbol: str) -> bool:
+        return self._lookup("_index", symbol) is not None
+
+    def get(self, symbol: str) -> Optional[dict]:
+        return self._lookup("_index", symbol)
+
+    def filters(self, symbol: str) -> Optional[SymbolFilters]:
+        """Filtros de quantidade/preço pré-calculados no último load"""
+        return self._lookup("_filters", symbol)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+_REGISTRIES: Dict[str, SymbolRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_registry(market: str, fetch: Callable[[], dict], ttl: float = DEFAULT_TTL) -> SymbolRegistry:
+    """Retorna o registry do processo para o mercado ("spot"/"futures"), criando-o na primeira chamada"""
+    reg = _REGISTRIES.get(market)
+    if reg is not None:
+        return reg
+    with _REGISTRIES_LOCK:
+        reg = _REGISTRIES.get(market)
+        if reg is None:
+            reg = SymbolRegistry(market, fetch, ttl)
+            _REGISTRIES[market] = reg
+        return reg
+
+
+def reset_registries():
+    """Descarta todos os registries (usado ao trocar de credenciais/endpoint)"""
+    with _REGISTRIES_LOCK:
+        for reg in _REGISTRIES.values():
+            reg.stop()
+        _REGISTRIES.clear()
@@ -1,12 +1,27 @@
 # telegram_alert.py
 
-import requests
+import atexit
 import logging
+import queue
+import threading
+import time
+
+import requests
+
+from tracing import span
+
+DEFAULT_TIMEOUT = 15
+DEFAULT_CHAT_INTERVAL = 1.0      # Telegram: ~1 msg/s por chat
+DEFAULT_GROUP_INTERVAL = 3.0     # Telegram: ~20 msg/min por grupo
+DEFAULT_COALESCE_WINDOW = 60.0
+FLUSH_TIMEOUT = 5.0
 
-def _post(url, data):
+_SESSION = requests.Session()
+
+def _post(url, data, timeout=DEFAULT_TIMEOUT):
     """Helper para fazer POST requests com tratamento de erros"""
     try:
-        return requests.post(url, data=data, timeout=15)
+        return _SESSION.post(url, data=data, timeout=timeout)
     except requests.exceptions.Timeout:
         logging.error("Telegram request timeout")
         return None
@@ -17,16 +32,152 @@ def _post(url, data):
         logging.error(f"Telegram HTTP error: {e}")
         return None
 
-def send_telegram_message(message: str, config: dict) -> bool:
+def _deliver(token: str, chat_id: str, message: str) -> bool:
+    """Envio síncrono de uma mensagem (usado pela thread do notifier)"""
+    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    data = {
+        "chat_id": chat_id,
+        "text": message,
+        "parse_mode": "HTML",
+    }
+    
+    for attempt in range(2):
+        resp = _post(url, data)
+        
+        if not resp:
+            logging.error("Failed to send Telegram message: no response")
+            return False
+        
+        if resp.status_code == 429 and attempt == 0:
+            # Flood control: respeita o retry_after devolvido pela API e tenta mais uma vez
+            try:
+                retry_after = float(resp.json().get("parameters", {}).get("retry_after", 1))
+            except Exception:
+                retry_after = 1.0
+            time.sleep(min(retry_after, 30.0))
+            continue
+        
+        if resp.status_code != 200:
+            try:
+                error_msg = resp.json().get("description", resp.text)
+                logging.error(f"Failed to send Telegram message: {error_msg}")
+            except Exception:
+                logging.error(f"Failed to send Telegram message: HTTP {resp.status_code}")
+            return False
+        
+        logging.debug("Message sent to Telegram successfully")
+        return True
+    return False
+
+class TelegramNotifier:
+    """
+    Envia mensagens do Telegram numa thread de background, com sessão HTTP
+    persistente, limite de taxa por chat e agrupamento de erros repetidos.
+    """
+    
+    def __init__(self, coalesce_window: float = DEFAULT_COALESCE_WINDOW):
+        self.coalesce_window = coalesce_window
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self._queue = queue.Queue()
+        self._next_slot = {}       # chat_id -> próximo instante permitido
+        self._recent = {}          # (token, chat_id, texto) -> [primeiro envio, repetições suprimidas]
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+                self._thread.start()
+    
+    def enqueue(self, token: str, chat_id: str, message: str, coalesce: bool = False):
+        if coalesce:
+            key = (token, chat_id, message)
+            now = time.monotonic()
+            with self._lock:
+                entry = self._recent.get(key)
+                if entry and now - entry[0] < self.coalesce_window:
+                    entry[1] += 1
+                    self.coalesced += 1
+                    return
+                self._recent[key] = [now, 0]
+        self._ensure_started()
+        self._queue.put((token, chat_id, message))
+    
+    def _wait_for_slot(self, chat_id: str):
+        interval = DEFAULT_GROUP_INTERVAL if str(chat_id).startswith("-") else DEFAULT_CHAT_INTERVAL
+        now = time.monotonic()
+        slot = self._next_slot.get(chat_id, now)
+        if slot > now:
+            time.sleep(slot - now)
+        self._next_slot[chat_id] = max(slot, now) + interval
+    
+    def _flush_summaries(self):
+        """Emite um resumo para cada erro repetido cuja janela terminou"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [(k, v) for k, v in self._recent.items() if now - v[0] >= self.coalesce_window]
+            for k, _ in expired:
+                del self._recent[k]
+        for (token, chat_id, message), (_, repeats) in expired:
+            if repeats:
+                summary = f"{message}\n\n🔁 Repeated {repeats} more time(s) in the last {int(self.coalesce_window)}s"
+                self._queue.put((token, chat_id, summary))
+    
+    def _run(self):
+        while True:
+            try:
+                token, chat_id, message = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                self._flush_summaries()
+                continue
+            try:
+                self._wait_for_slot(chat_id)
+                if _deliver(token, chat_id, message):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Telegram notifier error: {e}")
+            finally:
+                self._queue.task_done()
+            self._flush_summaries()
+    
+    def flush(self, timeout: float = FLUSH_TIMEOUT) -> bool:
+        """Espera a fila esvaziar (até timeout segundos)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline or not (self._thread and self._thread.is_alive()):
+                return False
+            time.sleep(0.05)
+        return True
+
+_NOTIFIER = TelegramNotifier()
+atexit.register(_NOTIFIER.flush)
+
+def get_notifier() -> TelegramNotifier:
+    return _NOTIFIER
+
+def send_telegram_message(message: str, config: dict, coalesce: bool = False, wait: bool = False) -> bool:
     """
     Envia uma mensagem para o Telegram.
     
+    A mensagem é enfileirada e enviada pela thread do notifier, sem bloquear
+    quem chamou (ex.: o caminho de execução de ordens).
+    
     Args:
         message: Texto da mensagem
         config: Dicionário de configuração com telegram_token e telegram_chat_id
+        coalesce: Agrupa repetições idênticas dentro da janela num único resumo
+        wait: Envia de forma síncrona e retorna o resultado real do envio
     
     Returns:
-        True se enviou com sucesso, False caso contrário
+        True se enviou (ou enfileirou) com sucesso, False caso contrário
     """
     telegram_token = config.get("telegram_token", "").strip()
     telegram_chat_id = config.get("telegram_chat_id", "").strip()
@@ -35,33 +186,18 @@ def send_telegram_message(message: str, config: dict) -> bool:
         logging.debug("Telegram not configured. Message not sent.")
         return False
     
-    url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
-    data = {
-        "chat_id": telegram_chat_id,
-        "text": message,
-        "parse_mode": "HTML",
-    }
-    
-    resp = _post(url, data)
-    
-    if not resp:
-        logging.error("Failed to send Telegram message: no response")
-        return False
-    
-    if resp.status_code != 200:
-        try:
-            error_msg = resp.json().get("description", resp.text)
-            logging.error(f"Failed to send Telegram message: {error_msg}")
-        except Exception:
-            logging.error(f"Failed to send Telegram message: HTTP {resp.status_code}")
-        return False
+    if wait:
+        return _deliver(telegram_token, telegram_chat_id, message)
     
-    logging.debug("Message sent to Telegram successfully")
+    with span("telegram_notify", coalesce=coalesce):
+        _NOTIFIER.coalesce_window = float(config.get("telegram_coalesce_sec", DEFAULT_COALESCE_WINDOW))
+        _NOTIFIER.enqueue(telegram_token, telegram_chat_id, message, coalesce=coalesce)
     return True
 
 def send_telegram_error(message: str, config: dict) -> bool:
     """
     Envia uma mensagem de erro para o Telegram com formatação específica.
+    Erros idênticos repetidos são agrupados num único resumo.
     
     Args:
         message: Texto do erro
@@ -71,7 +207,7 @@ def send_telegram_error(message: str, config: dict) -> bool:
         True se enviou com sucesso, False caso contrário
     """
     formatted_message = f"🚨 <b>[ERROR]</b>\n{message}"
-    return send_telegram_message(formatted_message, config)
+    return send_telegram_message(formatted_message, config, coalesce=True)
 
 def send_telegram_success(message: str, config: dict) -> bool:
     """
@@ -90,6 +226,7 @@ def send_telegram_success(message: str, config: dict) -> bool:
 def send_telegram_warning(message: str, config: dict) -> bool:
     """
     Envia uma mensagem de aviso para o Telegram com formatação específica.
+    Avisos idênticos repetidos são agrupados num único resumo.
     
     Args:
         message: Texto do aviso
@@ -99,4 +236,4 @@ def send_telegram_warning(message: str, config: dict) -> bool:
         True se enviou com sucesso, False caso contrário
     """
     formatted_message = f"⚠️ <b>[WARNING]</b>\n{message}"
-    return send_telegram_message(formatted_message, config)
\ No newline at end of file
+    return send_telegram_message(formatted_message, config, coalesce=True)
\ No newline at end of file
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# tracing.py
+"""
+Tracing leve por sinal: spans (receive, parse, symbol check, ordens, notify...)
+marcados com o id do sinal, gravados como JSON lines e resumidos em p50/p95/p99.
+
+Uso para resumir: python tracing.py [traces.jsonl]
+"""
+
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+DEFAULT_TRACE_FILE = "traces.jsonl"
+
+_current = contextvars.ContextVar("signal_trace", default=None)
+_write_lock = threading.Lock()
+_trace_file: Optional[str] = DEFAULT_TRACE_FILE
+
+
+class Trace:
+    """Spans de um sinal; offsets e durações em ms relativos ao recebimento"""
+
+    def __init__(self, signal_id: str, t0: float):
+        self.signal_id = signal_id
+        self.t0 = t0
+        self.started_at = time.time() - (time.perf_counter() - t0)
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float, **tags):
+        span = {"name": name, "start_ms": round((start - self.t0) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3)}
+        if tags:
+            span["tags"] = tags
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        return {"signal_id": self.signal_id, "started_at": round(self.started_at, 3),
+                "total_ms": round((time.perf_counter() - self.t0) * 1000, 3), "spans": self.spans}
+
+
+def configure(trace_file: Optional[str]):
+    """Define o arquivo JSON lines de saída (vazio/None desativa a gravação)"""
+    global _trace_file
+    _trace_file = trace_file or None
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def start_trace(signal_id: Optional[str] = None, received_at: Optional[float] = None):
+    """Abre o trace de um sinal na thread atual; grava a linha JSON ao sair"""
+    trace = Trace(signal_id or uuid.uuid4().hex[:12], received_at or time.perf_counter())
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        _write(trace)
+
+
+@contextmanager
+def span(name: str, **tags):
+    """Mede um trecho do trace ativo (no-op sem trace ativo)"""
+    trace = _current.get()
+    if trace is None:
+        yield tags
+        return
+    start = time.perf_counter()
+    try:
+        yield tags
+    finally:
+        trace.add(name, start, time.perf_counter(), **tags)
+
+
+def record(name: str, start: float, end: Optional[float] = None, **tags):
+    """Registra um span já medido (ex.: espera na fila, medida em outra thread)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start, end if end is not None else time.perf_counter(), **tags)
+
+
+def _write(trace: Trace):
+    path = _trace_file
+    if not path:
+        return
+    line = json.dumps(trace.to_dict(), ensure_ascii=False)
+    try:
+        with _write_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        logging.debug(f"Could not write trace: {e}")
+
+
+# ---------------- Summary ----------------
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(path: str = DEFAULT_TRACE_FILE) -> Dict[str, dict]:
+    """{estágio: {count, p50, p95, p99, max}} em ms, a partir do arquivo de traces"""
+    stages: Dict[str, List[float]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                trace = json.loads(line)
+            except ValueError:
+                continue
+            stages.setdefault("total", []).append(trace.get("total_ms", 0.0))
+            for s in trace.get("spans", []):
+                stages.setdefault(s["name"], []).append(s["duration_ms"])
+    summary = {}
+    for name, values in stages.items():
+        values.sort()
+        summary[name] = {"count": len(values), "p50": _percentile(values, 50), "p95": _percentile(values, 95),
+                         "p99": _percentile(values, 99), "max": values[-1]}
+    return summary
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TRACE_FILE
+    try:
+        summary = summarize(path)
+    except FileNotFoundError:
+        print(f"✗ {path} not found")
+        return 1
+    print("=" * 72)
+    print(f"  Signal latency by stage ({path})")
+    print("=" * 72)
+    print(f"   {'stage':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in sorted(summary.items(), key=lambda kv: (kv[0] == "total", kv[0])):
+        print(f"   {name:<24}{s['count']:>7}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}{s['max']:>10.1f}")
+    print("=" * 72)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
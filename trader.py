@@ -1,36 +1,108 @@
 # trader.py
 
-import logging, json, os
+import logging, time, threading, contextvars, uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple
-from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from telegram_alert import send_telegram_message, send_telegram_error
+from symbol_registry import get_registry, DEFAULT_TTL as SYMBOLS_TTL
+from client_pool import get_client_pool, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+from settings import get_settings, read_target_selection, TP_WEIGHTS, DEFAULT_ALLOCATION
+from tracing import span
+from sim_exchange import sim_enabled, get_simulated_exchange
+from symbol_filters import fmt
+from market_data import get_market_data
+from balance_ledger import get_ledger
+from leverage_cache import get_leverage_cache
+from journal import log_event, record_order
+from position_manager import get_position_manager
+from rate_limiter import rate_limited, DEFAULT_SAFETY as RATE_LIMIT_SAFETY, DEFAULT_MAX_WAIT as RATE_LIMIT_MAX_WAIT
 
 logging.basicConfig(level=logging.INFO)
-CONFIG_FILE = "config.json"
 
 # ---------------- Config ----------------
 def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        raise FileNotFoundError("config.json not found. Create it first.")
-    with open(CONFIG_FILE, encoding="utf-8") as f:
-        return json.load(f)
+    # Snapshot compilado e recarregado pelo watcher (settings.py), sem I/O por sinal
+    return get_settings()
+
+_limited_clients = {}
+# Conta da execução corrente (definida no fan-out); as threads filhas herdam via contextvars.copy_context
+_current_account = contextvars.ContextVar("account", default=None)
+
+# Notas do Telegram de cada conta no fan-out: acumuladas aqui e enviadas no resumo único do sinal
+_account_notes = contextvars.ContextVar("account_notes", default=None)
+
+def _notify(message: str, cfg):
+    notes = _account_notes.get()
+    if notes is None:
+        return send_telegram_message(message, cfg)
+    notes.append(message)
+    return True
+
+def _notify_error(message: str, cfg):
+    notes = _account_notes.get()
+    if notes is None:
+        return send_telegram_error(message, cfg)
+    notes.append(f"🚨 {message}")
+    return True
+
+def _with_rate_limit(client, cfg):
+    # Um proxy por client; os limitadores (peso/ordens por mercado) são compartilhados pelo processo
+    limited = _limited_clients.get(id(client))
+    if limited is None or limited.client is not client:
+        limited = rate_limited(client, safety=cfg.get("rate_limit_safety", RATE_LIMIT_SAFETY),
+                               max_wait=cfg.get("rate_limit_max_wait_sec", RATE_LIMIT_MAX_WAIT))
+        # Cada ordem (requisição, resposta e latência) vai para o journal, marcada com a conta da chamada.
+        # A exchange simulada é uma só para todas as contas: lá só vale a conta do contexto
+        bound = None if getattr(client, "simulated", False) else _account_name(cfg)
+        limited.on_order = lambda *args: record_order(*args, account=_current_account.get() or bound)
+        _limited_clients[id(client)] = limited
+    return limited
+
+def _account_name(cfg):
+    account = getattr(cfg, "account", None)
+    return account.name if account is not None else None
 
 def get_binance_client(cfg, test_mode: bool = False):
     if test_mode:
-        return None
-    return Client(cfg["binance_api_key"], cfg["binance_api_secret"])
+        # Com sim_exchange.enabled o test_mode roda o caminho real de ordens contra a exchange simulada
+        return _with_rate_limit(get_simulated_exchange(cfg), cfg) if sim_enabled(cfg) else None
+    return _with_rate_limit(get_client_pool().get(
+        cfg["binance_api_key"], cfg["binance_api_secret"],
+        pool_size=cfg.get("binance_pool_size", DEFAULT_POOL_SIZE),
+        timeout=cfg.get("binance_timeout_sec", DEFAULT_TIMEOUT),
+    ), cfg)
+
+# ------------- Symbol registries -------------
+def _symbols_ttl(cfg) -> float:
+    return float((cfg or {}).get("exchange_info_ttl_sec", SYMBOLS_TTL))
+
+def _registry_name(client, market: str) -> str:
+    return f"sim-{market}" if getattr(client, "simulated", False) else market
+
+def spot_registry(client, cfg=None):
+    return get_registry(_registry_name(client, "spot"), client.get_exchange_info, _symbols_ttl(cfg))
+
+def futures_registry(client, cfg=None):
+    return get_registry(_registry_name(client, "futures"), client.futures_exchange_info, _symbols_ttl(cfg))
 
 # --------------- Spot helpers ---------------
-def symbol_exists_spot(symbol: str, client) -> bool:
+def symbol_exists_spot(symbol: str, client, cfg=None) -> bool:
     try:
-        info = client.get_exchange_info()
-        return symbol.upper() in [s["symbol"] for s in info["symbols"]]
+        return spot_registry(client, cfg).exists(symbol)
     except Exception as e:
         logging.error(f"Failed to check spot symbol: {e}")
         return False
 
+def _ledger_free(market: str, client, asset: str = "USDT"):
+    # Saldo do user data stream (balance_ledger.py); None = desligado ou fora de sincronia -> REST
+    ledger = get_ledger(client, market)
+    return ledger.free(asset) if ledger is not None else None
+
 def get_usdt_free_spot(client) -> float:
+    free = _ledger_free("spot", client)
+    if free is not None:
+        return free
     acct = client.get_account()
     for b in acct["balances"]:
         if b["asset"].upper() == "USDT":
@@ -38,39 +110,121 @@ def get_usdt_free_spot(client) -> float:
     return 0.0
 
 # ------------- Futures helpers -------------
-def symbol_exists_futures(symbol: str, client) -> bool:
+def symbol_exists_futures(symbol: str, client, cfg=None) -> bool:
     try:
-        info = client.futures_exchange_info()
-        return symbol.upper() in [s["symbol"] for s in info["symbols"]]
+        return futures_registry(client, cfg).exists(symbol)
     except Exception as e:
         logging.error(f"Failed to check futures symbol: {e}")
         return False
 
 def get_usdt_free_futures(client) -> float:
+    free = _ledger_free("futures", client)
+    if free is not None:
+        return free
     bal = client.futures_account_balance()
     for b in bal:
         if b.get("asset", "").upper() == "USDT":
             return float(b.get("balance", 0.0))
     return 0.0
 
-def futures_change_leverage(client, symbol: str, leverage: int):
-    return client.futures_change_leverage(symbol=symbol, leverage=max(1, int(leverage)))
+def futures_change_leverage(client, symbol: str, leverage: int, cfg=None):
+    # Com o cache (leverage_cache.py) a chamada assinada só acontece quando a alavancagem/margin type muda
+    lc = (cfg or {}).get("leverage_cache") or {}
+    if not lc.get("enabled", True):
+        return client.futures_change_leverage(symbol=symbol, leverage=max(1, int(leverage)))
+    return get_leverage_cache(client, lc.get("ttl_sec")).ensure(symbol, leverage, lc.get("margin_type"))
+
+def _price(filters, value) -> str:
+    return fmt(filters.round_price(value) if filters is not None else value)
+
+def _streamed_price(market: str, client, symbol: str):
+    # Preço local do websocket (market_data.py); None = desligado, sem dado ou velho -> REST
+    feed = get_market_data(market)
+    if feed is None or getattr(client, "simulated", False):
+        return None
+    return feed.price(symbol)
+
+def spot_last_price(client, symbol: str) -> float:
+    price = _streamed_price("spot", client, symbol)
+    if price is not None:
+        return price
+    return float(client.get_symbol_ticker(symbol=symbol)["price"])
 
 def futures_last_price(client, symbol: str) -> float:
+    price = _streamed_price("futures", client, symbol)
+    if price is not None:
+        return price
     t = client.futures_symbol_ticker(symbol=symbol)
     return float(t["price"])
 
+FUTURES_BATCH_LIMIT = 5  # máximo de ordens por chamada em /fapi/v1/batchOrders
+
+def _batch_order_params(order: dict) -> dict:
+    # O endpoint de batch espera todos os valores como string ("true"/"false" para booleanos)
+    return {k: (str(v).lower() if isinstance(v, bool) else str(v)) for k, v in order.items()}
+
+def _recover_batch(client, orders: List[dict], results: List[dict], indices: List[int]):
+    # Timeout/conexão caída: a Binance pode ter aceito o batch. O que está nas ordens abertas
+    # (pelo newClientOrderId) não é reenviado; se nem a consulta responde, não reenvia nada.
+    try:
+        open_orders = client.futures_get_open_orders(symbol=orders[indices[0]]["symbol"])
+    except Exception as e:
+        for i in indices:
+            results[i] = {"error": f"batch outcome unknown, not re-sent: {e}"}
+        return
+    by_id = {o.get("clientOrderId"): o for o in open_orders or ()}
+    for i in indices:
+        found = by_id.get(orders[i]["newClientOrderId"])
+        if found is not None:
+            results[i] = found
+
+def futures_place_orders(client, orders: List[dict], use_batch: bool = True) -> List[dict]:
+    """Envia as ordens em batch (chunks de 5); o que não saiu no batch vai em requests individuais concorrentes.
+    Retorna uma lista alinhada com `orders`: a resposta da ordem ou {"error": "..."}."""
+    # Id próprio em cada ordem para reconhecer, depois de um timeout, o que a Binance já criou
+    orders = [dict(o, newClientOrderId=o.get("newClientOrderId") or f"sb{uuid.uuid4().hex[:30]}") for o in orders]
+    results = [None] * len(orders)
+    if use_batch:
+        start = 0
+        try:
+            for start in range(0, len(orders), FUTURES_BATCH_LIMIT):
+                chunk = orders[start:start + FUTURES_BATCH_LIMIT]
+                with span("protective_order", market="futures", batch=len(chunk)):
+                    resp = client.futures_place_batch_order(batchOrders=[_batch_order_params(o) for o in chunk])
+                for j, r in enumerate(resp):
+                    if isinstance(r, dict) and "orderId" in r:
+                        results[start + j] = r
+                    else:
+                        r = r if isinstance(r, dict) else {}
+                        results[start + j] = {"error": f"APIError(code={r.get('code')}): {r.get('msg')}"}
+            return results
+        except BinanceAPIException as e:
+            # Batch recusado pela Binance: nada do chunk foi criado, vai tudo em ordens individuais
+            logging.warning(f"Futures batch order rejected, falling back to single orders: {e}")
+        except Exception as e:
+            logging.warning(f"Futures batch order outcome unknown ({e}), checking open orders before re-sending")
+            _recover_batch(client, orders, results, list(range(start, min(start + FUTURES_BATCH_LIMIT, len(orders)))))
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+    def place(order):
+        with span("protective_order", market="futures", type=order.get("type")):
+            return client.futures_create_order(**order)
+    with ThreadPoolExecutor(max_workers=min(len(pending), FUTURES_BATCH_LIMIT)) as pool:
+        # Cada thread herda o contexto (trace do sinal) de quem chamou
+        futs = {i: pool.submit(contextvars.copy_context().run, place, orders[i]) for i in pending}
+        for i, fut in futs.items():
+            try:
+                results[i] = fut.result()
+            except Exception as e:
+                results[i] = {"error": str(e)}
+    return results
+
 # ------------- Targets & sizing -------------
 def load_target_selection(cfg: dict):
-    sel = cfg.get("target_selection")
-    if isinstance(sel, dict):
-        return { "T1": bool(sel.get("T1", True)), "T2": bool(sel.get("T2", True)),
-                 "T3": bool(sel.get("T3", False)), "T4": bool(sel.get("T4", False)) }
-    return { "T1": bool(cfg.get("buy_T1", True)), "T2": bool(cfg.get("buy_T2", True)),
-             "T3": bool(cfg.get("buy_T3", False)), "T4": bool(cfg.get("buy_T4", False)) }
-
-def apply_selection(targets: List[float], selection: dict) -> Tuple[List[float], List[float]]:
-    base = [0.30, 0.30, 0.20, 0.20]
+    return read_target_selection(cfg)
+
+def apply_selection(targets: List[float], selection: dict, base=TP_WEIGHTS) -> Tuple[List[float], List[float]]:
     chosen, w = [], []
     for i in range(min(4, len(targets))):
         if selection.get(f"T{i+1}", False):
@@ -81,7 +235,10 @@ def apply_selection(targets: List[float], selection: dict) -> Tuple[List[float],
     s = sum(w)
     return chosen, [x/s for x in w]
 
-def split_quantities(total_qty: float, weights: List[float]) -> List[float]:
+def split_quantities(total_qty: float, weights: List[float], filters=None, prices=None) -> List[float]:
+    if filters is not None:
+        # stepSize/minQty/minNotional do símbolo; parcelas pequenas demais são somadas à vizinha
+        return filters.split(total_qty, weights, prices)
     per, acc = [], 0.0
     for i, w in enumerate(weights):
         if i < len(weights) - 1:
@@ -91,32 +248,62 @@ def split_quantities(total_qty: float, weights: List[float]) -> List[float]:
             per.append(round(max(total_qty - acc, 0.0), 6))
     return per
 
+# ------------- Resultado -------------
+class TradeResult(str):
+    """
+    Texto do resultado de uma execução (o que vai para o Telegram/journal) com o status estruturado:
+    ok = execução concluída (ou plano do dry-run); placed = a ordem de entrada chegou à exchange.
+    """
+
+    def __new__(cls, text: str, ok: bool = False, placed: bool = False):
+        result = super().__new__(cls, text)
+        result.ok, result.placed = bool(ok), bool(placed)
+        return result
+
 # ------------- Spot path -------------
 def execute_spot(cfg, symbol: str, entry_price: float, sel_targets: List[float], stop_loss: float,
-                 test_mode: bool, sel_weights: List[float]) -> str:
+                 test_mode: bool, sel_weights: List[float], allocation: float = None) -> TradeResult:
+    entry_sent = False
     try:
         client = get_binance_client(cfg, test_mode)
-        if test_mode:
+        mode = "SIM" if test_mode else "REAL"
+        filters = None
+        if client is None:
             usdt_free = 1000.0; avg_price = entry_price
         else:
-            if not symbol_exists_spot(symbol, client):
+            with span("symbol_check", market="spot"):
+                found = symbol_exists_spot(symbol, client, cfg)
+            if not found:
                 msg = f"Spot symbol not found: {symbol}"
-                logging.error(msg); send_telegram_error(msg, cfg); return msg
-            usdt_free = get_usdt_free_spot(client)
-            avg_price = float(client.get_symbol_ticker(symbol=symbol)["price"])
+                logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
+            with span("balance", market="spot"):
+                usdt_free = get_usdt_free_spot(client)
+            with span("price", market="spot"):
+                avg_price = spot_last_price(client, symbol)
+            filters = spot_registry(client, cfg).filters(symbol)
         if usdt_free <= 0:
             msg = "Insufficient USDT balance on Spot."
-            logging.error(msg); send_telegram_error(msg, cfg); return msg
-        quote_amount = round(usdt_free * 0.15, 2)
+            logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
+        if allocation is None:
+            allocation = float(cfg.get("allocation_fraction", DEFAULT_ALLOCATION))
+        quote_amount = round(usdt_free * allocation, 2)
         if quote_amount <= 0:
-            msg = "Computed Spot allocation (15%) is zero."
-            logging.error(msg); send_telegram_error(msg, cfg); return msg
+            msg = f"Computed Spot allocation ({allocation:.0%}) is zero."
+            logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
+        if filters is not None and quote_amount < filters.min_notional:
+            msg = f"Spot allocation {quote_amount} USDT is below the {symbol} minimum notional ({fmt(filters.min_notional)})."
+            logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
         qty_total = round(quote_amount / avg_price, 6)
-        if test_mode:
+        log_event("sizing", account=_account_name(cfg), symbol=symbol, market="spot", usdt_free=usdt_free,
+                  allocation=allocation, quote_amount=quote_amount, price=avg_price, qty=qty_total,
+                  targets=sel_targets, weights=sel_weights, stop_loss=stop_loss)
+        if client is None:
             plan = (f"[TEST][SPOT] BUY {symbol}: {quote_amount} USDT @ ~{avg_price} -> qty≈{qty_total} | "
                     f"TPs={sel_targets} | SL={stop_loss} | weights={sel_weights}")
-            logging.info(plan); return plan
-        buy_order = client.order_market_buy(symbol=symbol, quoteOrderQty=str(quote_amount))
+            logging.info(plan); return TradeResult(plan, ok=True)
+        with span("entry_order", market="spot"):
+            buy_order = client.order_market_buy(symbol=symbol, quoteOrderQty=str(quote_amount))
+        entry_sent = True
         filled_qty = 0.0
         if "executedQty" in buy_order:
             try: filled_qty = float(buy_order.get("executedQty", 0.0))
@@ -124,86 +311,144 @@ def execute_spot(cfg, symbol: str, entry_price: float, sel_targets: List[float],
         if filled_qty <= 0:
             for fill in buy_order.get("fills", []): filled_qty += float(fill.get("qty", 0.0))
         if filled_qty <= 0: filled_qty = qty_total
-        per_qty = split_quantities(filled_qty, sel_weights)
-        oco_ids = []
+        # Comissão cobrada no ativo comprado não fica livre para as OCOs
+        base_asset = (spot_registry(client, cfg).get(symbol) or {}).get("baseAsset")
+        filled_qty -= sum(float(f.get("commission", 0.0)) for f in buy_order.get("fills", [])
+                          if base_asset and f.get("commissionAsset") == base_asset)
+        per_qty = split_quantities(filled_qty, sel_weights, filters, sel_targets)
+        oco_ids, placed = [], []
         for i, (tp, q) in enumerate(zip(sel_targets, per_qty), start=1):
             if q <= 0: continue
-            oco = client.create_oco_order(
-                symbol=symbol, side="SELL", quantity=str(q), price=str(tp),
-                stopPrice=str(stop_loss), stopLimitPrice=str(stop_loss), stopLimitTimeInForce="GTC",
-            )
+            with span("protective_order", market="spot", target=i):
+                oco = client.create_oco_order(
+                    symbol=symbol, side="SELL", quantity=fmt(q), price=_price(filters, tp),
+                    stopPrice=_price(filters, stop_loss), stopLimitPrice=_price(filters, stop_loss),
+                    stopLimitTimeInForce="GTC",
+                )
             oco_ids.append(oco.get("orderListId"))
-        note = f"[SPOT] Buy {symbol} OK | qty={filled_qty} | TPs={sel_targets} | SL={stop_loss} | OCOs={oco_ids}"
-        send_telegram_message(note, cfg)
-        return f"[REAL][SPOT] Buy OK, {len(oco_ids)} OCOs created."
+            placed.append((oco, q, tp))
+        manager = get_position_manager()
+        if manager is not None and placed:
+            # Break-even e limpeza dirigidos pelos eventos de ordem (position_manager.py)
+            fills = buy_order.get("fills", [])
+            fill_qty = sum(float(f.get("qty", 0.0)) for f in fills)
+            fill_price = sum(float(f.get("price", 0.0)) * float(f.get("qty", 0.0)) for f in fills) / fill_qty \
+                if fill_qty > 0 else avg_price
+            manager.track_spot(cfg, client, symbol, fill_price, stop_loss, placed, filters)
+        note = f"[{mode}][SPOT] Buy {symbol} OK | qty={filled_qty} | TPs={sel_targets} | SL={stop_loss} | OCOs={oco_ids}"
+        _notify(note, cfg)
+        return TradeResult(f"[{mode}][SPOT] Buy OK, {len(oco_ids)} OCOs created.", ok=True, placed=True)
     except BinanceAPIException as e:
         err = f"Spot Binance API error: {e}"
-        logging.error(err); send_telegram_error(err, cfg); return err
+        logging.error(err); _notify_error(err, cfg); return TradeResult(err, placed=entry_sent)
     except Exception as e:
         err = f"Spot unexpected error: {e}"
-        logging.error(err); send_telegram_error(err, cfg); return err
+        logging.error(err); _notify_error(err, cfg); return TradeResult(err, placed=entry_sent)
 
 # ------------- Futures path -------------
 def execute_futures(cfg, symbol: str, side: str, leverage: int,
                     sel_targets: List[float], stop_loss: float,
-                    test_mode: bool, sel_weights: List[float]) -> str:
+                    test_mode: bool, sel_weights: List[float], allocation: float = None,
+                    max_leverage: int = None) -> TradeResult:
+    entry_sent = False
     try:
         client = get_binance_client(cfg, test_mode)
+        lev = int(leverage or cfg.get("futures_default_leverage", 5))
+        if max_leverage:
+            lev = min(lev, int(max_leverage))
         working_type = cfg.get("futures_working_type", "MARK_PRICE")
-        if test_mode:
+        mode = "SIM" if test_mode else "REAL"
+        filters = None
+        if client is None:
             usdt_free = 1000.0; price = 100.0
         else:
-            if not symbol_exists_futures(symbol, client):
+            with span("symbol_check", market="futures"):
+                found = symbol_exists_futures(symbol, client, cfg)
+            if not found:
                 msg = f"Futures symbol not found: {symbol}"
-                logging.error(msg); send_telegram_error(msg, cfg); return msg
-            lev = int(leverage or cfg.get("futures_default_leverage", 5))
+                logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
             try:
-                futures_change_leverage(client, symbol, lev)
+                with span("leverage", market="futures"):
+                    futures_change_leverage(client, symbol, lev, cfg)
             except Exception as e:
-                send_telegram_error(f"Failed to set leverage {lev}x on {symbol}: {e}", cfg); return f"{e}"
-            price = futures_last_price(client, symbol)
-            usdt_free = get_usdt_free_futures(client)
+                _notify_error(f"Failed to set leverage {lev}x on {symbol}: {e}", cfg); return TradeResult(f"{e}")
+            with span("price", market="futures"):
+                price = futures_last_price(client, symbol)
+            with span("balance", market="futures"):
+                usdt_free = get_usdt_free_futures(client)
+            filters = futures_registry(client, cfg).filters(symbol)
         if usdt_free <= 0:
             msg = "Insufficient USDT balance on Futures."
-            logging.error(msg); send_telegram_error(msg, cfg); return msg
-        lev = int(leverage or cfg.get("futures_default_leverage", 5))
-        margin = round(usdt_free * 0.15, 2)
+            logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
+        if allocation is None:
+            allocation = float(cfg.get("allocation_fraction", DEFAULT_ALLOCATION))
+        margin = round(usdt_free * allocation, 2)
         if margin <= 0:
-            msg = "Computed Futures margin (15%) is zero."
-            logging.error(msg); send_telegram_error(msg, cfg); return msg
+            msg = f"Computed Futures margin ({allocation:.0%}) is zero."
+            logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
         notional = margin * lev
-        qty_total = round(notional / price, 3)
+        if filters is not None:
+            qty_total = filters.round_qty(notional / price, market=True)
+            problem = filters.violation(qty_total, filters.round_price(price), market=True)
+            if problem in ("LOT_SIZE", "NOTIONAL"):
+                msg = (f"Futures order on {symbol} below exchange minimums ({problem}): qty={fmt(qty_total)}, "
+                       f"notional≈{notional:.2f} USDT (min {fmt(filters.min_notional)})")
+                logging.error(msg); _notify_error(msg, cfg); return TradeResult(msg)
+        else:
+            qty_total = round(notional / price, 3)
         entry_side = "BUY" if side == "long" else "SELL"
         close_side = "SELL" if side == "long" else "BUY"
-        if test_mode:
+        log_event("sizing", account=_account_name(cfg), symbol=symbol, market="futures", usdt_free=usdt_free,
+                  allocation=allocation, margin=margin, leverage=lev, price=price, qty=fmt(qty_total), side=side,
+                  targets=sel_targets, weights=sel_weights, stop_loss=stop_loss)
+        if client is None:
             plan = (f"[TEST][FUTURES] {entry_side} {symbol}: margin={margin} USDT, lev={lev}, px~{price} -> qty≈{qty_total} | "
                     f"TPs={sel_targets} | SL={stop_loss} | weights={sel_weights} | workingType={working_type}")
-            logging.info(plan); return plan
-        entry = client.futures_create_order(symbol=symbol, side=entry_side, type="MARKET", quantity=str(qty_total))
-        per_qty = split_quantities(qty_total, sel_weights)
-        tp_ids = []
-        for i, (tp, q) in enumerate(zip(sel_targets, per_qty), start=1):
+            logging.info(plan); return TradeResult(plan, ok=True)
+        with span("entry_order", market="futures"):
+            entry = client.futures_create_order(symbol=symbol, side=entry_side, type="MARKET", quantity=fmt(qty_total))
+        entry_sent = True
+        entry_acked = time.perf_counter()
+        per_qty = split_quantities(qty_total, sel_weights, filters, sel_targets)
+        # SL primeiro: se houver mais de um chunk, a proteção vai no primeiro
+        protective = [dict(
+            symbol=symbol, side=close_side, type="STOP_MARKET",
+            stopPrice=_price(filters, stop_loss), closePosition=True,  # reduceOnly não é aceito junto com closePosition
+            workingType=working_type,
+        )]
+        for tp, q in zip(sel_targets, per_qty):
             if q <= 0: continue
-            tp_order = client.futures_create_order(
+            protective.append(dict(
                 symbol=symbol, side=close_side, type="TAKE_PROFIT", timeInForce="GTC",
-                price=str(tp), stopPrice=str(tp), quantity=str(q), reduceOnly=True,
+                price=_price(filters, tp), stopPrice=_price(filters, tp), quantity=fmt(q), reduceOnly=True,
                 workingType=working_type,
-            )
-            tp_ids.append(tp_order.get("orderId"))
-        sl_order = client.futures_create_order(
-            symbol=symbol, side=close_side, type="STOP_MARKET",
-            stopPrice=str(stop_loss), reduceOnly=True, closePosition=True,
-            workingType=working_type,
-        )
-        note = f"[FUTURES] {entry_side} {symbol} OK | qty={qty_total} | TPs={sel_targets} | SL={stop_loss} | TP IDs={tp_ids}"
-        send_telegram_message(note, cfg)
-        return f"[REAL][FUTURES] Entry OK, {len(tp_ids)} TP orders + 1 SL created."
+            ))
+        results = futures_place_orders(client, protective, use_batch=cfg.get("futures_batch_orders", True))
+        protection_ms = (time.perf_counter() - entry_acked) * 1000
+        sl_result, tp_results = results[0], results[1:]
+        tp_ids = [r.get("orderId") for r in tp_results if "error" not in r]
+        failed = [f"{o['type']}@{o['stopPrice']}: {r['error']}" for o, r in zip(protective, results) if "error" in r]
+        logging.info(f"[FUTURES] {symbol} protection placed in {protection_ms:.0f} ms ({len(protective)} orders, {len(failed)} failed)")
+        if failed:
+            err = f"Futures protective orders failed on {symbol} (entry {entry.get('orderId')} is open): " + "; ".join(failed)
+            logging.error(err); _notify_error(err, cfg)
+        manager = get_position_manager()
+        if manager is not None:
+            manager.track_futures(cfg, client, symbol, side, entry, price, stop_loss, sl_result,
+                                  [(r, o["quantity"], o["price"]) for o, r in zip(protective[1:], tp_results)],
+                                  filters, working_type)
+        note = (f"[{mode}][FUTURES] {entry_side} {symbol} OK | qty={qty_total} | TPs={sel_targets} | SL={stop_loss} | "
+                f"TP IDs={tp_ids} | protection={protection_ms:.0f}ms")
+        _notify(note, cfg)
+        sl_text = "1 SL" if "error" not in sl_result else "SL FAILED"
+        return TradeResult(f"[{mode}][FUTURES] Entry OK, {len(tp_ids)} TP orders + {sl_text} created.",
+                           ok=True, placed=True)
     except BinanceAPIException as e:
         err = f"Futures Binance API error: {e}"
-        logging.error(err); send_telegram_error(err, cfg); return err
+        logging.error(err); _notify_error(err, cfg); return TradeResult(err, placed=entry_sent)
     except Exception as e:
         err = f"Futures unexpected error: {e}"
-        logging.error(err); send_telegram_error(err, cfg); return err
+        logging.error(err); _notify_error(err, cfg); return TradeResult(err, placed=entry_sent)
 
 # ------------- Public -------------
 def execute_trade(
@@ -213,40 +458,110 @@ def execute_trade(
     stop_loss: float = None,
     side: str = None,
     leverage: int = None,
-    market: str = None
+    market: str = None,
+    profile=None
 ):
-    cfg = load_config()
-    test_mode = cfg.get("test_mode", True)
+    cfg = get_settings()
+    test_mode = cfg.test_mode
+    # Perfil do canal (settings.ChannelProfile): modo, targets, alocação, teto de alavancagem e hints
+    plans = profile or cfg
+    allocation = profile.allocation if profile is not None else None
+    max_leverage = profile.max_leverage if profile is not None else None
+    if profile is not None:
+        market = market or profile.hints.get("market")
+        side = side or profile.hints.get("side")
+        leverage = profile.cap_leverage(leverage or profile.hints.get("leverage"))
     if not targets or stop_loss is None:
         msg = f"Incomplete signal for {pair}: missing targets or stop loss."
         logging.warning(msg); 
-        if not test_mode: send_telegram_error(msg, cfg)
-        return msg
-    selection = load_target_selection(cfg)
-    sel_targets, sel_weights = apply_selection(targets, selection)
+        if not test_mode: _notify_error(msg, cfg)
+        return TradeResult(msg)
+    idx, weights = plans.selection_for(len(targets))
+    sel_targets, sel_weights = [targets[i] for i in idx], list(weights)
     if not sel_targets:
         msg = f"No targets selected for {pair} (check target_selection in config)."
         logging.warning(msg); 
-        if not test_mode: send_telegram_error(msg, cfg)
-        return msg
+        if not test_mode: _notify_error(msg, cfg)
+        return TradeResult(msg)
 
     # Auto selection logic
     symbol = pair.replace("/", "").upper()
-    requested = (market or cfg.get("trade_mode", "auto")).strip().lower()
+    requested = (market or plans.trade_mode).strip().lower()
     side_norm = (side or "long").strip().lower()
+
+    def route(account_cfg, account_allocation):
+        return _route_trade(account_cfg, symbol, entry_price, sel_targets, sel_weights, stop_loss, requested,
+                            side_norm, leverage, account_allocation, max_leverage, test_mode)
+
+    if not cfg.accounts:
+        return route(cfg, allocation)
+    return _fan_out(cfg, cfg.accounts, route, allocation)
+
+_account_pool = None
+_account_pool_size = 0
+_account_pool_lock = threading.Lock()
+
+def _submit_accounts(run, accounts) -> list:
+    # Pool persistente para o fan-out; recriado só se o número de contas crescer. Todo submit acontece
+    # sob o lock, então o pool antigo não recebe mais nada quando é desligado (o que já está na fila termina)
+    global _account_pool, _account_pool_size
+    with _account_pool_lock:
+        if _account_pool is None or _account_pool_size < len(accounts):
+            previous = _account_pool
+            _account_pool = ThreadPoolExecutor(max_workers=len(accounts), thread_name_prefix="account")
+            _account_pool_size = len(accounts)
+            if previous is not None:
+                previous.shutdown(wait=False)
+        return [_account_pool.submit(contextvars.copy_context().run, run, a) for a in accounts]
+
+def _fan_out(cfg, accounts, route, allocation) -> TradeResult:
+    """
+    Executa o mesmo sinal em todas as contas em paralelo e junta os resultados num texto só.
+    As notas de Telegram de cada conta (fill, erros) entram nesse resumo em vez de irem uma a uma.
+    """
+    def run(account):
+        start = time.perf_counter()
+        _current_account.set(account.name)
+        notes = []
+        _account_notes.set(notes)
+        with span("account", account=account.name):
+            try:
+                result = route(cfg.for_account(account),
+                               account.allocation if account.allocation is not None else allocation)
+            except Exception as e:
+                logging.exception(f"Trade failed on account {account.name}")
+                result = TradeResult(f"Error: {e}")
+        return account.name, result, (time.perf_counter() - start) * 1000.0, notes
+
+    rows = [f.result() for f in _submit_accounts(run, accounts)]
+    ok = sum(1 for _, result, _, _ in rows if result.ok)
+    lines = []
+    for name, result, ms, notes in rows:
+        lines.append(f"• {name} ({ms:.0f} ms): {result}")
+        lines.extend(f"   {note}" for note in notes if note not in (result, f"🚨 {result}"))
+    return TradeResult(f"{ok}/{len(rows)} accounts OK\n" + "\n".join(lines), ok=ok == len(rows),
+                       placed=any(result.placed for _, result, _, _ in rows))
+
+def _route_trade(cfg, symbol: str, entry_price: float, sel_targets: List[float], sel_weights: List[float],
+                 stop_loss: float, requested: str, side_norm: str, leverage, allocation, max_leverage,
+                 test_mode: bool) -> TradeResult:
     try:
         client = get_binance_client(cfg, test_mode)
         spot_ok = futures_ok = True
-        if not test_mode and client:
-            spot_ok = symbol_exists_spot(symbol, client)
-            futures_ok = symbol_exists_futures(symbol, client)
+        if getattr(client, "simulated", False):
+            client.prices.anchor(symbol, entry_price)
+        if client:
+            with span("symbol_check", market="auto"):
+                spot_ok = symbol_exists_spot(symbol, client, cfg)
+                futures_ok = symbol_exists_futures(symbol, client, cfg)
     except Exception:
         spot_ok = futures_ok = True
 
     def run_spot():
-        return execute_spot(cfg, symbol, entry_price, sel_targets, stop_loss, test_mode, sel_weights)
+        return execute_spot(cfg, symbol, entry_price, sel_targets, stop_loss, test_mode, sel_weights, allocation)
     def run_futs():
-        return execute_futures(cfg, symbol, side_norm, leverage, sel_targets, stop_loss, test_mode, sel_weights)
+        return execute_futures(cfg, symbol, side_norm, leverage, sel_targets, stop_loss, test_mode, sel_weights,
+                               allocation, max_leverage)
 
     # Priority: explicit market -> auto inference
     if requested == "spot":
@@ -254,32 +569,32 @@ def execute_trade(
             return run_spot()
         msg = f"Spot symbol not found: {symbol}."
         if futures_ok:
-            send_telegram_message(msg + " Switching to Futures automatically.", cfg)
+            _notify(msg + " Switching to Futures automatically.", cfg)
             return run_futs()
-        send_telegram_error(msg + " Also not on Futures.", cfg)
-        return msg
+        _notify_error(msg + " Also not on Futures.", cfg)
+        return TradeResult(msg)
     if requested == "futures":
         if futures_ok:
             return run_futs()
         msg = f"Futures symbol not found: {symbol}."
         if spot_ok and side_norm != "short":
-            send_telegram_message(msg + " Switching to Spot automatically.", cfg)
+            _notify(msg + " Switching to Spot automatically.", cfg)
             return run_spot()
-        send_telegram_error(msg + " Also not on Spot or side incompatible.", cfg)
-        return msg
+        _notify_error(msg + " Also not on Spot or side incompatible.", cfg)
+        return TradeResult(msg)
 
     # Auto mode
     if side_norm == "short" or leverage:
         if futures_ok:
             return run_futs()
-        send_telegram_error(f"Auto selected Futures but symbol not found: {symbol}.", cfg)
-        return f"Futures symbol not found: {symbol}"
+        _notify_error(f"Auto selected Futures but symbol not found: {symbol}.", cfg)
+        return TradeResult(f"Futures symbol not found: {symbol}")
     # default long spot
     if spot_ok:
         return run_spot()
     if futures_ok:
-        send_telegram_message("Auto switching to Futures (Spot not available).", cfg)
+        _notify("Auto switching to Futures (Spot not available).", cfg)
         return run_futs()
     msg = f"Symbol {symbol} not listed on Spot or Futures."
-    send_telegram_error(msg, cfg)
-    return msg
+    _notify_error(msg, cfg)
+    return TradeResult(msg)